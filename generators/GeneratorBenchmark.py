@@ -0,0 +1,442 @@
+"""
+This script benchmarks the parts of the client test case generator that
+dominate its run time, so changes to the generator can be measured rather
+than guessed at:
+
+    - the helpers (URL template replacement, id32/id64 entry id encoding),
+    - sparse bit set corruption (_find_and_corrupt_sparse_bit_set),
+    - glyph keyed patch decompression and recompression,
+    - IFTFile source font loading and WOFF2 saving,
+    - index generation (generateClientIndexHTML),
+    - end to end generation of a representative subset of the tests.
+
+Apart from the IFTFile and end to end benchmarks, which need the build
+directory (see the Makefile), the inputs are synthetic and generated at
+several sizes, from roughly the size of the current test fonts up to
+patch maps with thousands of entries and patches with thousands of glyphs.
+
+Each benchmark is timed --repeat times and the fastest run is reported.
+Results can be saved as a JSON baseline and later runs compared to it,
+which exits with status 1 if any benchmark slowed down by more than
+--threshold:
+
+    python3 ./GeneratorBenchmark.py --save benchmark-baseline.json
+    ... change the generator ...
+    python3 ./GeneratorBenchmark.py --compare benchmark-baseline.json
+
+Baselines are only comparable on the machine that recorded them.
+"""
+
+import os
+import sys
+import array
+import json
+import time
+import random
+import fnmatch
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+
+from testCaseGeneratorLib import helpers
+from testCaseGeneratorLib import iftFile
+from testCaseGeneratorLib import patchMapFormat2
+from testCaseGeneratorLib import glyphKeyedPatch
+from testCaseGeneratorLib import woff2Writer
+from testCaseGeneratorLib.paths import buildDirectory
+from testCaseGeneratorLib.html import generateClientIndexHTML
+from testCaseGeneratorLib.glyphKeyedPatch import GlyphKeyedPatch
+
+logger = logging.getLogger(__name__)
+
+BASELINE_VERSION = 1
+
+# Differences smaller than this (in seconds) are timer noise, and are never
+# reported as regressions however large they are relative to the baseline.
+MINIMUM_REGRESSION = 0.0002
+
+# Sizes of the synthetic inputs. The smallest is about the size of the
+# patch maps and patches of the current test fonts.
+ENTRY_COUNTS = (20, 1000, 5000)
+GLYPH_COUNTS = (50, 1000, 5000)
+TEST_COUNTS = (50, 1000)
+
+# A few tests from each family, for the end to end benchmark.
+END_TO_END_TESTS = (
+    "client-conform-format2-valid-format-number",
+    "client-conform-format1-glyph-count-matches",
+    "client-conform-sparse-bit-set-decoding",
+    "client-conform-glyph-keyed-glyph-ids-sort-ascending-unique",
+    "client-conform-table-keyed-patches-sort-ascending",
+    "client-url-templates_opcode-zero",
+)
+
+# -----------------
+# Synthetic Inputs
+# -----------------
+
+def syntheticFormat2(entryCount, codePointsEntries=None):
+    """
+    Returns a Format 2 patch map with entryCount mapping entries. Entries
+    whose index is in codePointsEntries (all of them if None) map eight code
+    points with a biased sparse bit set, the rest only set a patch format.
+    """
+    template = bytes([0x80 | 7]) + b".ift_tk"
+    entries = bytearray()
+    for index in range(entryCount):
+        if codePointsEntries is None or index in codePointsEntries:
+            # u16 bias, then a B=8, H=1 sparse bit set with every bit set
+            entries += bytes([0x20]) + ((index * 8) & 0xFFFF).to_bytes(2, "big") + bytes([0x06, 0xFF])
+        else:
+            entries += bytes([patchMapFormat2.ENTRY_PATCH_FORMAT, 1])
+    entriesOffset = patchMapFormat2.HEADER_SIZE + len(template)
+    header = patchMapFormat2._HEADER.pack(
+        2, 0, bytes(range(16)), 1, entryCount.to_bytes(3, "big"),
+        entriesOffset, 0, len(template),
+    )
+    return header + template + bytes(entries)
+
+
+def syntheticGlyphKeyedPatch(glyphCount, seed=0):
+    """
+    Returns a glyph keyed patch with glyf and gvar data for glyphCount
+    glyphs. The data is low entropy, so it compresses about as well as
+    real glyph data.
+    """
+    rng = random.Random(seed)
+    tables = [b"glyf", b"gvar"]
+    glyphData = [bytes(rng.randrange(16) for _ in range(rng.randrange(8, 120)))
+                 for _ in range(glyphCount * len(tables))]
+    patch = GlyphKeyedPatch(glyphIds=range(glyphCount), tables=tables)
+    offset = patch._headerSize()
+    offsets = [offset]
+    for data in glyphData:
+        offset += len(data)
+        offsets.append(offset)
+    patch.offsets = array.array("I", offsets)
+    patch.glyphData = b"".join(glyphData)
+    return patch
+
+
+def syntheticTestGroups(testCount):
+    tests = [
+        dict(
+            identifier="client-benchmark-test-%d" % index,
+            title="Benchmark test %d" % index,
+            description="A synthetic test case <%d> used to benchmark index generation." % index,
+            shouldShowIFT=index % 2 == 0,
+            specLink="https://www.w3.org/TR/IFT/#benchmark-%d" % index,
+            fontFormats=["GLYF", "CFF"],
+            extraHTML=None,
+        )
+        for index in range(testCount)
+    ]
+    return [dict(title="Benchmark", url="#benchmark", testCases=tests, note="Synthetic tests.")]
+
+
+def _sourceFontPath():
+    return os.path.join(buildDirectory, "IFT", "GLYF", "font.ift.woff2")
+
+
+def _clearing(cache, *args):
+    """
+    Returns a setup function that empties cache, so the benchmark measures
+    a cold run, and passes args to it.
+    """
+    def setup():
+        cache.clear()
+        return args
+    return setup
+
+
+def _clearCaches():
+    iftFile._sourceFontCache.clear()
+    patchMapFormat2._entryIndexCache.clear()
+    glyphKeyedPatch._decompressedCache.clear()
+    woff2Writer._glyfCache.clear()
+    woff2Writer._compressedCache.clear()
+
+# -----------------
+# Benchmarks
+# -----------------
+
+class Benchmark:
+    """
+    A benchmark called name. setup() is called (untimed) before each run
+    and returns the arguments for run(*args), which is timed.
+    """
+
+    def __init__(self, name, run, setup=None, requiresBuild=False):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: ())
+        self.requiresBuild = requiresBuild
+
+    def measure(self, repeat):
+        times = []
+        for _ in range(repeat):
+            args = self.setup()
+            start = time.perf_counter()
+            self.run(*args)
+            times.append(time.perf_counter() - start)
+        return dict(min=min(times), median=statistics.median(times), repeat=repeat)
+
+
+def _helperBenchmarks():
+    benchmarks = []
+    for entryCount in ENTRY_COUNTS:
+        table = syntheticFormat2(entryCount)
+        template = bytes([0x80 | 8]) + b"/patches/" + bytes([0x80 | 7]) + b".ift_tk"
+        benchmarks.append(Benchmark(
+            "helpers.replace_format2_url_template[entries=%d]" % entryCount,
+            lambda table=table, template=template: helpers.replace_format2_url_template(table, template),
+        ))
+
+        ids = list(range(1, entryCount + 1))
+        id32s = [helpers.id32_no_strip(i) for i in ids]
+        benchmarks.append(Benchmark(
+            "helpers.decode_id32_to_int[ids=%d]" % entryCount,
+            lambda id32s=id32s: [helpers.decode_id32_to_int(s) for s in id32s],
+        ))
+        benchmarks.append(Benchmark(
+            "helpers.id32_no_strip[ids=%d]" % entryCount,
+            lambda ids=ids: [helpers.id32_no_strip(i) for i in ids],
+        ))
+        benchmarks.append(Benchmark(
+            "helpers.compute_id64_file_name[ids=%d]" % entryCount,
+            lambda ids=ids: [helpers.compute_id64_file_name(i) for i in ids],
+        ))
+    return benchmarks
+
+
+def _sparseBitSetBenchmarks():
+    # Imported here as importing a test module registers its tests.
+    from clientTestCases.patchMap import _find_and_corrupt_sparse_bit_set
+    benchmarks = []
+    for entryCount in ENTRY_COUNTS:
+        # Only the last entry has code points, so every entry is scanned.
+        table = syntheticFormat2(entryCount, codePointsEntries={entryCount - 1})
+        benchmarks.append(Benchmark(
+            "patchMap._find_and_corrupt_sparse_bit_set[entries=%d]" % entryCount,
+            _find_and_corrupt_sparse_bit_set,
+            setup=_clearing(patchMapFormat2._entryIndexCache, table),
+        ))
+    return benchmarks
+
+
+def _glyphKeyedBenchmarks():
+    benchmarks = []
+    for glyphCount in GLYPH_COUNTS:
+        data = syntheticGlyphKeyedPatch(glyphCount).compile()
+        benchmarks.append(Benchmark(
+            "glyphKeyedPatch.decompile[glyphs=%d]" % glyphCount,
+            GlyphKeyedPatch.decompile,
+            setup=_clearing(glyphKeyedPatch._decompressedCache, data),
+        ))
+
+        def recompile(patch):
+            patch.insertTable(b"hmtx")
+            patch.compile()
+        benchmarks.append(Benchmark(
+            "glyphKeyedPatch.recompile[glyphs=%d]" % glyphCount,
+            recompile,
+            setup=lambda data=data: (GlyphKeyedPatch.decompile(data),),
+        ))
+    return benchmarks
+
+
+def _iftFileBenchmarks():
+    path = _sourceFontPath()
+
+    def load():
+        font = iftFile.openSourceFont(path)
+        font["IFT "].data
+
+    def loadCold():
+        _clearCaches()
+        return ()
+
+    benchmarks = [
+        Benchmark("IFTFile.load[cold]", load, setup=loadCold, requiresBuild=True),
+        Benchmark("IFTFile.load[warm]", load, requiresBuild=True),
+    ]
+
+    def saveSetup(entryCount, cold):
+        # Warm runs reuse the decoded source font and glyf transform, but
+        # not the compressed output of the previous run.
+        if cold:
+            _clearCaches()
+        woff2Writer._compressedCache.clear()
+        font = iftFile.openSourceFont(path)
+        if entryCount is not None:
+            font["IFT "].data = syntheticFormat2(entryCount)
+        return (font,)
+
+    benchmarks.append(Benchmark(
+        "IFTFile.save[cold]", woff2Writer.saveWOFF2,
+        setup=lambda: saveSetup(None, True), requiresBuild=True,
+    ))
+    for entryCount in ENTRY_COUNTS:
+        benchmarks.append(Benchmark(
+            "IFTFile.save[warm,entries=%d]" % entryCount, woff2Writer.saveWOFF2,
+            setup=lambda entryCount=entryCount: saveSetup(entryCount, False), requiresBuild=True,
+        ))
+    return benchmarks
+
+
+def _indexBenchmarks():
+    benchmarks = []
+    for testCount in TEST_COUNTS:
+        groups = syntheticTestGroups(testCount)
+
+        def run(groups=groups):
+            with tempfile.TemporaryDirectory() as directory:
+                generateClientIndexHTML(directory=directory, testCases=groups, note="Benchmark")
+        benchmarks.append(Benchmark("generateClientIndexHTML[tests=%d]" % testCount, run))
+    return benchmarks
+
+
+def _endToEndBenchmarks():
+    def setup():
+        from clientTestCases import loadTestCases
+        from testCaseGeneratorLib.registry import testCells, selectCells
+        loadTestCases()
+        _clearCaches()
+        return (selectCells(testCells, only=END_TO_END_TESTS),)
+
+    def run(cells):
+        from testCaseGeneratorLib.scheduler import runTestCells
+        from testCaseGeneratorLib import staging, buildManifest, blobStore
+        # The test cases, their blobs and any build manifest go to a
+        # temporary directory, so the published suite is left as it is.
+        # The cells run in this process, so the modules' paths can be
+        # pointed at it directly.
+        saved = (staging.clientTestDirectory, buildManifest.clientTestDirectory,
+                 os.environ.get(blobStore.BLOB_STORE_ENVIRONMENT_VARIABLE))
+        with tempfile.TemporaryDirectory() as directory:
+            testDirectory = os.path.join(directory, "Tests", "xhtml1")
+            staging.clientTestDirectory = buildManifest.clientTestDirectory = testDirectory
+            os.environ[blobStore.BLOB_STORE_ENVIRONMENT_VARIABLE] = os.path.join(directory, "blobs")
+            try:
+                runTestCells(cells)
+            finally:
+                staging.clientTestDirectory, buildManifest.clientTestDirectory, blobRoot = saved
+                if blobRoot is None:
+                    del os.environ[blobStore.BLOB_STORE_ENVIRONMENT_VARIABLE]
+                else:
+                    os.environ[blobStore.BLOB_STORE_ENVIRONMENT_VARIABLE] = blobRoot
+
+    return [Benchmark("endToEnd[tests=%d]" % len(END_TO_END_TESTS), run, setup=setup, requiresBuild=True)]
+
+
+def allBenchmarks():
+    return (_helperBenchmarks() + _sparseBitSetBenchmarks() + _glyphKeyedBenchmarks()
+            + _iftFileBenchmarks() + _indexBenchmarks() + _endToEndBenchmarks())
+
+# -----------------
+# Baselines
+# -----------------
+
+def loadBaseline(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    if data.get("version") != BASELINE_VERSION:
+        raise ValueError("Unsupported benchmark baseline version in %s" % path)
+    return data["results"]
+
+
+def saveBaseline(path, results):
+    data = dict(
+        version=BASELINE_VERSION,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        machine=platform.machine(),
+        results=results,
+    )
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def compareResults(results, baseline, threshold):
+    """
+    Log each result against the baseline. Returns the names of the
+    benchmarks that are slower than the baseline by more than threshold (a
+    fraction, 0.2 is 20%).
+    """
+    regressions = []
+    logger.info("%-60s %10s %10s %8s", "benchmark", "baseline", "current", "change")
+    for name, result in results.items():
+        if name not in baseline:
+            logger.info("%-60s %10s %10.3f %8s", name, "-", result["min"] * 1000, "new")
+            continue
+        before = baseline[name]["min"]
+        change = result["min"] / before - 1 if before else 0.0
+        flag = ""
+        if change > threshold and result["min"] - before > MINIMUM_REGRESSION:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        logger.info("%-60s %10.3f %10.3f %+7.1f%%%s", name, before * 1000, result["min"] * 1000,
+                    change * 100, flag)
+    return regressions
+
+# -----------------
+# Command Line
+# -----------------
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark the IFT client test case generator.")
+    parser.add_argument("--filter", action="append", default=[], metavar="PATTERN",
+                        help="Only run benchmarks whose name matches the glob PATTERN. May be repeated.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of timed runs of each benchmark, the fastest is reported (default: 5)")
+    parser.add_argument("--save", metavar="PATH",
+                        help="Save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="Compare the results to the JSON baseline at PATH")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown, as a fraction of the baseline time, reported as a regression (default: 0.2)")
+    parser.add_argument("--list", action="store_true",
+                        help="List the benchmarks and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    benchmarks = allBenchmarks()
+    if args.filter:
+        benchmarks = [b for b in benchmarks if any(fnmatch.fnmatchcase(b.name, p) for p in args.filter)]
+    if args.list:
+        for benchmark in benchmarks:
+            print(benchmark.name)
+        return 0
+
+    haveBuild = os.path.exists(_sourceFontPath())
+    results = {}
+    for benchmark in benchmarks:
+        if benchmark.requiresBuild and not haveBuild:
+            logger.warning("Skipping %s, %s has not been built.", benchmark.name, _sourceFontPath())
+            continue
+        # Progress from the generator itself is noise here.
+        logging.getLogger("testCaseGeneratorLib").setLevel(logging.WARNING)
+        result = results[benchmark.name] = benchmark.measure(args.repeat)
+        logger.info("%-60s %10.3f ms (median %.3f ms)", benchmark.name, result["min"] * 1000, result["median"] * 1000)
+
+    status = 0
+    if args.compare:
+        logger.info("")
+        regressions = compareResults(results, loadBaseline(args.compare), args.threshold)
+        if regressions:
+            logger.warning("%d benchmark(s) regressed by more than %d%%.", len(regressions), args.threshold * 100)
+            status = 1
+    if args.save:
+        saveBaseline(args.save, results)
+        logger.info("Saved baseline to %s", args.save)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+This script merges the reports downloaded from the shard pages of the
+client test suite (see testCaseGeneratorLib/shards.py) into one report of
+the whole suite:
+
+    python3 ./MergeReports.py -o ift-report.json ift-report-1.json ift-report-2.json ...
+
+The merged report lists every test record in shard order, with the details
+of each shard run under "shards". It can in turn be passed to
+--shard-timings of ClientTestCaseGenerator.py to balance the shards of the
+next build. The script exits with status 1 if the reports can't be merged.
+"""
+
+import sys
+import json
+import logging
+import argparse
+
+from testCaseGeneratorLib.shards import loadReport, mergeReports
+
+logger = logging.getLogger(__name__)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Merge the reports of the client test suite's shard pages.")
+    parser.add_argument("reports", metavar="REPORT", nargs="+", help="The report of a shard page")
+    parser.add_argument("-o", "--output", metavar="PATH", default="ift-report.json",
+                        help="Path of the merged report (default: ift-report.json)")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        report = mergeReports([loadReport(path) for path in args.reports])
+    except ValueError as e:
+        logger.error("%s", e)
+        sys.exit(1)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    summary = report["summary"]
+    logger.info("Wrote %s: %d tests, %d loaded, %d errors, %d timed out",
+                args.output, summary["tests"], summary["loaded"], summary["errors"], summary["timeouts"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+This script creates and applies delta bundles (see
+testCaseGeneratorLib/deltaBundle.py), which update a copy of the client
+test suite from one generated version to another with only the files that
+changed:
+
+    python3 ./SuiteDelta.py create old/IFTClient ../IFTClient delta.zip
+    python3 ./SuiteDelta.py apply delta.zip /path/to/ClientTestFonts
+
+Either suite given to create may be a generated IFTClient directory, its
+manifest.json, or a directory laid out like IFTClient/Tests/xhtml1 (such as
+an extracted ClientTestFonts.zip), which is hashed. The new suite's files
+are read from its test directory, so it can only be a manifest.json that
+sits in its IFTClient directory.
+
+apply updates a directory laid out like IFTClient/Tests/xhtml1. It refuses
+to touch a directory that does not hold the version the bundle was made
+from, and verifies the hashes of the files it wrote (with --verify-all, of
+every file of the new version). It exits with status 1 on failure.
+
+A bundle against the previous build can also be written as part of a build,
+see the --delta-from option of ClientTestCaseGenerator.py.
+"""
+
+import sys
+import logging
+import argparse
+
+from testCaseGeneratorLib.suiteManifest import loadSuite
+from testCaseGeneratorLib.deltaBundle import createDeltaBundle, applyDeltaBundle
+
+logger = logging.getLogger(__name__)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Create and apply delta bundles between client test suite versions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Write a bundle that updates OLD to NEW")
+    create.add_argument("old", metavar="OLD", help="The suite to update from")
+    create.add_argument("new", metavar="NEW", help="The suite to update to")
+    create.add_argument("bundle", metavar="BUNDLE", help="Path of the bundle to write")
+    apply = commands.add_parser("apply", help="Apply BUNDLE to the test files in DIRECTORY")
+    apply.add_argument("bundle", metavar="BUNDLE", help="The bundle to apply")
+    apply.add_argument("directory", metavar="DIRECTORY",
+                       help="A directory laid out like IFTClient/Tests/xhtml1, e.g. an extracted ClientTestFonts.zip")
+    apply.add_argument("--verify-all", action="store_true",
+                       help="After applying, verify every file of the new version rather than only those written")
+    apply.add_argument("--force", action="store_true",
+                       help="Apply even if DIRECTORY does not hold the version the bundle was made from")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        if args.command == "create":
+            oldManifest, _ = loadSuite(args.old)
+            newManifest, testDirectory = loadSuite(args.new)
+            createDeltaBundle(args.bundle, oldManifest, newManifest, testDirectory)
+        else:
+            applyDeltaBundle(args.bundle, args.directory, verifyAll=args.verify_all, force=args.force)
+    except ValueError as e:
+        logger.error("%s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
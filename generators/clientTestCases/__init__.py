@@ -0,0 +1,25 @@
+"""
+The client test cases, one module per family of tests. Importing a module
+registers its test cases with testCaseGeneratorLib.registry; families are
+registered, and so listed in the index, in the order given here.
+"""
+
+import importlib
+
+testFamilies = [
+    "patchMap",
+    "tableKeyed",
+    "glyphKeyed",
+    "urlTemplates",
+    "documentIsolation",
+    "applyGlyphKeyed",
+    "stopExtend",
+]
+
+
+def loadTestCases():
+    """
+    Import every test family, registering all of the test cases.
+    """
+    for family in testFamilies:
+        importlib.import_module("%s.%s" % (__name__, family))
@@ -0,0 +1,234 @@
+"""
+Glyph keyed patch format tests.
+"""
+
+import os
+import glob
+from testCaseGeneratorLib.constants import IFT_FONT_FILENAME
+from testCaseGeneratorLib.iftFile import IFTFile
+from testCaseGeneratorLib.glyphKeyedPatch import GlyphKeyedPatch
+from testCaseGeneratorLib.registry import writeTest
+from testCaseGeneratorLib.staging import writeFile
+
+testType = "client"
+
+
+def makeIFTWithInvalidGlyphKeyedPatchFormat(fontFormat, testName):
+    """Modify all glyph keyed patch files to have an invalid format tag.
+
+    Per the spec (§6.3 Glyph Keyed), the format field of a glyph keyed patch
+    must be set to 'ifgk'. This test sets it to 'XXXX' so the client should
+    reject the patch.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    nft.getIFTTableData()
+
+    # Modify all _gk patch files in the test directory to have an invalid format tag
+    destDir = os.path.join(nft.testDirectory, fontFormat)
+    for gkFile in glob.glob(os.path.join(destDir, "*_gk")):
+        with open(gkFile, "rb") as f:
+            data = bytearray(f.read())
+        # The first 4 bytes are the format Tag, which must be 'ifgk'.
+        # Replace with an invalid value.
+        data[0:4] = b'XXXX'
+        writeFile(gkFile, data)
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-glyph-keyed-format-equals-ifgk"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Glyph keyed patch with invalid format tag",
+    description="The glyph keyed patch format field is set to an invalid value (not 'ifgk'). The client must reject the patch.",
+    shouldShowIFT=False,
+    credits=[dict(title="Takeru Suzuki", role="author", link="https://github.com/terkel")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithInvalidGlyphKeyedPatchFormat,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithDuplicateGlyphKeyedTables(fontFormat, testName):
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    nft.getIFTTableData()
+
+    # Modify all _gk patch files in the test directory
+    destDir = os.path.join(nft.testDirectory, fontFormat)
+    for gkFile in glob.glob(os.path.join(destDir, "*_gk")):
+        patch = GlyphKeyedPatch.fromFile(gkFile)
+
+        # Insert a duplicate of the first table (with zero length glyph data)
+        # right after it, so the duplicate tag is the only defect.
+        patch.insertTable(patch.tables[0], index=1)
+
+        patch.save(gkFile)
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-glyph-keyed-tables-sort-ascending-unique"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Glyph keyed patch with duplicate table tags",
+    description="The glyph keyed patch tables array contains duplicate values. The client must reject the patch.",
+    shouldShowIFT=False,
+    credits=[dict(title="Dileep Maurya", role="author", link="https://github.com/dmaurya-edge")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithDuplicateGlyphKeyedTables,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithUnsortedGlyphDataOffsets(fontFormat, testName):
+    """
+    Reverse the glyphDataOffsets array inside each glyph-keyed patch file so
+    that the offsets are no longer in ascending order.
+
+    Tests conform-glyph-keyed-glyph-data-offsets-sort-ascending:
+    'Offsets must be sorted in ascending order.'
+
+    GlyphPatches layout (after brotli decompression):
+      0-3:   glyphCount (uint32)
+      4:     tableCount (uint8)
+      5+:    glyphIds[glyphCount]  (uint16 or uint24, per flags bit 0)
+      then:  tables[tableCount]    (Tag, 4 bytes each)
+      then:  glyphDataOffsets[glyphCount * tableCount + 1] (Offset32 each)
+      then:  glyphData[variable]
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+
+    destDir = os.path.join(nft.testDirectory, fontFormat)
+    for gkFile in glob.glob(os.path.join(destDir, "*_gk")):
+        patch = GlyphKeyedPatch.fromFile(gkFile)
+        # Reverse so they are no longer ascending
+        patch.offsets.reverse()
+        patch.save(gkFile)
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-glyph-keyed-glyph-data-offsets-sort-ascending"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Glyph keyed patch with unsorted glyphDataOffsets",
+    description="The glyphDataOffsets array in the glyph keyed patch is reversed so the "
+                "offsets are no longer in ascending order. The client must reject the patch.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithUnsortedGlyphDataOffsets,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithUnsortedGlyphIds(fontFormat, testName):
+    """
+    Reverse the glyphIds array inside each glyph-keyed patch file so that
+    the glyph IDs are no longer in ascending sorted order.
+
+    Tests conform-glyph-keyed-glyph-ids-sort-ascending-unique:
+    'Must be in ascending sorted order and must not contain any duplicate values.'
+
+    GlyphPatches layout (after brotli decompression):
+      0-3:   glyphCount (uint32)
+      4:     tableCount (uint8)
+      5+:    glyphIds[glyphCount]  (uint16 or uint24, per flags bit 0)
+      then:  tables[tableCount]    (Tag, 4 bytes each)
+      then:  glyphDataOffsets[...]
+      then:  glyphData[...]
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+
+    destDir = os.path.join(nft.testDirectory, fontFormat)
+    for gkFile in glob.glob(os.path.join(destDir, "*_gk")):
+        patch = GlyphKeyedPatch.fromFile(gkFile)
+
+        assert patch.glyphCount >= 2, (
+            f"{gkFile}: glyph_count={patch.glyphCount}, need at least 2 to reverse glyphIds. "
+            "The source glyph-keyed patch must contain multiple glyphs for this test."
+        )
+
+        # Reverse so they are no longer in ascending order
+        patch.glyphIds.reverse()
+        patch.save(gkFile)
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-glyph-keyed-glyph-ids-sort-ascending-unique"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Glyph keyed patch with unsorted glyph IDs",
+    description="The glyphIds array in the glyph keyed patch is reversed so the "
+                "glyph IDs are no longer in ascending sorted order. The client must "
+                "reject the patch.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithUnsortedGlyphIds,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithUnsupportedTableInGlyphPatch(fontFormat, testName):
+    """
+    Add an unsupported table entry ('hmtx') with zero-length glyph data alongside
+    the existing supported table entry in each glyph-keyed patch file.
+
+    Tests conform-table-entries-ignore-others:
+    'Entries for tables of any other types must be ignored.'
+
+    A conforming client ignores the 'hmtx' entry and still applies the supported
+    table (glyf or CFF), allowing the IFT font to load and render correctly.
+    shouldShowIFT=True: the font renders correctly when the client correctly
+    ignores the unsupported table entry.
+
+    GlyphPatches layout (decompressed):
+      0-3:   glyphCount (uint32)
+      4:     tableCount (uint8)
+      5+:    glyphIds[glyphCount]  (uint16 or uint24 per flags bit 0)
+      then:  tables[tableCount]    (Tag, 4 bytes each)
+      then:  glyphDataOffsets[glyphCount * tableCount + 1] (Offset32 each)
+      then:  glyphData[variable]
+
+    We append 'hmtx' as an additional table tag and add glyphCount new offsets
+    (all equal to the sentinel value) so the new table has zero-length glyph data
+    for every glyph.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+
+    destDir = os.path.join(nft.testDirectory, fontFormat)
+    for gkFile in glob.glob(os.path.join(destDir, "*_gk")):
+        patch = GlyphKeyedPatch.fromFile(gkFile)
+        patch.insertTable(b'hmtx')
+        patch.save(gkFile)
+
+    nft.writeTestIFTFile()
+
+
+testTag = "conform-table-entries-ignore-others"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Glyph keyed patch with unsupported table entry must be ignored",
+    description="Each glyph-keyed patch contains an entry for the unsupported table 'hmtx' "
+                "alongside the supported table entry. A conforming client ignores the 'hmtx' "
+                "entry and still applies the supported table, allowing the IFT font to render "
+                "correctly.",
+    shouldShowIFT=True,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithUnsupportedTableInGlyphPatch,
+    funcArgs=(identifierString,)
+)
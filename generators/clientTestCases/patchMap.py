@@ -0,0 +1,261 @@
+"""
+Patch map tests: the 'IFT ' table itself and its Format 1 and Format 2
+encodings.
+"""
+
+from testCaseGeneratorLib.constants import IFT_FONT_FILENAME
+from testCaseGeneratorLib.iftFile import IFTFile
+from testCaseGeneratorLib.patchMapFormat1 import PatchMapFormat1
+from testCaseGeneratorLib.patchMapFormat2 import (
+    PatchMapFormat2,
+    SPARSE_BIT_SET_BRANCH_FACTORS,
+)
+from testCaseGeneratorLib.registry import writeTest
+
+testType = "client"
+
+
+def makeIFTWithFormatID(fontFormat, formatId, testName):
+    nft = IFTFile(testName,fontFormat, IFT_FONT_FILENAME)
+    patchMap = PatchMapFormat2(nft.getIFTTableData())
+    patchMap.format = formatId
+    nft.setIFTTableData(patchMap.getData())
+    nft.writeTestIFTFile()
+
+testTag = "conform-format2-valid-format-number"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Format 2 with invalid format number",
+    description="The IFT table 'format' field for a format 2 is set to 3, which is an invalid format number.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithFormatID,
+    funcArgs=(3, identifierString)
+)
+
+
+def makeIFTWithInvalidDesignSpaceSegmentEndValue(fontFormat, testName):
+    # This test is only for format 2. For reference: https://www.w3.org/TR/IFT/#patch-map-format-2
+    nft = IFTFile(testName,fontFormat, IFT_FONT_FILENAME)
+    patchMap = PatchMapFormat2(nft.getIFTTableData())
+
+    # set the end of the first mapping entry's first design space segment
+    # to an invalid (negative) value
+    firstEntry = patchMap.entries[0]
+    if firstEntry.designSpaceCount > 0:
+        patchMap.setDesignSpaceSegment(firstEntry, 0, end=-1.0)
+    nft.setIFTTableData(patchMap.getData())
+    # Write back
+    nft.writeTestIFTFile()
+
+testTag = "conform-design-space-segment-end-valid-value"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Format 2 with invalid design space segment end value",
+    description="The IFT table design space segment end value is set to an invalid negative number.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithInvalidDesignSpaceSegmentEndValue,
+    funcArgs=(identifierString,)
+)
+
+
+def removeTable(fontFormat, testName, tableTag):
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    nft.getIFTTableData()
+    nft.removeTable(tableTag)
+    nft.writeTestIFTFile()
+
+testTag = "extend-font-subset_require-ift-table"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="IFT table missing",
+    description="All incremental fonts must contain the 'IFT ' table.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=removeTable,
+    funcArgs=(identifierString,"IFT ",)
+)
+
+
+def _find_and_corrupt_sparse_bit_set(iftData):
+    """
+    Find the first codePoints sparse bit set in a Format 2 IFT table, then
+    corrupt its header byte so that H exceeds the maximum height for the
+    given branch factor.
+
+    Per §sparse-bit-set-decoding step 2: 'If H is greater than the Maximum Height
+    in the Branch Factor Encoding table in the row for B then the encoding is invalid,
+    return an error.'
+
+    Branch Factor Encoding (spec §sparse-bit-set-decoding):
+      bits 0-1 = 0b00 → B=2,  maxH=31
+      bits 0-1 = 0b01 → B=4,  maxH=16
+      bits 0-1 = 0b10 → B=8,  maxH=11
+      bits 0-1 = 0b11 → B=32, maxH=7
+    """
+    patchMap = PatchMapFormat2(iftData)
+    for entry in patchMap.entries:
+        if not entry.hasCodePoints:
+            continue
+        branchFactorBits, _ = patchMap.sparseBitSetHeader(entry)
+        _, maxHeight = SPARSE_BIT_SET_BRANCH_FACTORS[branchFactorBits]
+        patchMap.setSparseBitSetHeader(entry, height=maxHeight + 1)
+        return patchMap.getData()
+
+    raise ValueError("No codePoints (sparse bit set) field found in any mapping entry")
+
+
+def makeIFTWithInvalidSparseBitSet(fontFormat, testName):
+    """
+    Corrupt the first codePoints sparse bit set in the IFT table so that its
+    height H exceeds the maximum allowed for the encoded branch factor.
+
+    Tests conform-sparse-bit-set-decoding: if the decoding algorithm returns
+    an error the client must treat the patch map as invalid and not apply any
+    patches, causing the IFT font to fail to render.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    raw = nft.getIFTTableData()
+    corrupted = _find_and_corrupt_sparse_bit_set(bytes(raw))
+    nft.setIFTTableData(corrupted)
+    nft.writeTestIFTFile()
+
+
+testTag = "conform-sparse-bit-set-decoding"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Sparse bit set with height exceeding maximum for branch factor",
+    description="The codePoints sparse bit set in a mapping entry has a height H that "
+                "exceeds the maximum allowed for its branch factor. The client must treat "
+                "the patch map as invalid and not render using the IFT font.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithInvalidSparseBitSet,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithFormat1MismatchedGlyphCount(fontFormat, testName):
+    """
+    Replace the Format 2 IFT table with a Format 1 patch map whose
+    glyphCount field does not match the number of glyphs in the font (maxp.numGlyphs).
+
+    Tests conform-format1-glyph-count-matches: 'Number of glyphs that mappings are
+    provided for. Must match the number of glyphs in the the font file.'
+
+    The constructed Format 1 table is otherwise well-formed: maxEntryIndex and
+    maxGlyphMapEntryIndex are both 0, the Glyph Map has firstMappedGlyph equal to
+    glyphCount so the entryIndex array is empty (all font glyphs are implicitly
+    mapped to entry 0), and a valid URL template and patchFormat are provided.
+    The only defect is the glyphCount value, so a conforming client must detect
+    the mismatch in step 1 of Interpret Format 1 Patch Map and reject the font.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+
+    # Preserve the original compatibilityId so the only defect is glyphCount.
+    compatibility_id = PatchMapFormat2(nft.getIFTTableData()).compatibilityId
+
+    num_glyphs = nft.font["maxp"].numGlyphs
+    bad_glyph_count = num_glyphs + 90  # any value != num_glyphs
+
+    # firstMappedGlyph = bad_glyph_count makes entryIndex[glyphCount - firstMappedGlyph]
+    # zero-length. The URL template is the id32 insertion opcode (0x80), then literal
+    # ".ift_tk" (length 7), matching the patch file naming used elsewhere in this
+    # test suite (e.g. "04.ift_tk").
+    patchMap = PatchMapFormat1(
+        compatibilityId=compatibility_id,
+        glyphCount=bad_glyph_count,                   # INVALID
+        urlTemplate=bytes([0x80, 7]) + b".ift_tk",
+        patchFormat=1,                                # table keyed, full invalidation
+        firstMappedGlyph=bad_glyph_count,
+    )
+    nft.setIFTTableData(patchMap.compile())
+    nft.writeTestIFTFile()
+
+
+testTag = "conform-format1-glyph-count-matches"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Format 1 patch map with glyphCount that does not match the font",
+    description="The IFT table uses Format 1 with a glyphCount field set to a value "
+                "that does not match the number of glyphs in the font (maxp.numGlyphs). "
+                "A conforming client must detect the mismatch during Interpret Format 1 "
+                "Patch Map and reject the font.",
+    shouldShowIFT=False,
+    credits=[dict(title="Takeru Suzuki", role="author", link="https://github.com/terkel")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithFormat1MismatchedGlyphCount,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithFormat1InvalidPatchFormat(fontFormat, testName):
+    """
+    Replace the Format 2 IFT table with a Format 1 patch map whose
+    patchFormat field is set to 0, which is not one of the values from §6.1
+    Formats Summary (valid values are 1, 2, 3).
+
+    Tests conform-format1-valid-format-number: 'Must be set to one of the format
+    numbers from the §6.1 Formats Summary table.'
+
+    The constructed Format 1 table is otherwise well-formed (correct glyphCount,
+    null featureMap, empty entryIndex array since all font glyphs map to entry 0
+    implicitly); the only defect is the invalid patchFormat value, so a conforming
+    client must reject the font.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+
+    compatibility_id = PatchMapFormat2(nft.getIFTTableData()).compatibilityId
+
+    num_glyphs = nft.font["maxp"].numGlyphs
+
+    # firstMappedGlyph = glyphCount makes entryIndex[] zero-length, so every
+    # glyph is implicitly mapped to entry 0.
+    patchMap = PatchMapFormat1(
+        compatibilityId=compatibility_id,
+        glyphCount=num_glyphs,
+        urlTemplate=bytes([0x80, 7]) + b".ift_tk",
+        patchFormat=0,                                # INVALID
+        firstMappedGlyph=num_glyphs,
+    )
+    nft.setIFTTableData(patchMap.compile())
+    nft.writeTestIFTFile()
+
+
+testTag = "conform-format1-valid-format-number"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Format 1 patch map with invalid patchFormat value",
+    description="The IFT table uses Format 1 with a patchFormat field set to 0, "
+                "which is not one of the format numbers listed in the §6.1 Formats "
+                "Summary table (valid values are 1, 2, and 3). A conforming client "
+                "must reject the font.",
+    shouldShowIFT=False,
+    credits=[dict(title="Takeru Suzuki", role="author", link="https://github.com/terkel")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithFormat1InvalidPatchFormat,
+    funcArgs=(identifierString,)
+)
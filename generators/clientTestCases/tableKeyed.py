@@ -0,0 +1,81 @@
+"""
+Table keyed patch format tests.
+"""
+
+import os
+import glob
+from testCaseGeneratorLib.constants import IFT_FONT_FILENAME
+from testCaseGeneratorLib.iftFile import IFTFile
+from testCaseGeneratorLib.registry import writeTest
+from testCaseGeneratorLib.tableKeyedPatch import TableKeyedPatch
+
+testType = "client"
+
+
+def makeIFTWithInvalidTableKeyedPatchFormat(fontFormat, testName):
+    """Modify all table keyed patch files to have an invalid format tag.
+
+    Per the spec (§6.2 Table Keyed), the format field of a table keyed patch
+    must be set to 'iftk'. This test sets it to 'XXXX' so the client should
+    reject the patch during step 2 of Apply table keyed patch.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    nft.getIFTTableData()
+
+    # Modify all _tk patch files in the test directory to have an invalid format tag
+    destDir = os.path.join(nft.testDirectory, fontFormat)
+    for tkFile in glob.glob(os.path.join(destDir, "*_tk")):
+        patch = TableKeyedPatch.fromFile(tkFile)
+        # The format Tag must be 'iftk'. Replace with an invalid value.
+        patch.format = b'XXXX'
+        patch.save(tkFile)
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-table-keyed-format-equals-iftk"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Table keyed patch with invalid format tag",
+    description="The table keyed patch format field is set to an invalid value (not 'iftk'). The client must reject the patch.",
+    shouldShowIFT=False,
+    credits=[dict(title="Dileep Maurya", role="author", link="https://github.com/dmaurya-edge")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithInvalidTableKeyedPatchFormat,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithUnsortedTableKeyedPatchOffsets(fontFormat, testName):
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    nft.getIFTTableData()
+    nft.writeTestIFTFile()
+
+    # Modify the _tk patch files in the test directory to have unsorted offsets
+    tkDir = os.path.join(nft.testDirectory, fontFormat)
+    for tkPath in glob.glob(os.path.join(tkDir, "*_tk")):
+        patch = TableKeyedPatch.fromFile(tkPath)
+        if len(patch.offsets) < 2:
+            continue
+
+        # Reverse the offsets so they are no longer in ascending order. The
+        # records are untouched, so they are written back as they are.
+        patch.offsets.reverse()
+        patch.save(tkPath)
+
+testTag = "conform-table-keyed-patches-sort-ascending"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF","CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Table keyed patch with unsorted offsets",
+    description="The patches offsets array in the table keyed patch is not sorted in ascending order.",
+    shouldShowIFT=False,
+    credits=[dict(title="Takeru Suzuki", role="author", link="https://github.com/terkel")],
+    specLink= "#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithUnsortedTableKeyedPatchOffsets,
+    funcArgs=(identifierString,)
+)
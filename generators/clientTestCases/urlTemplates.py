@@ -0,0 +1,260 @@
+"""
+URL template expansion and patch naming (id32/id64 entry id) tests.
+"""
+
+import os
+import glob
+import shutil
+from testCaseGeneratorLib.constants import IFT_FONT_FILENAME
+from testCaseGeneratorLib.paths import buildDirectory
+from testCaseGeneratorLib.iftFile import IFTFile
+from testCaseGeneratorLib.helpers import (
+    decode_id32_to_int,
+    id32_no_strip,
+    replace_format2_url_template,
+    compute_id64_file_name,
+    compute_id64_no_strip,
+)
+from testCaseGeneratorLib.patchMapFormat2 import URL_TEMPLATE_OFFSET
+from testCaseGeneratorLib.registry import writeTest
+from testCaseGeneratorLib.staging import stageTree, testCaseDirectory
+
+testType = "client"
+
+
+def makeIFTWithUnstrippedId32PatchNames(fontFormat, testName):
+    """
+    Rename patch files to use the un-stripped (wrong) id32 encoding, then verify
+    that a correct client (which DOES strip leading zeros) cannot find them.
+
+    Tests conform-entry-id-must-be-converted: 'When entry ID is an unsigned integer
+    it must first be converted to a big endian 32 bit unsigned integer, but then all
+    leading bytes that are equal to 0 are removed before encoding.'
+
+    Patches are renamed from the correctly-stripped id32 names (e.g. '04.ift_tk'
+    for entry 1) to the incorrectly un-stripped 4-byte id32 names (e.g.
+    '0000008.ift_tk' for entry 1). A conforming client computes '04.ift_tk' for
+    entry 1, which no longer exists, so it cannot load the font.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+
+    dest_dir = os.path.join(nft.testDirectory, fontFormat)
+    # Rename each *.ift_tk from its correct id32 name to the un-stripped variant
+    for old_path in glob.glob(os.path.join(dest_dir, "*_tk")):
+        old_basename = os.path.basename(old_path)
+        id32_part = old_basename.replace(".ift_tk", "")
+        # Only rename files whose names are valid base32hex (id32-encoded)
+        if not all(c in "0123456789ABCDEFGHIJKLMNOPQRSTUV" for c in id32_part.upper()):
+            continue
+        entry_id = decode_id32_to_int(id32_part)
+        wrong_name = id32_no_strip(entry_id) + ".ift_tk"
+        shutil.move(old_path, os.path.join(dest_dir, wrong_name))
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-entry-id-must-be-converted"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="URL template id32 must strip leading zero bytes from integer entry IDs",
+    description="Patch files are stored at the un-stripped base32hex names "
+                "(e.g. '0000008.ift_tk' for entry 1). A conforming client strips "
+                "leading zero bytes and looks for '04.ift_tk', which does not exist, "
+                "so the IFT font cannot be loaded.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithUnstrippedId32PatchNames,
+    funcArgs=(identifierString,)
+)
+
+
+def madeIFTwithInvalidOpCodeInURLTemplate(fontFormat, testName, url_template_bytes):
+    """Embed invalid URL template bytes per negative examples in §5.3.3 URL Templates."""
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    iftData = nft.getIFTTableData()
+    iftData = replace_format2_url_template(iftData, bytes(url_template_bytes))
+    nft.setIFTTableData(bytes(iftData))
+    nft.writeTestIFTFile()
+
+# https://www.w3.org/TR/IFT/#example-305f10ca example of negative tests
+_url_template_negative_tests = [
+    (
+        "invalid-opcode-150",
+        "URL template with invalid op code 150",
+        "Expand URL Template must return an error when the template contains op code 150 (not in the op code table).",
+        [4, *map(ord, "foo/"), 150],
+    ),
+    (
+        "opcode-zero",
+        "URL template with invalid literal op code 0",
+        "Expand URL Template must return an error when a literal op code requests 0 bytes (op code 0 is invalid).",
+        [4, *map(ord, "foo/"), 0, 128],
+    ),
+    (
+        "literal-insufficient-bytes",
+        "URL template with literal op code requesting too few bytes",
+        "Expand URL Template must return an error when a literal op code requests 10 bytes but fewer remain in the template.",
+        [10, *map(ord, "foo/"), 128],
+    ),
+    (
+        "literal-invalid-utf8",
+        "URL template with invalid UTF-8 literal",
+        "Expand URL Template must return an error when literal bytes are not valid UTF-8.",
+        [4, *map(ord, "foo/"), 0x85, 128],
+    ),
+]
+
+for suffix, title, description, template_bytes in _url_template_negative_tests:
+    identifier_string = "%s-url-templates_%s" % (testType, suffix)
+    writeTest(
+        identifier=identifier_string,
+        title=title,
+        description=description,
+        shouldShowIFT=False,
+        credits=[dict(title="Yongji Chen", role="author", link="https://github.com/yChenMonotype")],
+        specLink="#url-templates",
+        fontFormats=["GLYF", "CFF"],
+        func=madeIFTwithInvalidOpCodeInURLTemplate,
+        funcArgs=(identifier_string, bytes(template_bytes)),
+    )
+
+
+def madeIFTWithCustomURLTemplate(fontFormat, testName):
+    testDirectory = testCaseDirectory(testName)
+    # stage build/URL_TEMPLATE/IFT/{fontFormat} into the test directory if not exists
+    if not os.path.exists(os.path.join(testDirectory, fontFormat)):
+        stageTree(os.path.join(buildDirectory, "URL_TEMPLATE", "IFT", fontFormat), os.path.join(testDirectory, fontFormat))
+    # rename the font.ift.woff2 file to myfont-mod.ift.woff2 if exists
+    if os.path.exists(os.path.join(testDirectory, fontFormat, "font.ift.woff2")):
+        os.rename(os.path.join(testDirectory, fontFormat, "font.ift.woff2"), os.path.join(testDirectory, fontFormat, "myfont-mod.ift.woff2"))
+
+testTag = "url-template-prefix"
+identifierString= "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="Override URL template prefix",
+    description=f"The URL template prefix is overridden to a custom value. For example, setting the url template prefix to '\\x08patches/\\x80'will cause the client to look for patches(.ift_tk and .ift_gk) in the 'patches' directory in relative to the font.ift.woff2 file.",
+    shouldShowIFT=True,
+    credits=[dict(title="Yongji Chen", role="author", link="https://github.com/yChenMonotype")],
+    specLink="#url-templates",
+    fontFormats=fontFormats,
+    func=madeIFTWithCustomURLTemplate,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithId64OpcodeRenamedPatches(fontFormat, testName):
+    """
+    Switch the URL template opcode to id64 (0x85) and rename patch files to
+    use base64url names with '=' padding (e.g. 'AQ==.ift_tk' for entry 1).
+
+    Tests conform-equal-sign-encoded: 'Because the padding character is =,
+    it must be URL-encoded as %3D.'
+
+    A conforming client:
+      1. Computes the id64 name for entry 1: [0x01] -> base64url -> 'AQ=='
+      2. URL-encodes '=' as '%3D' -> requests 'AQ%3D%3D.ift_tk'
+      3. The static server decodes '%3D' -> '=' and serves 'AQ==.ift_tk'
+      4. The IFT font loads successfully.
+
+    This is a positive test (shouldShowIFT=True): a conforming client can load
+    the font, so 'P' renders as PASS via the IFT font. A non-conforming client
+    that requests 'AQ==.ift_tk' directly also resolves to the same file on a
+    standard server, so this test primarily validates the id64 opcode path
+    end-to-end.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    raw = nft.getIFTTableData()
+    # Change opcode from 0x80 (Insert id32) to 0x85 (Insert id64)
+    raw[URL_TEMPLATE_OFFSET] = 0x85
+    nft.setIFTTableData(bytes(raw))
+
+    # Rename *.ift_tk files from id32 names to id64 names (with '=' padding)
+    dest_dir = os.path.join(nft.testDirectory, fontFormat)
+    for old_path in glob.glob(os.path.join(dest_dir, "*_tk")):
+        old_basename = os.path.basename(old_path)
+        id32_part = old_basename.replace(".ift_tk", "")
+        if not all(c in "0123456789ABCDEFGHIJKLMNOPQRSTUV" for c in id32_part.upper()):
+            continue
+        entry_id = decode_id32_to_int(id32_part)
+        id64_name = compute_id64_file_name(entry_id) + ".ift_tk"
+        shutil.move(old_path, os.path.join(dest_dir, id64_name))
+
+    nft.writeTestIFTFile()
+
+testTag = "conform-equal-sign-encoded"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="URL template id64 base64url '=' padding must be URL-encoded as %3D",
+    description="The URL template uses the id64 opcode (0x85). Patch files are "
+                "named with base64url '=' padding (e.g. 'AQ==.ift_tk' for entry 1). "
+                "A conforming client URL-encodes '=' as '%3D' and requests "
+                "'AQ%3D%3D.ift_tk'. The server decodes '%3D' to '=' and serves "
+                "'AQ==.ift_tk', allowing the IFT font to load successfully.",
+    shouldShowIFT=True,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithId64OpcodeRenamedPatches,
+    funcArgs=(identifierString,)
+)
+
+
+def makeIFTWithUnstrippedId64PatchNames(fontFormat, testName):
+    """
+    Switch the URL template opcode to id64 (0x85) and rename patch files to
+    use the un-stripped 4-byte base64url encoding.
+
+    Tests conform-entry-id-converted (id64 variant):
+    'When entry ID is an unsigned integer it must first be converted to a big
+    endian 32 bit unsigned integer, but then all leading bytes that are equal
+    to 0 are removed before encoding.'
+
+    Patches are renamed from the correctly-stripped id64 names (e.g. 'AQ==.ift_tk'
+    for entry 1) to the incorrectly un-stripped 4-byte base64url names (e.g.
+    'AAAAAQ==.ift_tk' for entry 1). A conforming client strips leading zero bytes
+    and looks for 'AQ==.ift_tk' (URL-encoded as 'AQ%3D%3D.ift_tk'), which does
+    not exist, so the IFT font cannot be loaded.
+    """
+    nft = IFTFile(testName, fontFormat, IFT_FONT_FILENAME)
+    raw = nft.getIFTTableData()
+    raw[URL_TEMPLATE_OFFSET] = 0x85  # id64 opcode
+    nft.setIFTTableData(bytes(raw))
+
+    dest_dir = os.path.join(nft.testDirectory, fontFormat)
+    for old_path in glob.glob(os.path.join(dest_dir, "*_tk")):
+        old_basename = os.path.basename(old_path)
+        id32_part = old_basename.replace(".ift_tk", "")
+        if not all(c in "0123456789ABCDEFGHIJKLMNOPQRSTUV" for c in id32_part.upper()):
+            continue
+        entry_id = decode_id32_to_int(id32_part)
+        wrong_name = compute_id64_no_strip(entry_id) + ".ift_tk"
+        shutil.move(old_path, os.path.join(dest_dir, wrong_name))
+
+    nft.writeTestIFTFile()
+
+
+testTag = "conform-entry-id-converted"
+identifierString = "%s-%s" % (testType, testTag)
+fontFormats = ["GLYF", "CFF"]
+writeTest(
+    identifier=identifierString,
+    title="URL template id64 must strip leading zero bytes from integer entry IDs",
+    description="The URL template uses the id64 opcode (0x85). Patch files are stored "
+                "at the un-stripped 4-byte base64url names (e.g. 'AAAAAQ==.ift_tk' for "
+                "entry 1). A conforming client strips leading zero bytes and looks for "
+                "'AQ==.ift_tk' (URL-encoded as 'AQ%3D%3D.ift_tk'), which does not exist, "
+                "so the IFT font cannot be loaded.",
+    shouldShowIFT=False,
+    credits=[dict(title="Scott Treude", role="author", link="http://treude.com")],
+    specLink="#%s" % identifierString,
+    fontFormats=fontFormats,
+    func=makeIFTWithUnstrippedId64PatchNames,
+    funcArgs=(identifierString,)
+)
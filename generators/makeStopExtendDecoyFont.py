@@ -32,7 +32,7 @@ other test are completely untouched. Output:
 
 The decoy codepoint (U+E000) is placed off-screen in the test's HTML (see
 the extraHTML for conform-stop-extend-after-errors in
-ClientTestCaseGenerator.py) using absolute positioning rather than
+clientTestCases/stopExtend.py) using absolute positioning rather than
 display:none/visibility:hidden, because element.innerText -- which is what
 determines the codepoints requested for extension (see resources/ift.js) --
 omits text from elements that are not rendered at all.
@@ -0,0 +1,91 @@
+// The script of shards.xht, which links the shard pages of the suite (see
+// testCaseGeneratorLib/shards.py). It can open every shard in its own tab,
+// passing on this page's settings (?concurrency, ?workers, ...), and
+// merges the reports the shard pages post to the "ift-reports"
+// BroadcastChannel into one report of the whole suite, the same as
+// MergeReports.py does with downloaded shard reports.
+//
+// window.iftReport resolves with the merged report once every shard has
+// reported.
+
+let resolve_report;
+window.iftReport = new Promise(resolve => { resolve_report = resolve; });
+
+const reports = new Map();
+let shard_count = 0;
+let status = null;
+
+// See shards.mergeReports.
+function merge_reports() {
+  let shard_reports = Array.from(reports.keys()).sort((a, b) => a - b).map(index => reports.get(index));
+  let tests = shard_reports.flatMap(report => report.tests);
+  let summary = { tests: tests.length, loaded: 0, errors: 0, timeouts: 0, time: 0, requests: 0, bytes: 0 };
+  for (let record of tests) {
+    summary[{ loaded: 'loaded', error: 'errors', timeout: 'timeouts' }[record.status]]++;
+    summary.requests += record.requests;
+    summary.bytes += record.bytes;
+  }
+  // The shards run side by side, so the suite takes as long as the slowest.
+  summary.time = Math.max(0, ...shard_reports.map(report => report.summary.time));
+  let shards = shard_reports.map(report => {
+    let details = Object.assign({}, report);
+    delete details.version;
+    delete details.tests;
+    return details;
+  });
+  return { version: 1, shards, summary, tests };
+}
+
+function open_shards() {
+  for (let link of document.querySelectorAll('a[data-shard]')) {
+    let url = new URL(link.getAttribute('href'), document.baseURI);
+    url.search = window.location.search;
+    window.open(url.href, `ift-shard-${link.dataset.shard}`);
+  }
+}
+
+function update_status() {
+  status.textContent = `${reports.size} of ${shard_count} shards reported. `;
+  if (reports.size == 0) {
+    let button = document.createElement('button');
+    button.textContent = 'Open all shards';
+    button.onclick = open_shards;
+    status.append(button);
+    return;
+  }
+  let report = merge_reports();
+  let s = report.summary;
+  status.append(`${s.tests} tests: ${s.loaded} loaded, ${s.errors} errors, ${s.timeouts} timed out; `
+    + `${s.requests} requests, ${s.bytes} bytes in ${Math.round(s.time)} ms. `);
+  let blob = new Blob([JSON.stringify(report, null, 1)], { type: 'application/json' });
+  let link = document.createElement('a');
+  link.href = URL.createObjectURL(blob);
+  link.download = 'ift-report.json';
+  link.textContent = 'Download the merged report (JSON)';
+  status.append(link);
+  if (reports.size == shard_count) {
+    resolve_report(report);
+  }
+}
+
+window.addEventListener('DOMContentLoaded', function () {
+  let links = document.querySelectorAll('a[data-shard]');
+  shard_count = links.length;
+  status = document.createElement('div');
+  status.className = 'mainNote';
+  status.id = 'ift-report';
+  document.querySelector('ol.shards').after(status);
+  update_status();
+
+  let channel = new BroadcastChannel('ift-reports');
+  channel.onmessage = (event) => {
+    let report = event.data;
+    if (!report.shard || report.shard.count != shard_count) {
+      return;
+    }
+    reports.set(report.shard.index, report);
+    let link = document.querySelector(`a[data-shard="${report.shard.index}"]`);
+    link.parentElement.setAttribute('data-ift-progress', 'done');
+    update_status();
+  };
+});
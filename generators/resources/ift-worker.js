@@ -0,0 +1,311 @@
+// A worker of the ift.js pool. It owns its own instances of the IFT client
+// (rust-client) and of the WOFF2 decoder (cc-client), extends fonts on
+// request and transfers the finished font data back to the page:
+//
+//   request:  { id, font_url, cps, features, axes: [[tag, value], ...] }
+//   response: { id, data: ArrayBuffer, metrics } or { id, error }
+//
+// Once the client is loaded the worker also posts
+//   { type: "ready", startup: { source, time } } or { type: "ready", error }
+// where source is "network" for a cold start or "cache" for a warm one.
+//
+// font_url must be absolute, relative URLs would resolve against this
+// script rather than the page. Its ?v= version, if any, is also put on the
+// patch requests of the test, see versioned_fetch.
+
+importScripts('cc-client/brotli.js');
+
+// The rust client looks up fetch through web_sys::Window. A worker's global
+// scope has the same fetch, so let it pass for a Window.
+if (typeof self.Window === 'undefined') {
+  self.Window = self.constructor;
+}
+
+// The version of each test directory being extended, from the ?v= of its
+// font URL (see suiteManifest.fontVersions). The client resolves patch URLs
+// against the font URL without its query, so the version is put back on
+// every request under the test's directory here: patches are cached along
+// with the font, and a changed font or patch is always refetched.
+const directory_versions = new Map();
+const unversioned_fetch = self.fetch.bind(self);
+
+function versioned_fetch(input, init) {
+  let url = new URL(input instanceof Request ? input.url : input, self.location.href);
+  if (!url.searchParams.has('v')) {
+    for (let [directory, version] of directory_versions) {
+      if (url.href.startsWith(directory)) {
+        url.searchParams.set('v', version);
+        input = input instanceof Request ? new Request(url.href, input) : url.href;
+        break;
+      }
+    }
+  }
+  return unversioned_fetch(input, init);
+}
+self.fetch = versioned_fetch;
+
+// The sha256 of rust_client_bg.wasm, passed by the page as ?wasm=HASH (the
+// generator writes it into the index). It keys the compiled client in
+// IndexedDB, so a new build of the client is never mistaken for a cached
+// one.
+const wasm_hash = new URL(self.location.href).searchParams.get('wasm');
+const wasm_url = new URL('rust-client/pkg/rust_client_bg.wasm', self.location.href);
+if (wasm_hash) {
+  wasm_url.searchParams.set('v', wasm_hash);
+}
+
+function idb_request(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function open_cache() {
+  let request = indexedDB.open('ift-harness', 1);
+  request.onupgradeneeded = () => request.result.createObjectStore('wasm');
+  return idb_request(request);
+}
+
+async function sha256_hex(bytes) {
+  let digest = new Uint8Array(await crypto.subtle.digest('SHA-256', bytes));
+  return Array.from(digest, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Returns { module, source }: the compiled client and where it came from,
+// "network" (a cold start) or "cache" (a warm start).
+//
+// The compiled WebAssembly.Module is stored in IndexedDB where the browser
+// allows it. Browsers that can't serialize modules get the wasm bytes
+// stored instead, which still saves the download; their compile step is
+// then left to the engine's own code cache.
+async function load_wasm_module() {
+  let db = null;
+  if (wasm_hash && typeof indexedDB !== 'undefined') {
+    try {
+      db = await open_cache();
+      let cached = await idb_request(db.transaction('wasm').objectStore('wasm').get(wasm_hash));
+      if (cached instanceof WebAssembly.Module) {
+        return { module: cached, source: 'cache' };
+      }
+      if (cached) {
+        return { module: await WebAssembly.compile(cached), source: 'cache' };
+      }
+    } catch (e) {
+      console.warn('IFT worker: wasm cache unavailable:', e);
+    }
+  }
+
+  let response = await fetch(wasm_url);
+  let bytes_promise = response.clone().arrayBuffer();
+  let module;
+  try {
+    module = await WebAssembly.compileStreaming(response);
+  } catch (e) {
+    // e.g. the server doesn't send application/wasm
+    module = await WebAssembly.compile(await bytes_promise);
+  }
+
+  if (db) {
+    try {
+      let bytes = await bytes_promise;
+      if (await sha256_hex(bytes) === wasm_hash) {
+        let store = async (value) => idb_request(db.transaction('wasm', 'readwrite').objectStore('wasm').put(value, wasm_hash));
+        await store(module).catch(() => store(bytes));
+      }
+    } catch (e) {
+      console.warn('IFT worker: failed to cache the wasm:', e);
+    }
+  }
+  return { module, source: 'network' };
+}
+
+// WOFF2 decoding, memoized for the life of the worker: many tests start
+// from the same font, so it is only decoded once. The decoder is called
+// synchronously from wasm, so entries are found by a cheap FNV-1a hash of
+// the input and confirmed by comparing the bytes. Only the most recently
+// used WOFF2_CACHE_SIZE fonts are kept, so memory doesn't grow with the
+// number of tests.
+const WOFF2_CACHE_SIZE = 8;
+const woff2_cache = new Map();
+const woff2_stats = { hits: 0, misses: 0 };
+
+function fnv1a(bytes) {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < bytes.length; i++) {
+    hash = Math.imul(hash ^ bytes[i], 0x01000193);
+  }
+  return `${bytes.length}:${hash >>> 0}`;
+}
+
+function equal_bytes(a, b) {
+  if (a.length != b.length) {
+    return false;
+  }
+  for (let i = 0; i < a.length; i++) {
+    if (a[i] != b[i]) {
+      return false;
+    }
+  }
+  return true;
+}
+
+function memoized_woff2_decoder(woff2) {
+  return {
+    unwoff2: (encoded) => {
+      let key = fnv1a(encoded);
+      let entry = woff2_cache.get(key);
+      if (entry && equal_bytes(entry.encoded, encoded)) {
+        woff2_stats.hits++;
+        // Move it to the most recently used end.
+        woff2_cache.delete(key);
+        woff2_cache.set(key, entry);
+        return entry.decoded;
+      }
+      woff2_stats.misses++;
+      let decoder = new woff2.Woff2Decoder(encoded);
+      let decoded;
+      try {
+        // encoded is a view of the client's memory and the decoded data
+        // may be one of the decoder's, so both are copied.
+        decoded = decoder.data().slice();
+      } finally {
+        decoder.delete();
+      }
+      woff2_cache.delete(key);
+      woff2_cache.set(key, { encoded: encoded.slice(), decoded });
+      if (woff2_cache.size > WOFF2_CACHE_SIZE) {
+        woff2_cache.delete(woff2_cache.keys().next().value);
+      }
+      return decoded;
+    }
+  };
+}
+
+const client = (async () => {
+  let start = performance.now();
+  const woff2 = await createModule();
+  const rust = await import('./rust-client/pkg/rust_client.js');
+  const { module, source } = await load_wasm_module();
+  const wasm = await rust.default({ module_or_path: module });
+  let startup = { source, time: performance.now() - start };
+  self.postMessage({ type: 'ready', startup });
+  return {
+    IftState: rust.IftState,
+    memory: wasm.memory,
+    woff2_decoder: memoized_woff2_decoder(woff2),
+  };
+})();
+client.catch(e => self.postMessage({ type: 'ready', error: String(e) }));
+
+// The IftState of each font being extended. A state is freed as soon as its
+// font has been copied out, so the client's memory is reused from test to
+// test rather than growing with the size of the suite.
+let states = {};
+
+// Patch requests are timed with Resource Timing. Entries are collected as
+// they arrive, and each test takes its own out once it's done, so the cost
+// of a test and the memory held don't grow with the number of tests run.
+// The Resource Timing buffer itself is cleared, the observer sees every
+// entry regardless.
+let resource_entries = [];
+const resource_observer = new PerformanceObserver((list) => {
+  resource_entries.push(...list.getEntries());
+  performance.clearResourceTimings();
+});
+resource_observer.observe({ type: 'resource' });
+
+// The requests made for files under directory (the test's own directory):
+// their count, the bytes transferred and their URLs. transferSize is 0 for
+// cached and cross-origin responses, so encodedBodySize is used instead
+// where it's known. The entries are removed once counted.
+function resource_metrics(directory) {
+  // Entries not yet delivered to the observer.
+  resource_entries.push(...resource_observer.takeRecords());
+  let metrics = { requests: 0, bytes: 0, urls: [] };
+  resource_entries = resource_entries.filter(entry => {
+    if (!entry.name.startsWith(directory)) {
+      return true;
+    }
+    metrics.requests++;
+    metrics.bytes += entry.transferSize || entry.encodedBodySize || 0;
+    metrics.urls.push(entry.name);
+    return false;
+  });
+  return metrics;
+}
+
+// Extends the font and returns { data, metrics }, see ift.js for metrics.
+async function patch_codepoints(font_id, cps, features, axes) {
+  const { IftState, memory, woff2_decoder } = await client;
+  let start = performance.now();
+  performance.mark(`ift:${font_id}:start`);
+  let decode_time = 0;
+  let decoder = {
+    unwoff2: (encoded) => {
+      let decode_start = performance.now();
+      try {
+        return woff2_decoder.unwoff2(encoded);
+      } finally {
+        decode_time += performance.now() - decode_start;
+      }
+    }
+  };
+
+  if (!states[font_id]) {
+    states[font_id] = IftState.new(font_id);
+  }
+  let state = states[font_id];
+  let directory = new URL('.', font_id).href;
+  let version = new URL(font_id).searchParams.get('v');
+  if (version) {
+    directory_versions.set(directory, version);
+  }
+
+  let data;
+  let metrics;
+  try {
+    for (const [tag, point] of axes) {
+      state.add_design_space_to_target_subset_definition(tag, point, point);
+    }
+
+    for (const tag of features) {
+      state.add_feature_to_target_subset_definition(tag);
+    }
+
+    state.add_to_target_subset_definition(cps);
+    let font = await state.current_font_subset(decoder);
+    try {
+      // Copy the font out of the wasm memory so it can be transferred.
+      data = new Uint8Array(memory.buffer, font.data(), font.len()).slice().buffer;
+    } finally {
+      font.free();
+    }
+    performance.measure(`ift:${font_id}:extend`, `ift:${font_id}:start`);
+  } finally {
+    delete states[font_id];
+    state.free();
+    directory_versions.delete(directory);
+    performance.clearMarks(`ift:${font_id}:start`);
+    // Taken even if the test failed, so its entries aren't kept.
+    metrics = resource_metrics(directory);
+  }
+
+  metrics.extend_time = performance.now() - start;
+  metrics.decode_time = decode_time;
+  metrics.font_bytes = data.byteLength;
+  // wasm memory never shrinks, so its size is the worker's high-water mark.
+  metrics.wasm_heap_bytes = memory.buffer.byteLength;
+  metrics.woff2_cache = Object.assign({}, woff2_stats);
+  return { data, metrics };
+}
+
+self.onmessage = async (event) => {
+  const { id, font_url, cps, features, axes } = event.data;
+  try {
+    let { data, metrics } = await patch_codepoints(font_url, Uint32Array.from(cps), features, axes);
+    self.postMessage({ id, data, metrics }, [data]);
+  } catch (e) {
+    self.postMessage({ id, error: String(e) });
+  }
+};
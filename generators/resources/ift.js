@@ -1,88 +1,476 @@
-import init, { IftState } from './rust-client/pkg/rust_client.js';
+// How many tests are extended at once, and how long (ms) a single test may
+// take before it is reported as timed out, so that the page's results don't
+// wait on a hung patch fetch. A timed out test still counts against the
+// concurrency until its worker request settles, so slow tests can't pile
+// up in the workers. Both can be overridden from the page URL, for example
+// testcaseindex.xht?concurrency=1&timeout=60000
+const DEFAULT_CONCURRENCY = 6;
+const DEFAULT_TEST_TIMEOUT = 30000;
 
-let states = {};
-async function update_all_fonts() {
-  // Get all elements with class 'result'
-  const resultElements = document.getElementsByClassName('result');
-  for (let el of resultElements) {
-    let test_name = el.id.replace(/^[^-]+-/, ''); // remove format prefix
-    console.log("Processing test:", test_name);
-    let font_format = el.getAttribute('data-format');
-    let rndNum = Math.floor(Math.random() * 100000); // to break caching
-    let title_font = `${test_name}/${font_format}/myfont-mod.ift.woff2?v=${rndNum}`;
-    let title_text = document.getElementById(test_name).innerText;
-    let font_name = font_format + "-" + test_name + "-IFT-Font";
-    // check to see if element contains pass or fail class
-    let fallback_font_name = "RobotoFallback";
-    el.style.fontFamily = `${font_name}, ${fallback_font_name}`;
-    try {
-      let p1 = update_fonts(title_text,
-        title_font,
-        font_name,
-        [],
-        {});
-      let f1 = await p1;
-      document.fonts.add(f1);
-    } catch (e) {
-      console.error(`Error updating font for ${test_name} (${font_format}):`, e);
-      continue; // Skip to the next element
+function int_param(name, default_value) {
+  let value = parseInt(new URLSearchParams(window.location.search).get(name), 10);
+  return value > 0 ? value : default_value;
+}
+
+const concurrency = int_param('concurrency', DEFAULT_CONCURRENCY);
+const test_timeout = int_param('timeout', DEFAULT_TEST_TIMEOUT);
+
+// The IFT client runs in a pool of workers (see ift-worker.js), so WOFF2
+// decoding and patch application never block the page. Override the pool
+// size with ?workers=N.
+const DEFAULT_WORKERS = Math.min(navigator.hardwareConcurrency || 2, 4);
+const worker_count = int_param('workers', DEFAULT_WORKERS);
+
+// Resolves with one record per test (and font format) once every test has
+// finished, for automation:
+//   {
+//     test, format,
+//     status: "loaded" | "error" | "timeout", error,
+//     time,             // wall time of the test, ms
+//     requests, bytes,  // fetches of the test's files and bytes transferred
+//     urls,             // the URLs fetched
+//     font_bytes,       // size of the extended font
+//     wasm_heap_bytes,  // the worker's wasm memory size afterwards
+//     woff2_cache,      // { hits, misses } of the worker's WOFF2 decodes
+//     phases: { extend, worker_extend, decode, load },  // ms
+//   }
+// The same records are also sent as the detail of an "ift-tests-complete"
+// event on document. window.iftReport resolves with the full report, which
+// can also be downloaded from the page once the tests finish. Each phase is
+// also recorded as a performance measure named "ift:<format>-<test>:<phase>"
+// (the workers record theirs in their own timelines).
+let resolve_results;
+window.iftResults = new Promise(resolve => { resolve_results = resolve; });
+let resolve_report;
+window.iftReport = new Promise(resolve => { resolve_report = resolve; });
+
+class WorkerPool {
+  constructor(size) {
+    this.workers = [];
+    this.next_id = 0;
+    for (let i = 0; i < size; i++) {
+      let worker_url = new URL('ift-worker.js', import.meta.url);
+      if (wasm_hash) {
+        worker_url.searchParams.set('wasm', wasm_hash);
+      }
+      let worker = new Worker(worker_url);
+      worker.pending = new Map();
+      worker.onmessage = (event) => {
+        if (event.data.type == 'ready') {
+          report_startup(i, event.data);
+          return;
+        }
+        const { id, data, metrics, error } = event.data;
+        let request = worker.pending.get(id);
+        worker.pending.delete(id);
+        if (error !== undefined) {
+          request.reject(new Error(error));
+        } else {
+          request.resolve({ data, metrics });
+        }
+      };
+      worker.onerror = (event) => {
+        // The worker failed to load: fail everything queued on it, and
+        // stop using it.
+        worker.failure = `IFT worker error: ${event.message}`;
+        for (let request of worker.pending.values()) {
+          request.reject(new Error(worker.failure));
+        }
+        worker.pending.clear();
+      };
+      this.workers.push(worker);
     }
   }
+
+  // Extend the font at font_url (absolute) in the least busy worker.
+  // Resolves with { data, metrics }: the font data as an ArrayBuffer and
+  // the worker's measurements, see ift-worker.js.
+  run(font_url, cps, features, axes) {
+    let workers = this.workers.filter(w => !w.failure);
+    if (workers.length == 0) {
+      return Promise.reject(new Error(this.workers[0].failure));
+    }
+    let worker = workers.reduce((a, b) => (b.pending.size < a.pending.size ? b : a));
+    let id = this.next_id++;
+    return new Promise((resolve, reject) => {
+      worker.pending.set(id, { resolve, reject });
+      worker.postMessage({ id, font_url, cps, features, axes: Array.from(axes) });
+    });
+  }
 }
 
-function update_fonts(text, font_id, font_face, features, ds) {
-  let cps = new Set();
-  for (let i = 0; text.codePointAt(i); i++) {
-    cps.add(text.codePointAt(i));
+let pool = null;
+
+// The hash of the IFT client's wasm, which the workers use as the key of
+// their compiled client cache.
+const wasm_hash = document.querySelector('meta[name="ift-wasm-hash"]')?.content;
+
+// On the page of one shard of the suite (see shards.xht) the generator
+// writes "<number>/<count>" into the ift-shard meta element. The shard is
+// recorded in the report, and the report is also posted to the
+// "ift-reports" BroadcastChannel, where shards.xht merges the reports of
+// the shards it opened.
+const shard = (() => {
+  let content = document.querySelector('meta[name="ift-shard"]')?.content;
+  if (!content) {
+    return null;
   }
+  let [index, count] = content.split('/').map(n => parseInt(n, 10));
+  return { index, count };
+})();
 
-  let cps_array = [];
-  for (let cp of cps) {
-    cps_array.push(cp);
+// How long each worker took to load the IFT client, split into cold starts
+// (the wasm was downloaded and compiled) and warm ones (it came from the
+// cache), in ms.
+window.iftStartup = { cold: [], warm: [] };
+
+function report_startup(worker_index, message) {
+  if (message.error !== undefined) {
+    console.error(`IFT worker ${worker_index} failed to load the client:`, message.error);
+    return;
   }
+  let { source, time } = message.startup;
+  let kind = source == 'cache' ? 'warm' : 'cold';
+  window.iftStartup[kind].push(time);
+  console.log(`IFT worker ${worker_index}: ${kind} start in ${time.toFixed(1)} ms`);
+}
 
-  let axes = new Map();
-  for (let [tag, value] of Object.entries(ds)) {
-    axes.set(tag, value);
+// With ?lazy=1 a test only starts when its block approaches the viewport,
+// rather than every test starting on load. The "Run all tests" button (or
+// window.iftRunAll(), for automation) starts the remaining ones.
+// window.iftResults only settles once every test has run, and the report's
+// time then includes the time spent scrolling.
+const lazy = new URLSearchParams(window.location.search).get('lazy') == '1';
+
+// Each result element's data-ift-status is "queued", "running", "loaded",
+// "error" or "timeout", and each test block's data-ift-progress counts its
+// finished fonts; index.css shows both.
+const FINISHED = new Set(['loaded', 'error', 'timeout']);
+
+let scheduler = null;
+
+class Scheduler {
+  constructor(elements) {
+    this.elements = elements;
+    this.indices = new Map(elements.map((el, index) => [el, index]));
+    this.results = new Array(elements.length);
+    this.queue = [];
+    this.scheduled = new Set();
+    this.running = 0;
+    this.finished = 0;
+    this.status = document.createElement('div');
+    this.status.className = 'mainNote';
+    this.status.id = 'ift-status';
+    document.querySelector('h1').after(this.status);
+    for (let el of elements) {
+      update_block_progress(el);
+    }
+    this.update_status();
+  }
+
+  // Queue the tests of the given result elements, in order.
+  schedule(elements) {
+    for (let el of elements) {
+      if (this.scheduled.has(el)) {
+        continue;
+      }
+      this.scheduled.add(el);
+      this.queue.push(el);
+      set_status(el, 'queued');
+    }
+    this.pump();
+  }
+
+  pump() {
+    while (this.running < concurrency && this.queue.length > 0) {
+      let el = this.queue.shift();
+      this.running++;
+      set_status(el, 'running');
+      let { result, settled } = run_test(el);
+      result.then(record => {
+        this.results[this.indices.get(el)] = record;
+        this.finished++;
+        set_status(el, record.status);
+        this.update_status();
+        if (this.finished == this.elements.length) {
+          this.complete();
+        }
+      });
+      settled.then(() => {
+        this.running--;
+        this.pump();
+      });
+    }
+    this.update_status();
+  }
+
+  update_status() {
+    if (this.finished == this.elements.length) {
+      return;
+    }
+    this.status.textContent = `Tests: ${this.finished} of ${this.elements.length} finished, `
+      + `${this.running} running, ${this.queue.length} queued. `;
+    if (this.scheduled.size < this.elements.length) {
+      let button = document.createElement('button');
+      button.textContent = 'Run all tests';
+      button.onclick = () => window.iftRunAll();
+      this.status.append(button);
+    }
+  }
+
+  complete() {
+    let results = this.results;
+    resolve_results(results);
+    document.dispatchEvent(new CustomEvent('ift-tests-complete', { detail: results }));
+    publish_report(make_report(results, performance.now() - page_start), this.status);
+  }
+}
+
+function set_status(el, status) {
+  el.setAttribute('data-ift-status', status);
+  update_block_progress(el);
+}
+
+function update_block_progress(el) {
+  let block = el.closest('.testCase');
+  if (!block) {
+    return;
+  }
+  let results = Array.from(block.getElementsByClassName('result'));
+  let finished = results.filter(r => FINISHED.has(r.getAttribute('data-ift-status'))).length;
+  let progress = finished == results.length ? 'done' : `${finished}/${results.length}`;
+  if (finished < results.length && !results.some(r => r.hasAttribute('data-ift-status'))) {
+    progress = 'not started';
+  }
+  block.setAttribute('data-ift-progress', progress);
+}
+
+function update_all_fonts() {
+  // Get all elements with class 'result'
+  const resultElements = Array.from(document.getElementsByClassName('result'));
+  scheduler = new Scheduler(resultElements);
+  if (resultElements.length == 0) {
+    scheduler.complete();
+    return;
+  }
+
+  window.iftRunAll = () => {
+    if (observer) {
+      observer.disconnect();
+    }
+    scheduler.schedule(resultElements);
+  };
+
+  let observer = null;
+  if (lazy && 'IntersectionObserver' in window) {
+    // Start a test's fonts when its block comes within half a screen of
+    // the viewport.
+    observer = new IntersectionObserver((entries, obs) => {
+      for (let entry of entries) {
+        if (entry.isIntersecting) {
+          obs.unobserve(entry.target);
+          scheduler.schedule(Array.from(entry.target.getElementsByClassName('result')));
+        }
+      }
+    }, { rootMargin: '50% 0px' });
+    let blocks = new Set(resultElements.map(el => el.closest('.testCase')));
+    if (!blocks.has(null)) {
+      for (let block of blocks) {
+        observer.observe(block);
+      }
+      return;
+    }
+    // A result outside of a test block would never come into view, so
+    // run everything.
+  }
+  window.iftRunAll();
+}
+
+const page_start = performance.now();
+
+function make_report(results, time) {
+  let summary = { tests: results.length, loaded: 0, errors: 0, timeouts: 0, time, requests: 0, bytes: 0 };
+  for (let record of results) {
+    summary[{ loaded: 'loaded', error: 'errors', timeout: 'timeouts' }[record.status]]++;
+    summary.requests += record.requests;
+    summary.bytes += record.bytes;
   }
+  return {
+    version: 1,
+    url: window.location.href,
+    date: new Date().toISOString(),
+    user_agent: navigator.userAgent,
+    settings: { concurrency, timeout: test_timeout, workers: worker_count, lazy },
+    shard,
+    startup: window.iftStartup,
+    summary,
+    tests: results,
+  };
+}
+
+// Resolve window.iftReport and offer the report as a download in note.
+function publish_report(report, note) {
+  resolve_report(report);
+  if (shard && 'BroadcastChannel' in window) {
+    let channel = new BroadcastChannel('ift-reports');
+    channel.postMessage(report);
+    channel.close();
+  }
+  let s = report.summary;
+  let blob = new Blob([JSON.stringify(report, null, 1)], { type: 'application/json' });
+  note.textContent = '';
+  note.append(`${s.tests} tests: ${s.loaded} loaded, ${s.errors} errors, ${s.timeouts} timed out; `
+    + `${s.requests} requests, ${s.bytes} bytes in ${Math.round(s.time)} ms. `);
+  let link = document.createElement('a');
+  link.href = URL.createObjectURL(blob);
+  link.download = shard ? `ift-report-${shard.index}.json` : 'ift-report.json';
+  link.textContent = 'Download the report (JSON)';
+  note.append(link);
+}
+
+class TimeoutError extends Error {}
 
-  return patch_codepoints(font_id, font_face, cps_array, features, axes);
+function with_timeout(promise, ms) {
+  let timer;
+  let timeout = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new TimeoutError(`timed out after ${ms} ms`)), ms);
+  });
+  return Promise.race([promise, timeout]).finally(() => clearTimeout(timer));
 }
 
-const woff2_decoder = {
-  unwoff2: (encoded) => {
-    let decoder = new window.Woff2Decoder(encoded);
-    return decoder.data();
+// Returns { result, settled }: result resolves with the test's record, once
+// the test is done or has timed out, and settled once its work is over.
+function run_test(el) {
+  let test_name = el.id.replace(/^[^-]+-/, ''); // remove format prefix
+  console.log("Processing test:", test_name);
+  let font_format = el.getAttribute('data-format');
+  // The generator versions each font by the hash of its test's files, and
+  // the worker puts the same version on the test's patch requests, so the
+  // files can be cached yet a changed font or patch is always refetched.
+  let version = el.getAttribute('data-version');
+  let title_font = new URL(`${test_name}/${font_format}/myfont-mod.ift.woff2`, document.baseURI);
+  if (version) {
+    title_font.searchParams.set('v', version);
   }
+  let cps = test_codepoints(document.getElementById(test_name));
+  let font_name = font_format + "-" + test_name + "-IFT-Font";
+  // check to see if element contains pass or fail class
+  let fallback_font_name = "RobotoFallback";
+  el.style.fontFamily = `${font_name}, ${fallback_font_name}`;
+  let record = {
+    test: test_name, format: font_format, status: "loaded", error: null, time: 0,
+    requests: 0, bytes: 0, urls: [], font_bytes: 0, wasm_heap_bytes: 0, woff2_cache: null,
+    phases: {},
+  };
+  let label = `ift:${el.id}`;
+  let start = performance.now();
+  performance.mark(`${label}:start`);
+  let work = update_fonts(cps,
+    title_font.href,
+    font_name,
+    [],
+    {},
+    record);
+  let result = (async () => {
+    try {
+      let f1 = await with_timeout(work, test_timeout);
+      document.fonts.add(f1);
+    } catch (e) {
+      console.error(`Error updating font for ${test_name} (${font_format}):`, e);
+      record.status = e instanceof TimeoutError ? "timeout" : "error";
+      record.error = String(e);
+    }
+    performance.measure(`${label}:total`, `${label}:start`);
+    performance.clearMarks(`${label}:start`);
+    record.time = performance.now() - start;
+    return record;
+  })();
+  // A timed out test's worker request keeps running until it settles.
+  let settled = Promise.allSettled([work, result]);
+  return { result, settled };
 }
 
-function patch_codepoints(font_id, font_face, cps, features, axes) {
-  if (!states[font_id]) {
-    states[font_id] = IftState.new(font_id);
+// The code points to request for a test: the generator lists those of the
+// test block's text in its data-codepoints attribute as hex values and
+// ranges ("a,20,41-43"), which spares reading innerText (and the layout
+// that forces) for every test. Pages without the attribute fall back to
+// innerText.
+function test_codepoints(test_el) {
+  let value = test_el.getAttribute('data-codepoints');
+  if (value === null) {
+    let text = test_el.innerText;
+    let seen = new Set();
+    for (let i = 0; text.codePointAt(i); i++) {
+      seen.add(text.codePointAt(i));
+    }
+    return Array.from(seen);
+  }
+  let cps = [];
+  for (let range of value.split(',')) {
+    if (!range) {
+      continue;
+    }
+    let [start, end] = range.split('-').map(v => parseInt(v, 16));
+    if (end === undefined) {
+      end = start;
+    }
+    for (let cp = start; cp <= end; cp++) {
+      cps.push(cp);
+    }
   }
-  let state = states[font_id];
+  return cps;
+}
 
-  for (const [tag, point] of axes) {
-    state.add_design_space_to_target_subset_definition(tag, point, point);
+function update_fonts(cps_array, font_id, font_face, features, ds, record) {
+  let axes = new Map();
+  for (let [tag, value] of Object.entries(ds)) {
+    axes.set(tag, value);
   }
 
-  for (const tag of features) {
-    state.add_feature_to_target_subset_definition(tag);
+  return patch_codepoints(font_id, font_face, cps_array, features, axes, record);
+}
+
+// Extends the font in a worker and loads it, filling in record's
+// measurements (see window.iftResults).
+async function patch_codepoints(font_id, font_face, cps, features, axes, record) {
+  let label = `ift:${record.format}-${record.test}`;
+  let start = performance.now();
+  performance.mark(`${label}:extend-start`);
+  let { data, metrics } = await pool.run(font_id, cps, features, axes);
+  performance.measure(`${label}:extend`, `${label}:extend-start`);
+  performance.clearMarks(`${label}:extend-start`);
+  if (record.status == "timeout") {
+    // The test was given up on, leave its record as it is.
+    return null;
   }
+  let extended = performance.now();
+  Object.assign(record, {
+    requests: metrics.requests,
+    bytes: metrics.bytes,
+    urls: metrics.urls,
+    font_bytes: metrics.font_bytes,
+    wasm_heap_bytes: metrics.wasm_heap_bytes,
+    woff2_cache: metrics.woff2_cache,
+  });
+  record.phases.extend = extended - start;
+  record.phases.worker_extend = metrics.extend_time;
+  record.phases.decode = metrics.decode_time;
 
-  state.add_to_target_subset_definition(cps);
-  return state.current_font_subset(woff2_decoder).then(font => {
-    const font_data = new Uint8Array(window.ift_memory.buffer, font.data(), font.len());
-    let descriptor = {};
-    font = new FontFace(font_face, font_data, descriptor);
-    return font.load();
-  })
+  performance.mark(`${label}:load-start`);
+  let descriptor = {};
+  let font = await new FontFace(font_face, data, descriptor).load();
+  performance.measure(`${label}:load`, `${label}:load-start`);
+  performance.clearMarks(`${label}:load-start`);
+  if (record.status == "timeout") {
+    // Timed out while loading, the record has already been reported.
+    return null;
+  }
+  record.phases.load = performance.now() - extended;
+  return font;
 }
 
 
 window.addEventListener('DOMContentLoaded', function () {
-  init().then(function (Module) {
-    window.ift_memory = Module.memory;
-    update_all_fonts();
-  });
+  pool = new WorkerPool(worker_count);
+  update_all_fonts();
 });
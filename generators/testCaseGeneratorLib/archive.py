@@ -0,0 +1,181 @@
+"""
+Reproducible archives of the generated test files.
+
+writeZip writes a standard zip archive:
+
+    - Members are sorted by name and carry a fixed timestamp (the
+      SOURCE_DATE_EPOCH environment variable if set, else 1980-01-01), a
+      fixed mode and no extra fields, so the same files always produce the
+      same archive bytes.
+    - Members that are already compressed (WOFF2 fonts, brotli patches,
+      see COMPRESSED_SUFFIXES) are stored rather than deflated, which would
+      only cost time and could not make them smaller.
+    - The remaining members are read and deflated on a pool of threads
+      (zlib releases the GIL), and written in order as they complete.
+
+writeDedupTar writes a content addressed variant: a gzipped tar in which
+each distinct file content is stored once and every other file with the
+same content is a hard link to it. Standard tar tools extract it to the
+same tree as the zip, but it only costs the unique bytes of the suite,
+which matters as most test directories share the same patch files.
+"""
+
+import io
+import os
+import time
+import gzip
+import zlib
+import struct
+import hashlib
+import logging
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from testCaseGeneratorLib.staging import writeFile
+
+logger = logging.getLogger(__name__)
+
+# Files with these suffixes are already compressed.
+COMPRESSED_SUFFIXES = (".woff2", ".woff", "_gk", "_tk", ".br", ".gz", ".zip", ".png", ".jpg")
+
+_DEFLATE_LEVEL = 9
+_FILE_MODE = 0o644
+_ZIP_VERSION = 20
+_UNIX = 3
+_UTF8_FLAG = 0x800
+_ZIP_LIMIT = 0xFFFFFFFF
+
+
+def archiveTimestamp():
+    """
+    The modification time given to every archive member, as a POSIX time.
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    epoch = int(value) if value else 0
+    # zip (DOS) dates start in 1980.
+    return max(epoch, 315532800)
+
+
+def collectMembers(directory, subdirectories):
+    """
+    Returns the sorted (archive name, path) pairs of every file in the given
+    subdirectories of directory. Archive names are relative to directory
+    and use "/" separators.
+    """
+    members = []
+    for subdirectory in subdirectories:
+        root = os.path.join(directory, subdirectory)
+        for dirPath, dirs, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirPath, name)
+                arcname = os.path.relpath(path, directory).replace(os.sep, "/")
+                members.append((arcname, path))
+    members.sort()
+    return members
+
+
+def isCompressed(name):
+    return name.endswith(COMPRESSED_SUFFIXES)
+
+
+def _readMember(member):
+    arcname, path = member
+    if isinstance(path, bytes):
+        data = path
+    else:
+        with open(path, "rb") as f:
+            data = f.read()
+    crc = zlib.crc32(data)
+    if isCompressed(arcname):
+        return zipfile.ZIP_STORED, crc, len(data), data
+    compressor = zlib.compressobj(_DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    if len(compressed) >= len(data):
+        return zipfile.ZIP_STORED, crc, len(data), data
+    return zipfile.ZIP_DEFLATED, crc, len(data), compressed
+
+
+def _dosDateTime(timestamp):
+    t = time.gmtime(timestamp)
+    dosTime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dosDate = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dosTime, dosDate
+
+
+def writeZip(path, members, jobs=None):
+    """
+    Write the (archive name, path) members to a zip file at path. A member's
+    path may also be the bytes of its content. jobs is the number of
+    compression threads (default: the number of CPUs).
+    Returns the number of members written.
+    """
+    dosTime, dosDate = _dosDateTime(archiveTimestamp())
+    out = io.BytesIO()
+    central = []
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        for (arcname, _), (method, crc, size, data) in zip(members, executor.map(_readMember, members)):
+            name = arcname.encode("utf-8")
+            flags = 0 if name.isascii() else _UTF8_FLAG
+            offset = out.tell()
+            if max(offset, size, len(data)) > _ZIP_LIMIT or len(central) >= 0xFFFF:
+                raise ValueError("%s is too large for a zip archive without zip64 extensions" % path)
+            out.write(struct.pack(zipfile.structFileHeader, zipfile.stringFileHeader,
+                                  _ZIP_VERSION, 0, flags, method, dosTime, dosDate,
+                                  crc, len(data), size, len(name), 0))
+            out.write(name)
+            out.write(data)
+            central.append(struct.pack(zipfile.structCentralDir, zipfile.stringCentralDir,
+                                       _ZIP_VERSION, _UNIX, _ZIP_VERSION, 0, flags, method,
+                                       dosTime, dosDate, crc, len(data), size, len(name),
+                                       0, 0, 0, 0, (0o100000 | _FILE_MODE) << 16, offset) + name)
+    centralOffset = out.tell()
+    centralData = b"".join(central)
+    out.write(centralData)
+    out.write(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0,
+                          len(central), len(central), len(centralData), centralOffset, 0))
+    writeFile(path, out.getvalue())
+    return len(central)
+
+
+def writeDedupTar(path, members, jobs=None):
+    """
+    Write the (archive name, path) members to a gzipped tar at path, storing
+    each distinct content once and the rest as hard links to it. Returns
+    (total bytes, unique bytes) of the member contents.
+    """
+    timestamp = archiveTimestamp()
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        def hashMember(member):
+            with open(member[1], "rb") as f:
+                return hashlib.sha256(f.read()).digest()
+        digests = list(executor.map(hashMember, members))
+
+    out = io.BytesIO()
+    first = {}
+    totalBytes = uniqueBytes = 0
+    # The gzip header carries its own timestamp and file name.
+    with gzip.GzipFile(filename="", mode="wb", fileobj=out, mtime=timestamp) as gz:
+        with tarfile.open(fileobj=gz, mode="w", format=tarfile.PAX_FORMAT) as tar:
+            for (arcname, memberPath), digest in zip(members, digests):
+                info = tarfile.TarInfo(arcname)
+                info.mtime = timestamp
+                info.mode = _FILE_MODE
+                info.uid = info.gid = 0
+                info.uname = info.gname = ""
+                size = os.path.getsize(memberPath)
+                totalBytes += size
+                if digest in first:
+                    info.type = tarfile.LNKTYPE
+                    info.linkname = first[digest]
+                    tar.addfile(info)
+                    continue
+                first[digest] = arcname
+                uniqueBytes += size
+                info.size = size
+                with open(memberPath, "rb") as f:
+                    tar.addfile(info, f)
+    writeFile(path, out.getvalue())
+    logger.info("Deduplicated %d files (%d bytes) to %d unique files (%d bytes)",
+                len(members), totalBytes, len(first), uniqueBytes)
+    return totalBytes, uniqueBytes
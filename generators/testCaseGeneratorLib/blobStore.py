@@ -0,0 +1,204 @@
+"""
+Content addressed store for the generated test files.
+
+Most test directories hold the same files: every test gets the full patch
+set of its source font and many tests only differ in their font file. As
+each (test, font format) cell finishes (see staging.stagedTestOutput), its
+files are added to a blob store, named by the sha256 of their content, and
+replaced by hard links to the blobs:
+
+    IFTClient/blobs/3f/3fa2...c9   <- the content
+    IFTClient/Tests/xhtml1/<test>/<format>/1_04.ift_gk   (hard link)
+
+so disk usage, syncs to test machines (rsync -H preserves the links) and
+static server caches scale with the unique content of the suite rather
+than with the number of tests. Hard links rather than symbolic links are
+used so the tree can be served, zipped or copied like any other.
+
+Blobs that are no longer linked from anywhere are removed by prune. The
+store is used unless disabled with ClientTestCaseGenerator.py
+--no-blob-store, which is passed to worker processes in the IFT_BLOB_STORE
+environment variable (the store directory, or empty when disabled).
+"""
+
+import os
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+
+from testCaseGeneratorLib.paths import clientBlobDirectory
+
+logger = logging.getLogger(__name__)
+
+BLOB_STORE_ENVIRONMENT_VARIABLE = "IFT_BLOB_STORE"
+
+
+def currentStore():
+    """
+    Returns the BlobStore in use, or None if the store is disabled.
+    """
+    root = os.environ.get(BLOB_STORE_ENVIRONMENT_VARIABLE, clientBlobDirectory)
+    if not root:
+        return None
+    return BlobStore(root)
+
+
+def disableBlobStore():
+    """
+    Disable the store in this process and any worker processes it starts
+    afterwards.
+    """
+    os.environ[BLOB_STORE_ENVIRONMENT_VARIABLE] = ""
+
+
+def _hashFile(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _replaceWithLink(sourcePath, destPath):
+    directory, name = os.path.split(destPath)
+    fd, tmpPath = tempfile.mkstemp(prefix=".%s." % name, dir=directory)
+    os.close(fd)
+    os.remove(tmpPath)
+    os.link(sourcePath, tmpPath)
+    os.replace(tmpPath, destPath)
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    def blobPath(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def add(self, path):
+        """
+        Add the file at path to the store and replace it with a hard link to
+        its blob. Returns the digest of its content.
+
+        Workers may add the same content at the same time, every file still
+        ends up linked to the one blob:
+
+        >>> import threading
+        >>> root = tempfile.mkdtemp()
+        >>> paths = []
+        >>> for i in range(2000):
+        ...     paths.append(os.path.join(root, "file%d" % i))
+        ...     with open(paths[-1], "wb") as f:
+        ...         _ = f.write(b"%d" % (i // 2))
+        >>> store = BlobStore(os.path.join(root, "blobs"))
+        >>> workers = [threading.Thread(target=lambda k=k: [store.add(p) for p in paths[k::2]]) for k in range(2)]
+        >>> for worker in workers:
+        ...     worker.start()
+        >>> for worker in workers:
+        ...     worker.join()
+        >>> len(set(os.stat(p).st_ino for p in paths))
+        1000
+        >>> shutil.rmtree(root)
+        """
+        digest = _hashFile(path)
+        blobPath = self.blobPath(digest)
+        if not os.path.exists(blobPath):
+            os.makedirs(os.path.dirname(blobPath), exist_ok=True)
+            fd, tmpPath = tempfile.mkstemp(prefix=".blob.", dir=os.path.dirname(blobPath))
+            os.close(fd)
+            os.remove(tmpPath)
+            if os.stat(path).st_nlink == 1:
+                # A private file (written by the test) becomes the blob.
+                os.link(path, tmpPath)
+            else:
+                # A staged file may share its data with a build artifact
+                # that could later be rebuilt in place, so the blob is a copy.
+                shutil.copyfile(path, tmpPath)
+            # Published with an exclusive link: another worker may have
+            # stored the same content meanwhile, and replacing its blob would
+            # leave the files already linked to it on their own. Theirs is
+            # used instead.
+            try:
+                os.link(tmpPath, blobPath)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmpPath)
+        if os.path.samefile(path, blobPath):
+            return digest
+        try:
+            _replaceWithLink(blobPath, path)
+        except OSError as e:
+            # Too many links to one blob, or a store on another file
+            # system: keep the private copy.
+            if e.errno not in (errno.EMLINK, errno.EXDEV):
+                raise
+        return digest
+
+    def addTree(self, directory):
+        """
+        Add every file under directory to the store.
+        """
+        for dirPath, dirs, files in os.walk(directory):
+            for name in files:
+                self.add(os.path.join(dirPath, name))
+
+    def _blobs(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            prefixPath = os.path.join(self.root, prefix)
+            for name in sorted(os.listdir(prefixPath)):
+                if not name.startswith("."):
+                    yield os.path.join(prefixPath, name)
+
+    def prune(self):
+        """
+        Remove the blobs that no file links to any more, and any temporary
+        files left by an interrupted run. Returns the number of blobs
+        removed.
+        """
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for prefix in os.listdir(self.root):
+            prefixPath = os.path.join(self.root, prefix)
+            for name in os.listdir(prefixPath):
+                path = os.path.join(prefixPath, name)
+                if name.startswith(".") or os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += not name.startswith(".")
+            if not os.listdir(prefixPath):
+                os.rmdir(prefixPath)
+        return removed
+
+    def usage(self):
+        """
+        Returns (linked files, linked bytes, blobs, blob bytes): the number
+        and total size of the files that link to the store, and of the
+        distinct blobs they share.
+        """
+        files = fileBytes = blobs = blobBytes = 0
+        for path in self._blobs():
+            stat = os.stat(path)
+            links = stat.st_nlink - 1
+            files += links
+            fileBytes += links * stat.st_size
+            blobs += 1
+            blobBytes += stat.st_size
+        return files, fileBytes, blobs, blobBytes
+
+    def logUsage(self):
+        files, fileBytes, blobs, blobBytes = self.usage()
+        if not blobs:
+            return
+        logger.info("Blob store: %d files (%d bytes) stored as %d blobs (%d bytes), "
+                    "dedup ratio %.1fx by files, %.1fx by bytes",
+                    files, fileBytes, blobs, blobBytes, files / blobs, fileBytes / max(blobBytes, 1))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
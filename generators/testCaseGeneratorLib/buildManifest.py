@@ -0,0 +1,183 @@
+"""
+Persistent record of what each (test, font format) cell was generated from
+and what it produced, used to skip cells whose inputs have not changed
+since the previous run.
+
+A cell's key hashes:
+    - the source of its generator function, along with the source of any
+      functions and the values of any constants it references from the
+      same module,
+    - its arguments,
+    - the build artifacts for its font format (build/IFT, build/URL_TEMPLATE
+      and build/STOP_EXTEND),
+    - the sources of testCaseGeneratorLib,
+    - the WOFF2 brotli quality (see woff2Writer.py).
+
+A cell is up to date when its key matches the recorded one and all of the
+files it produced are still present and unchanged.
+"""
+
+import os
+import json
+import types
+import hashlib
+import inspect
+
+from testCaseGeneratorLib.paths import buildDirectory, clientTestDirectory
+from testCaseGeneratorLib.staging import fileHash, writeFile
+from testCaseGeneratorLib.woff2Writer import brotliQuality
+
+MANIFEST_VERSION = 1
+
+# Build trees (relative to buildDirectory) that test cells read, per font format.
+_INPUT_TREES = (
+    ("IFT",),
+    ("URL_TEMPLATE", "IFT"),
+    ("STOP_EXTEND", "IFT"),
+)
+
+_libraryDirectory = os.path.dirname(os.path.abspath(__file__))
+
+
+def _codeNames(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _codeNames(const)
+    return names
+
+
+def _collectSource(func, seen, parts):
+    if func in seen:
+        return
+    seen.add(func)
+    parts.append(inspect.getsource(func))
+    for name in sorted(_codeNames(func.__code__)):
+        if name not in func.__globals__:
+            continue
+        value = func.__globals__[name]
+        if inspect.isfunction(value) and value.__module__ == func.__module__:
+            _collectSource(value, seen, parts)
+        elif isinstance(value, (bool, int, float, str, bytes)):
+            parts.append("%s = %r" % (name, value))
+
+
+def functionSourceHash(func):
+    """
+    Returns a hash of func's source and of everything it references from
+    its own module.
+    """
+    parts = []
+    _collectSource(func, set(), parts)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _treeHash(directories, base, suffix=""):
+    h = hashlib.sha256()
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                if not name.endswith(suffix):
+                    continue
+                path = os.path.join(root, name)
+                h.update(os.path.relpath(path, base).encode("utf-8"))
+                h.update(fileHash(path).encode("ascii"))
+    return h.hexdigest()
+
+
+def _outputFiles(testName, fontFormat):
+    directory = os.path.join(clientTestDirectory, testName, fontFormat)
+    outputs = {}
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            outputs[os.path.relpath(path, clientTestDirectory)] = [
+                fileHash(path), stat.st_size, stat.st_mtime_ns
+            ]
+    return outputs
+
+
+class BuildManifest:
+    """
+    The manifest stored at path. Missing or unreadable manifests are treated
+    as empty, so every cell is regenerated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cells = {}
+        self._keys = {}
+        self._inputHashes = {}
+        self._libraryDigest = None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.cells = data["cells"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _inputHash(self, fontFormat):
+        if fontFormat not in self._inputHashes:
+            self._inputHashes[fontFormat] = _treeHash(
+                [os.path.join(buildDirectory, *tree, fontFormat) for tree in _INPUT_TREES],
+                buildDirectory,
+            )
+        return self._inputHashes[fontFormat]
+
+    def _libraryHash(self):
+        if self._libraryDigest is None:
+            self._libraryDigest = _treeHash([_libraryDirectory], _libraryDirectory, suffix=".py")
+        return self._libraryDigest
+
+    def cellKey(self, cell):
+        name = cell.name
+        if name not in self._keys:
+            h = hashlib.sha256()
+            h.update(functionSourceHash(cell.func).encode("ascii"))
+            h.update(repr(cell.funcArgs).encode("utf-8"))
+            h.update(self._inputHash(cell.fontFormat).encode("ascii"))
+            h.update(self._libraryHash().encode("ascii"))
+            h.update(b"brotli quality %d" % brotliQuality())
+            self._keys[name] = h.hexdigest()
+        return self._keys[name]
+
+    def isUpToDate(self, cell):
+        entry = self.cells.get(cell.name)
+        if entry is None or entry["key"] != self.cellKey(cell):
+            return False
+        for relPath, (digest, size, mtime) in entry["outputs"].items():
+            path = os.path.join(clientTestDirectory, relPath)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if (stat.st_size, stat.st_mtime_ns) == (size, mtime):
+                continue
+            if stat.st_size != size or fileHash(path) != digest:
+                return False
+        return bool(entry["outputs"])
+
+    def recordedOutputs(self, testName, fontFormat):
+        """
+        Returns the {path: [digest, size, mtime_ns]} recorded for the files
+        of a cell, keyed by path relative to clientTestDirectory, or an empty
+        dict if the cell has no record.
+        """
+        entry = self.cells.get("%s/%s" % (testName, fontFormat))
+        if entry is None:
+            return {}
+        return entry["outputs"]
+
+    def record(self, cell):
+        self.cells[cell.name] = dict(
+            key=self.cellKey(cell),
+            outputs=_outputFiles(cell.identifier, cell.fontFormat),
+        )
+
+    def save(self):
+        data = dict(version=MANIFEST_VERSION, cells=self.cells)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        writeFile(self.path, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
@@ -0,0 +1,174 @@
+"""
+Delta bundles: update an extracted copy of the suite from one generated
+version to the next without transferring the whole of ClientTestFonts.zip.
+
+A bundle is a zip archive (written by archive.writeZip) holding:
+
+    delta.json     - what the bundle does, see below
+    manifest.json  - the suite manifest of the new version
+    files/<path>   - every file that was added or changed, by its path
+                     relative to IFTClient/Tests/xhtml1
+
+delta.json records the digests of the two suite versions, the sha256 of
+each added or changed file before (if any) and after the update, and the
+sha256 of each removed file:
+
+    {
+     "version": 1,
+     "from": "<old suite digest>",
+     "to": "<new suite digest>",
+     "added": {"<path>": {"sha256": "...", "size": 1234}, ...},
+     "changed": {"<path>": {"from": "...", "sha256": "...", "size": 1234}, ...},
+     "removed": {"<path>": "<sha256>", ...}
+    }
+
+applyDeltaBundle first checks that the files the bundle changes or
+removes still have their old content, so a bundle is never applied to
+the wrong version of the suite, then writes the new files (each one
+atomically), removes the old ones and verifies the hashes of everything
+it wrote. With verifyAll every file of the new version is verified
+against manifest.json.
+
+Bundles are created from two suite manifests (see suiteManifest.py); the
+contents of the new files are read from the new suite's test directory.
+"""
+
+import os
+import json
+import zipfile
+import logging
+
+from testCaseGeneratorLib.archive import writeZip
+from testCaseGeneratorLib.staging import fileHash, writeFile
+from testCaseGeneratorLib.suiteManifest import diffSuiteManifests
+
+logger = logging.getLogger(__name__)
+
+DELTA_BUNDLE_VERSION = 1
+
+_DELTA_NAME = "delta.json"
+_MANIFEST_NAME = "manifest.json"
+_FILES_PREFIX = "files/"
+
+
+def _fileEntries(manifest, paths):
+    entries = {}
+    wanted = set(paths)
+    for test in manifest["tests"].values():
+        for fontFormat in test["formats"].values():
+            for path, entry in fontFormat["files"].items():
+                if path in wanted:
+                    entries[path] = entry
+    return entries
+
+
+def _checkPath(path):
+    parts = path.split("/")
+    if path.startswith("/") or ".." in parts or "" in parts or "\\" in path:
+        raise ValueError("Unsafe path in delta bundle: %r" % path)
+    return os.path.join(*parts)
+
+
+def createDeltaBundle(path, oldManifest, newManifest, testDirectory, jobs=None):
+    """
+    Write a bundle to path that updates a suite described by oldManifest to
+    the one described by newManifest, whose files are in testDirectory.
+    Returns the SuiteDifference between the two.
+    """
+    difference = diffSuiteManifests(oldManifest, newManifest)
+    oldEntries = _fileEntries(oldManifest, difference.changedFiles + difference.removedFiles)
+    newEntries = _fileEntries(newManifest, difference.addedFiles + difference.changedFiles)
+
+    delta = {
+        "version": DELTA_BUNDLE_VERSION,
+        "from": oldManifest["digest"],
+        "to": newManifest["digest"],
+        "added": {p: newEntries[p] for p in difference.addedFiles},
+        "changed": {p: dict(newEntries[p], **{"from": oldEntries[p]["sha256"]}) for p in difference.changedFiles},
+        "removed": {p: oldEntries[p]["sha256"] for p in difference.removedFiles},
+    }
+    members = [
+        (_DELTA_NAME, json.dumps(delta, indent=1, sort_keys=True).encode("utf-8")),
+        (_MANIFEST_NAME, json.dumps(newManifest, indent=1).encode("utf-8")),
+    ]
+    for relPath in difference.addedFiles + difference.changedFiles:
+        filePath = os.path.join(testDirectory, _checkPath(relPath))
+        if fileHash(filePath) != newEntries[relPath]["sha256"]:
+            raise ValueError("%s does not match the new suite manifest" % filePath)
+        members.append((_FILES_PREFIX + relPath, filePath))
+    members[2:] = sorted(members[2:])
+    writeZip(path, members, jobs=jobs)
+    logger.info("Wrote delta bundle %s: %d files added, %d changed, %d removed",
+                path, len(delta["added"]), len(delta["changed"]), len(delta["removed"]))
+    return difference
+
+
+def _removeEmptyDirectories(directory, relPath):
+    parent = os.path.dirname(relPath)
+    while parent:
+        try:
+            os.rmdir(os.path.join(directory, parent))
+        except OSError:
+            return
+        parent = os.path.dirname(parent)
+
+
+def applyDeltaBundle(path, directory, verifyAll=False, force=False):
+    """
+    Apply the bundle at path to the suite files in directory, laid out like
+    IFTClient/Tests/xhtml1. Raises ValueError, before anything is written,
+    if a file the bundle changes or removes does not have the content the
+    bundle was made against (unless force is true), and after the update if
+    any file does not have its expected hash.
+    """
+    try:
+        bundle = zipfile.ZipFile(path)
+        delta = json.loads(bundle.read(_DELTA_NAME))
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ValueError("%s is not a delta bundle: %s" % (path, e))
+    with bundle:
+        if delta.get("version") != DELTA_BUNDLE_VERSION:
+            raise ValueError("Unsupported delta bundle version: %r" % delta.get("version"))
+
+        expected = dict((p, entry["from"]) for p, entry in delta["changed"].items())
+        expected.update(delta["removed"])
+        mismatched = []
+        for relPath, digest in sorted(expected.items()):
+            filePath = os.path.join(directory, _checkPath(relPath))
+            if relPath in delta["removed"] and not os.path.exists(filePath):
+                continue
+            if not os.path.exists(filePath) or fileHash(filePath) != digest:
+                mismatched.append(relPath)
+        if mismatched and not force:
+            raise ValueError("%s does not hold the suite version this bundle updates from; %d files differ, "
+                             "starting with %s" % (directory, len(mismatched), mismatched[0]))
+
+        written = dict(delta["added"])
+        written.update(delta["changed"])
+        for relPath in sorted(written):
+            filePath = os.path.join(directory, _checkPath(relPath))
+            os.makedirs(os.path.dirname(filePath), exist_ok=True)
+            writeFile(filePath, bundle.read(_FILES_PREFIX + relPath))
+        for relPath in sorted(delta["removed"]):
+            filePath = os.path.join(directory, _checkPath(relPath))
+            if os.path.exists(filePath):
+                os.remove(filePath)
+                _removeEmptyDirectories(directory, relPath)
+
+        if verifyAll:
+            manifest = json.loads(bundle.read(_MANIFEST_NAME))
+            written = {}
+            for test in manifest["tests"].values():
+                for fontFormat in test["formats"].values():
+                    written.update(fontFormat["files"])
+
+    failures = []
+    for relPath, entry in sorted(written.items()):
+        filePath = os.path.join(directory, _checkPath(relPath))
+        if not os.path.exists(filePath) or fileHash(filePath) != entry["sha256"]:
+            failures.append(relPath)
+    if failures:
+        raise ValueError("%d files in %s failed verification after applying %s, starting with %s"
+                         % (len(failures), directory, path, failures[0]))
+    logger.info("Applied delta bundle %s: %d files added, %d changed, %d removed, %d verified",
+                path, len(delta["added"]), len(delta["changed"]), len(delta["removed"]), len(written))
@@ -0,0 +1,261 @@
+"""
+Reader/writer for glyph keyed patches, see
+https://www.w3.org/TR/IFT/#glyph-keyed
+
+Patch layout:
+  0-3:   format (Tag) = 'ifgk'
+  4-7:   reserved (uint32)
+  8:     flags (uint8)          -- bit 0: glyphIds use uint24 (else uint16)
+  9-24:  compatibilityId (uint32[4], 16 bytes)
+  25-28: maxUncompressedLength (uint32)
+  29+:   brotliStream (compressed GlyphPatches table)
+
+GlyphPatches layout (after brotli decompression):
+  0-3:   glyphCount (uint32)
+  4:     tableCount (uint8)
+  5+:    glyphIds[glyphCount]  (uint16 or uint24, per flags bit 0)
+  then:  tables[tableCount]    (Tag, 4 bytes each)
+  then:  glyphDataOffsets[glyphCount * tableCount + 1] (Offset32 each, from
+         the start of GlyphPatches, table major)
+  then:  glyphData[variable]
+
+The glyph ids and offsets are exposed as array.array objects and the table
+tags as a list, all of which may be edited directly, including into states
+the spec forbids, which is what most of the tests need. insertTable and
+removeTable keep the patch well formed, relocating every offset.
+
+Decompressed GlyphPatches are memoized by the hash of the brotli stream, so
+a source patch that is loaded by several tests is only decompressed once per
+process. When the GlyphPatches are unchanged, compile reuses the original
+brotli stream rather than compressing again.
+"""
+
+import sys
+import array
+import struct
+import hashlib
+
+from testCaseGeneratorLib.staging import writeFile
+
+GLYPH_KEYED_FORMAT = b"ifgk"
+
+# format(4) + reserved(4) + flags(1) + compatibilityId(16) + maxUncompressedLength(4)
+_HEADER = struct.Struct(">4s4sB16sI")
+_GLYPH_PATCHES_HEADER = struct.Struct(">IB")
+
+FLAG_UINT24_GLYPH_IDS = 0x01
+
+# Decompressed GlyphPatches, keyed by the sha256 of the brotli stream.
+_decompressedCache = {}
+
+
+def _decompress(stream):
+    import brotli
+    key = hashlib.sha256(stream).digest()
+    data = _decompressedCache.get(key)
+    if data is None:
+        data = _decompressedCache[key] = brotli.decompress(stream)
+    return data
+
+
+def _bigEndian(values):
+    if values.itemsize > 1 and sys.byteorder == "little":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _unpackUInt(data, size):
+    """
+    Unpack big endian unsigned ints of size (2, 3 or 4) bytes into an array.
+    """
+    count = len(data) // size
+    if size == 3:
+        # Widen each uint24 to a uint32 by interleaving a zero high byte.
+        widened = bytearray(count * 4)
+        widened[1::4] = data[0::3]
+        widened[2::4] = data[1::3]
+        widened[3::4] = data[2::3]
+        data = widened
+        size = 4
+    values = array.array("H" if size == 2 else "I")
+    assert values.itemsize == size
+    values.frombytes(bytes(data))
+    return _bigEndian(values)
+
+
+def _packUInt(values, size):
+    """
+    Pack ints as big endian unsigned ints of size (2, 3 or 4) bytes.
+    """
+    values = _bigEndian(array.array("H" if size == 2 else "I", values))
+    data = values.tobytes()
+    if size == 3:
+        narrowed = bytearray(len(values) * 3)
+        narrowed[0::3] = data[1::4]
+        narrowed[1::3] = data[2::4]
+        narrowed[2::3] = data[3::4]
+        data = bytes(narrowed)
+    return data
+
+
+class GlyphKeyedPatch:
+    """
+    A glyph keyed patch.
+
+    glyphIds: array.array of glyph ids.
+    tables: list of table tags (bytes).
+    offsets: array.array of glyphDataOffsets.
+    glyphData: the bytes following the offsets.
+    maxUncompressedLength: None to write the actual decoded length.
+    """
+
+    def __init__(self, format=GLYPH_KEYED_FORMAT, reserved=b"\0\0\0\0", flags=0,
+                 compatibilityId=b"\0" * 16, maxUncompressedLength=None,
+                 glyphIds=(), tables=(), offsets=(0,), glyphData=b""):
+        self.format = format
+        self.reserved = reserved
+        self.flags = flags
+        self.compatibilityId = compatibilityId
+        self.maxUncompressedLength = maxUncompressedLength
+        self.glyphIds = array.array("I", glyphIds)
+        self.tables = list(tables)
+        self.offsets = array.array("I", offsets)
+        self.glyphData = bytes(glyphData)
+        self._glyphPatches = None
+        self._brotliStream = None
+
+    @classmethod
+    def decompile(cls, data):
+        format, reserved, flags, compatibilityId, maxUncompressedLength = _HEADER.unpack_from(data, 0)
+        stream = bytes(data[_HEADER.size:])
+        glyphPatches = _decompress(stream)
+
+        view = memoryview(glyphPatches)
+        glyphCount, tableCount = _GLYPH_PATCHES_HEADER.unpack_from(view, 0)
+        gidSize = 3 if flags & FLAG_UINT24_GLYPH_IDS else 2
+        position = _GLYPH_PATCHES_HEADER.size
+        glyphIds = _unpackUInt(view[position:position + glyphCount * gidSize], gidSize)
+        position += glyphCount * gidSize
+        tables = [bytes(view[position + i * 4:position + i * 4 + 4]) for i in range(tableCount)]
+        position += tableCount * 4
+        offsetCount = glyphCount * tableCount + 1
+        offsets = _unpackUInt(view[position:position + offsetCount * 4], 4)
+        position += offsetCount * 4
+
+        if maxUncompressedLength == len(glyphPatches):
+            maxUncompressedLength = None
+        patch = cls(format=format, reserved=reserved, flags=flags,
+                    compatibilityId=compatibilityId, maxUncompressedLength=maxUncompressedLength,
+                    glyphIds=glyphIds, tables=tables, offsets=offsets,
+                    glyphData=view[position:])
+        patch._glyphPatches = glyphPatches
+        patch._brotliStream = stream
+        return patch
+
+    @classmethod
+    def fromFile(cls, path):
+        with open(path, "rb") as f:
+            return cls.decompile(f.read())
+
+    # GlyphPatches
+
+    @property
+    def glyphCount(self):
+        return len(self.glyphIds)
+
+    @property
+    def tableCount(self):
+        return len(self.tables)
+
+    def _headerSize(self, tableCount=None):
+        if tableCount is None:
+            tableCount = self.tableCount
+        gidSize = 3 if self.flags & FLAG_UINT24_GLYPH_IDS else 2
+        return (_GLYPH_PATCHES_HEADER.size + self.glyphCount * gidSize
+                + tableCount * 4 + (self.glyphCount * tableCount + 1) * 4)
+
+    def _relocate(self, delta, start=0):
+        for i in range(start, len(self.offsets)):
+            self.offsets[i] += delta
+
+    def getGlyphData(self, tableIndex, glyphIndex):
+        index = tableIndex * self.glyphCount + glyphIndex
+        base = self._headerSize()
+        return self.glyphData[self.offsets[index] - base:self.offsets[index + 1] - base]
+
+    def insertTable(self, tag, index=None, glyphData=None):
+        """
+        Insert a table, with the given per glyph data (zero length data for
+        every glyph if None), at index in the tables array (appended if
+        None). All offsets are relocated.
+        """
+        if index is None:
+            index = self.tableCount
+        if glyphData is None:
+            glyphData = [b""] * self.glyphCount
+        assert len(glyphData) == self.glyphCount
+        self._relocate(self._headerSize(self.tableCount + 1) - self._headerSize())
+        self.tables.insert(index, tag)
+
+        position = index * self.glyphCount
+        insertAt = self.offsets[position]
+        newOffsets = []
+        dataOffset = insertAt
+        for data in glyphData:
+            newOffsets.append(dataOffset)
+            dataOffset += len(data)
+        inserted = b"".join(glyphData)
+        self._relocate(len(inserted), position)
+        self.offsets[position:position] = array.array("I", newOffsets)
+
+        dataStart = insertAt - self._headerSize()
+        self.glyphData = self.glyphData[:dataStart] + inserted + self.glyphData[dataStart:]
+
+    def removeTable(self, tag):
+        """
+        Remove the (first) table with tag, along with its offsets and glyph
+        data. All offsets are relocated.
+        """
+        index = self.tables.index(tag)
+        position = index * self.glyphCount
+        start = self.offsets[position]
+        end = self.offsets[position + self.glyphCount]
+        base = self._headerSize()
+        self.glyphData = self.glyphData[:start - base] + self.glyphData[end - base:]
+        del self.offsets[position:position + self.glyphCount]
+        self._relocate(start - end, position)
+        del self.tables[index]
+        self._relocate(self._headerSize() - base)
+
+    def glyphPatchesData(self):
+        """
+        Returns the (uncompressed) GlyphPatches table.
+        """
+        gidSize = 3 if self.flags & FLAG_UINT24_GLYPH_IDS else 2
+        return b"".join((
+            _GLYPH_PATCHES_HEADER.pack(self.glyphCount, self.tableCount),
+            _packUInt(self.glyphIds, gidSize),
+            b"".join(self.tables),
+            _packUInt(self.offsets, 4),
+            self.glyphData,
+        ))
+
+    # Patch
+
+    def compile(self):
+        import brotli
+        glyphPatches = self.glyphPatchesData()
+        if glyphPatches == self._glyphPatches:
+            stream = self._brotliStream
+        else:
+            stream = brotli.compress(glyphPatches)
+        maxUncompressedLength = self.maxUncompressedLength
+        if maxUncompressedLength is None:
+            maxUncompressedLength = len(glyphPatches)
+        header = _HEADER.pack(self.format, self.reserved, self.flags,
+                              self.compatibilityId, maxUncompressedLength)
+        return header + stream
+
+    def save(self, path):
+        writeFile(path, self.compile())
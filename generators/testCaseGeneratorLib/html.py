@@ -3,6 +3,7 @@ Test case HTML generator.
 """
 
 import os
+import re
 import html
 
 from testCaseGeneratorLib.paths import clientTestResourcesDirectory
@@ -75,7 +76,163 @@ def poorManMath(text):
     import re
     return re.sub(r"\^\{(.*.)\}", r"<sup>\1</sup>", text)
 
-def generateClientIndexHTML(directory=None, testCases=[], note=None):
+_hiddenElementPattern = re.compile(r"<(script|style)\b.*?</\1\s*>", re.S | re.I)
+_blockTagPattern = re.compile(r"</?(?:div|p|h[1-6]|br|li|ul|ol|table|tr|iframe)\b[^>]*>", re.I)
+_tagPattern = re.compile(r"<[^>]*>")
+_resultPattern = re.compile(r"<span [^>]*class=\"result\"[^>]*>(.*?)</span>")
+
+
+def _markupCodePoints(lines):
+    # The code points of the innerText of the markup in lines, approximated:
+    # script and style content is dropped, whitespace runs collapse to a
+    # space and block boundaries become line breaks.
+    markup = _hiddenElementPattern.sub("", "\n".join(lines))
+    textLines = []
+    for block in _blockTagPattern.split(markup):
+        text = html.unescape(_tagPattern.sub("", block))
+        text = " ".join(text.split())
+        if text:
+            textLines.append(text)
+    return sorted(set(map(ord, "\n".join(textLines))))
+
+
+def codePointRanges(codePoints):
+    """
+    Returns the sorted code points as a list of inclusive [start, end] ranges.
+
+    >>> codePointRanges([32, 65, 66, 67, 70])
+    [[32, 32], [65, 67], [70, 70]]
+    """
+    ranges = []
+    for codePoint in codePoints:
+        if ranges and ranges[-1][1] == codePoint - 1:
+            ranges[-1][1] = codePoint
+        else:
+            ranges.append([codePoint, codePoint])
+    return ranges
+
+
+def formatCodePoints(codePoints):
+    """
+    Returns the sorted code points in the form used by the data-codepoints
+    attribute: comma separated hex code points and start-end ranges.
+
+    >>> formatCodePoints([10, 32, 65, 66, 67])
+    'a,20,41-43'
+    """
+    parts = []
+    for start, end in codePointRanges(codePoints):
+        if start == end:
+            parts.append("%x" % start)
+        else:
+            parts.append("%x-%x" % (start, end))
+    return ",".join(parts)
+
+
+def requestedCodePoints(test):
+    """
+    Returns the sorted code points that the harness (ift.js) requests for a
+    test case: those of the innerText of its testCase element, which the
+    index records in the element's data-codepoints attribute.
+    """
+    return _markupCodePoints(testCaseHTML(test))
+
+
+def requiredCodePoints(test):
+    """
+    Returns the sorted code points of the test's result indicators, which
+    the IFT font must be able to render for the test to be meaningful.
+    """
+    text = "".join(_resultPattern.findall("\n".join(testCaseHTML(test))))
+    return sorted(set(map(ord, html.unescape(text))))
+
+
+def testCaseHTML(test, versions=None):
+    """
+    Returns the lines of the index markup for one test case (a testRegistry
+    entry). versions optionally maps each font format to a version key for
+    the test's font URL, see suiteManifest.fontVersions.
+    """
+    html_string = []
+    identifier = test["identifier"]
+    title = test["title"]
+    title = html.escape(title)
+    description = test["description"]
+    description = html.escape(description)
+    shouldShowIFT = test["shouldShowIFT"]
+    fontFormats = test["fontFormats"]
+    if shouldShowIFT:
+        shouldShowIFT = "P"
+    else:
+        shouldShowIFT = "F"
+    specLink = test["specLink"]
+    # start the test case div
+    html_string.append("\t\t<div class=\"testCase\" id=\"%s\">" % identifier)
+    # start the overview div
+    html_string.append("\t\t\t<div class=\"testCaseOverview\">")
+    # title
+    html_string.append("\t\t\t\t<h3><a href=\"#%s\">%s</a>: %s</h3>" % (identifier, identifier, title))
+    # assertion
+    html_string.append("\t\t\t\t<p>%s</p>" % description)
+    # close the overview div
+    html_string.append("\t\t\t</div>")
+    # start the details div
+    html_string.append("\t\t\t<div class=\"testCaseDetails\">")
+    # validity
+    
+    render_text = "Should Render IFT" if shouldShowIFT != "F" else "Should Not Render IFT"
+    for fontFormat in fontFormats:
+        format_identifier = "%s-%s" % (fontFormat, identifier)
+        attributes = "data-format=\"%s\"" % fontFormat
+        if versions and fontFormat in versions:
+            attributes += " data-version=\"%s\"" % versions[fontFormat]
+        string = "%s: <span id=\"%s\" %s class=\"result\">%s</span> (%s)" % (render_text, format_identifier,attributes,shouldShowIFT,fontFormat)
+        html_string.append("\t\t\t\t\t<p>%s</p>" % string)
+    # optional custom markup/script for tests that need more than the
+    # standard "does the IFT font render" check (e.g. cross-document
+    # assertions that require a second Document/iframe). Placed here,
+    # alongside the format-row(s) above, so the documentation link
+    # below still lands underneath the test content like every other
+    # test case.
+    extraHTML = test.get("extraHTML")
+    if extraHTML:
+        html_string.append(extraHTML)
+    # documentation
+    if specLink is not None:
+        links = specLink.split(' ')
+
+        html_string.append("\t\t\t\t\t<p>")
+        for link in links:
+            name = 'Documentation'
+            if '#' in link:
+                name = link.split('#')[1]
+            string = "\t\t\t\t\t\t<a href=\"%s\">%s</a> " % (link, name)
+            html_string.append(string)
+        html_string.append("\t\t\t\t\t</p>")
+
+    # close the details div
+    html_string.append("\t\t\t</div>")
+    # close the test case div
+    html_string.append("\t\t</div>")
+    # the code points the harness requests, so it doesn't have to read
+    # (and lay out) the text of the block
+    codePoints = formatCodePoints(_markupCodePoints(html_string))
+    html_string[0] = "\t\t<div class=\"testCase\" id=\"%s\" data-codepoints=\"%s\">" % (identifier, codePoints)
+    return html_string
+
+
+def generateClientIndexHTML(directory=None, testCases=[], note=None, fontVersions=None, wasmHash=None,
+                            fileName="testcaseindex.xht", shard=None):
+    """
+    Write testcaseindex.xht to directory. fontVersions optionally maps test
+    identifiers to the versions argument of testCaseHTML. wasmHash is the
+    sha256 of the IFT client's wasm, which the harness uses to key its
+    cache of the compiled client.
+
+    For the page of one shard of the suite (see shards.py) fileName names
+    the page and shard is its (number, shard count); the harness records it
+    in the page's report.
+    """
     testCount = sum([len(group["testCases"]) for group in testCases])
     html_string = [
         "<!DOCTYPE html PUBLIC \"-//W3C//DTD XHTML 1.1//EN\" \"http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd\">",
@@ -89,17 +246,24 @@ def generateClientIndexHTML(directory=None, testCases=[], note=None):
         "\t\t<style type=\"text/css\">",
         "\t\t\t@import \"resources/fonts.css\";",
         "\t\t</style>",
-        "\t\t<script type=\"text/javascript\" src=\"resources/cc-client/brotli.js\"></script>",
+        # the IFT client and WOFF2 decoder are loaded by ift.js's workers
         "\t\t<script type=\"module\" src=\"resources/ift.js\"></script>",
-        "\t\t<script>",
-        "    createModule().then(function (Module) {",
-        "      window.Woff2Decoder = Module.Woff2Decoder;",
-        "    });",
-        "  </script>",
+    ]
+    if wasmHash:
+        html_string.append("\t\t<meta name=\"ift-wasm-hash\" content=\"%s\" />" % wasmHash)
+    if shard:
+        html_string.append("\t\t<meta name=\"ift-shard\" content=\"%d/%d\" />" % shard)
+    html_string += [
         "\t</head>",
         "\t<body>",
-        "\t\t<h1>Incremental Font Transfer: Client Test Suite (%d tests)</h1>" % testCount,
     ]
+    if shard:
+        html_string.append("\t\t<h1>Incremental Font Transfer: Client Test Suite, Shard %d of %d (%d tests)</h1>" % (shard + (testCount,)))
+        html_string.append("\t\t<div class=\"mainNote\">")
+        html_string.append("\t\t\tThis page runs part of the suite, the other parts are linked <a href=\"shards.xht\">here</a>. The full suite is <a href=\"testcaseindex.xht\">here</a>.")
+        html_string.append("\t\t</div>")
+    else:
+        html_string.append("\t\t<h1>Incremental Font Transfer: Client Test Suite (%d tests)</h1>" % testCount)
     # add a download note
     html_string.append("\t\t<div class=\"mainNote\">")
     html_string.append("\t\t\tThe files used in these test can be obtained individually <a href=\"../xhtml1\">here</a> or as a single zip file <a href=\"ClientTestFonts.zip\">here</a>.")
@@ -126,63 +290,10 @@ def generateClientIndexHTML(directory=None, testCases=[], note=None):
             html_string.append("\t\t</div>")
         # write the individual test cases
         for test in group["testCases"]:
-            identifier = test["identifier"]
-            title = test["title"]
-            title = html.escape(title)
-            description = test["description"]
-            description = html.escape(description)
-            shouldShowIFT = test["shouldShowIFT"]
-            fontFormats = test["fontFormats"]
-            if shouldShowIFT:
-                shouldShowIFT = "P"
-            else:
-                shouldShowIFT = "F"
-            specLink = test["specLink"]
-            # start the test case div
-            html_string.append("\t\t<div class=\"testCase\" id=\"%s\">" % identifier)
-            # start the overview div
-            html_string.append("\t\t\t<div class=\"testCaseOverview\">")
-            # title
-            html_string.append("\t\t\t\t<h3><a href=\"#%s\">%s</a>: %s</h3>" % (identifier, identifier, title))
-            # assertion
-            html_string.append("\t\t\t\t<p>%s</p>" % description)
-            # close the overview div
-            html_string.append("\t\t\t</div>")
-            # start the details div
-            html_string.append("\t\t\t<div class=\"testCaseDetails\">")
-            # validity
-            
-            render_text = "Should Render IFT" if shouldShowIFT != "F" else "Should Not Render IFT"
-            for fontFormat in fontFormats:
-                format_identifier = "%s-%s" % (fontFormat, identifier)
-                string = "%s: <span id=\"%s\" data-format=\"%s\" class=\"result\">%s</span> (%s)" % (render_text, format_identifier,fontFormat,shouldShowIFT,fontFormat)
-                html_string.append("\t\t\t\t\t<p>%s</p>" % string)
-            # optional custom markup/script for tests that need more than the
-            # standard "does the IFT font render" check (e.g. cross-document
-            # assertions that require a second Document/iframe). Placed here,
-            # alongside the format-row(s) above, so the documentation link
-            # below still lands underneath the test content like every other
-            # test case.
-            extraHTML = test.get("extraHTML")
-            if extraHTML:
-                html_string.append(extraHTML)
-            # documentation
-            if specLink is not None:
-                links = specLink.split(' ')
-
-                html_string.append("\t\t\t\t\t<p>")
-                for link in links:
-                    name = 'Documentation'
-                    if '#' in link:
-                        name = link.split('#')[1]
-                    string = "\t\t\t\t\t\t<a href=\"%s\">%s</a> " % (link, name)
-                    html_string.append(string)
-                html_string.append("\t\t\t\t\t</p>")
-
-            # close the details div
-            html_string.append("\t\t\t</div>")
-            # close the test case div
-            html_string.append("\t\t</div>")
+            versions = None
+            if fontVersions:
+                versions = fontVersions.get(test["identifier"])
+            html_string.extend(testCaseHTML(test, versions))
     # close body
     html_string.append("\t</body>")
     # close html
@@ -190,7 +301,46 @@ def generateClientIndexHTML(directory=None, testCases=[], note=None):
     # finalize
     html_string = "\n".join(html_string)
     # write
-    path = os.path.join(directory, "testcaseindex.xht")
+    path = os.path.join(directory, fileName)
+    f = open(path, "w")
+    f.write(html_string)
+    f.close()
+
+def generateClientShardIndexHTML(directory=None, shards=[]):
+    """
+    Write shards.xht to directory, the page linking the shard pages of the
+    suite. shards lists the (file name, test count) of each shard page, in
+    order. The page can open every shard and merges the reports they send
+    back (see resources/ift-shards.js).
+    """
+    testCount = sum([count for fileName, count in shards])
+    html_string = [
+        "<!DOCTYPE html PUBLIC \"-//W3C//DTD XHTML 1.1//EN\" \"http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd\">",
+        doNotEditWarning,
+        "<html xmlns=\"http://www.w3.org/1999/xhtml\">",
+        "\t<head>",
+        "\t\t<title>Incremenetal Font Transfer: Client Test Suite Shards</title>",
+        "\t\t<style type=\"text/css\">",
+        "\t\t\t@import \"resources/index.css\";",
+        "\t\t</style>",
+        "\t\t<script type=\"module\" src=\"resources/ift-shards.js\"></script>",
+        "\t</head>",
+        "\t<body>",
+        "\t\t<h1>Incremental Font Transfer: Client Test Suite (%d tests in %d shards)</h1>" % (testCount, len(shards)),
+        "\t\t<div class=\"mainNote\">",
+        "\t\t\tEach shard page runs part of the suite and can be run in its own tab or browser. The reports of the shards opened from this page are merged below; reports downloaded from each shard can be merged with MergeReports.py. The full suite is <a href=\"testcaseindex.xht\">here</a>.",
+        "\t\t</div>",
+        "\t\t<ol class=\"shards\">",
+    ]
+    for number, (fileName, count) in enumerate(shards, 1):
+        html_string.append("\t\t\t<li><a href=\"%s\" data-shard=\"%d\">Shard %d</a> (%d tests)</li>" % (fileName, number, number, count))
+    html_string += [
+        "\t\t</ol>",
+        "\t</body>",
+        "</html>",
+    ]
+    html_string = "\n".join(html_string)
+    path = os.path.join(directory, "shards.xht")
     f = open(path, "w")
     f.write(html_string)
     f.close()
@@ -1,40 +1,151 @@
 import os
-import glob
-import shutil
-from fontTools.ttLib import TTFont
-from testCaseGeneratorLib.paths import clientTestDirectory, buildDirectory
+import logging
+from testCaseGeneratorLib.paths import buildDirectory
+from testCaseGeneratorLib.staging import stageTree, writeFile, testCaseDirectory
+from testCaseGeneratorLib.woff2Writer import saveWOFF2
+from testCaseGeneratorLib.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Decoded source fonts, shared by every IFTFile created in this process and
+# keyed by (path, mtime, size) so a rebuilt font is picked up. See
+# openSourceFont.
+_sourceFontCache = {}
+
+
+class _SourceFontTables:
+    """
+    The decoded table data of a source font. Decoding a WOFF2 font (brotli
+    plus the glyf/loca reconstruction) is the expensive part of loading it,
+    so it is only done once per source font. Instances are shared between
+    tests and must never be modified.
+    """
+
+    def __init__(self, path):
+        from fontTools.ttLib import TTFont
+        with span("decodeSourceFont", path=path):
+            font = TTFont(path)
+            reader = font.reader
+            self.sfntVersion = reader.sfntVersion
+            self.flavor = reader.flavor
+            self.flavorData = reader.flavorData
+            self.tables = {tag: reader[tag] for tag in reader.keys()}
+            font.close()
+
+
+class _SourceFontView:
+    """
+    A copy-on-write stand in for the SFNT reader of a TTFont. Only the table
+    directory is copied, the (immutable) table data is shared with the
+    cached source. The TTFont decompiles its own table objects from it, so
+    edits or deleted tables never leak into another test's font.
+    """
+
+    def __init__(self, source):
+        self.sfntVersion = source.sfntVersion
+        self.flavor = source.flavor
+        self.flavorData = source.flavorData
+        self.tables = dict(source.tables)
+
+    def keys(self):
+        return self.tables.keys()
+
+    def __contains__(self, tag):
+        return tag in self.tables
+
+    def __getitem__(self, tag):
+        return self.tables[tag]
+
+    def __delitem__(self, tag):
+        del self.tables[tag]
+
+    def close(self):
+        pass
+
+
+def openSourceFont(path):
+    """
+    Returns a new TTFont for the font at path. The font is only decoded the
+    first time it is opened in this process (or after it changes on disk),
+    later calls hand out a cheap private view of the cached tables.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    source = _sourceFontCache.get(key)
+    if source is None:
+        for staleKey in [k for k in _sourceFontCache if k[0] == path]:
+            del _sourceFontCache[staleKey]
+        source = _sourceFontCache[key] = _SourceFontTables(path)
+    # fontTools is imported here rather than at module level so that merely
+    # importing (registering) the test cases stays cheap.
+    from fontTools.ttLib import TTFont
+    font = TTFont()
+    font._tableCache = None
+    font.reader = _SourceFontView(source)
+    font.sfntVersion = source.sfntVersion
+    font.flavor = source.flavor
+    font.flavorData = source.flavorData
+    return font
+
+
+def sourceFontPath(fontFormat):
+    return os.path.join(buildDirectory, "IFT", fontFormat, "font.ift.woff2")
+
+
+def reachableCodePoints(fontFormat):
+    """
+    Returns the set of code points that the source IFT font for fontFormat
+    can ever be extended to render: those in its cmap plus those mapped by
+    the entries of its format 2 patch maps ('IFT ' and 'IFTX').
+    """
+    from testCaseGeneratorLib.patchMapFormat2 import PatchMapFormat2
+    font = openSourceFont(sourceFontPath(fontFormat))
+    codePoints = set(font.getBestCmap() or ())
+    for tag in ("IFT ", "IFTX"):
+        if tag not in font:
+            continue
+        data = font[tag].data
+        if data[:1] != b"\x02":
+            continue
+        patchMap = PatchMapFormat2(data)
+        for entry in patchMap.entries:
+            codePoints |= patchMap.codePointSet(entry)
+    return codePoints
+
 
 class IFTFile:
     def __init__(self, testName,format,fontFileName):
         self.testName = testName
         self.format = format
         self.fontFileName = fontFileName
-        self.testDirectory = os.path.join(clientTestDirectory, testName)
-        self.sourceFontPath = os.path.join(buildDirectory, "IFT", format, "font.ift.woff2")
-        self.font = TTFont(self.sourceFontPath)
+        self.testDirectory = testCaseDirectory(testName)
+        self.sourceFontPath = sourceFontPath(format)
+        with span("openSourceFont"):
+            self.font = openSourceFont(self.sourceFontPath)
         self.tbl = None
         self.raw = None
         self.createTestDirectory()
-        self.copyIFTSourceFiles()
+        with span("stagePatches"):
+            self.copyIFTSourceFiles()
     def createTestDirectory(self):
-        if not os.path.exists(self.testDirectory):
-            os.makedirs(self.testDirectory)
+        os.makedirs(self.testDirectory, exist_ok=True)
     def copyIFTSourceFiles(self):
-        # Copy _gk and _tk files from resources/IFT/ to testDirectory
+        # Stage _gk and _tk files from build/IFT/ into testDirectory. They are
+        # hardlinked where possible, so they must be replaced with
+        # staging.writeFile rather than modified in place.
         sourceDir = os.path.join(buildDirectory, "IFT",self.format)
         destDir = os.path.join(self.testDirectory,self.format)
-        if not os.path.exists(destDir):
-            os.makedirs(destDir)
-        for pattern in ("*_gk", "*_tk"):
-            for filePath in glob.glob(os.path.join(sourceDir, pattern)):
-                shutil.copy(filePath, destDir)
-                print(f"Copied {filePath} to {destDir}")
+        os.makedirs(destDir, exist_ok=True)
+        stageTree(sourceDir, destDir, patterns=("*_gk", "*_tk"))
+        logger.debug("Staged %s patches to %s", sourceDir, destDir)
     def getIFTTableData(self):
         if "IFT " not in self.font:
             raise ValueError("IFT table not found in font.")
         # Unknown/custom tables are stored as raw bytes on .data
-        self.tbl = self.font["IFT "]
-        self.raw = bytearray(self.tbl.data)
+        with span("getIFTTableData"):
+            self.tbl = self.font["IFT "]
+            self.raw = bytearray(self.tbl.data)
         return self.raw
     def setIFTTableData(self, data):
         self.raw = bytearray(data)
@@ -44,4 +155,9 @@ class IFTFile:
         del self.font[tableTag]
     def writeTestIFTFile(self):
         outPath = os.path.join(self.testDirectory, self.format, self.fontFileName)
-        self.font.save(outPath)
\ No newline at end of file
+        # Equivalent to self.font.save, but reuses the glyf/loca transform
+        # across tests and honours the configured brotli quality.
+        with span("saveWOFF2"):
+            data = saveWOFF2(self.font)
+        with span("writeFile"):
+            writeFile(outPath, data)
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+Builder/parser for Format 1 patch maps, see
+https://www.w3.org/TR/IFT/#patch-map-format-1
+
+    patchMap = PatchMapFormat1(
+        compatibilityId=compatibilityId,
+        glyphCount=numGlyphs,
+        urlTemplate=bytes([0x80, 7]) + b".ift_tk",
+        entryIndices=array.array("H", glyphToEntry),
+    )
+    nft.setIFTTableData(patchMap.compile())
+
+Glyph map entry indices are held in an array.array ("B" or "H" depending on
+maxEntryIndex) and packed or unpacked in a single call, so a glyph map for a
+font with tens of thousands of glyphs costs no per glyph Python work.
+"""
+
+import sys
+import array
+import struct
+from collections import namedtuple
+
+# format(1) + reserved(3) + flags(1) + compatibilityId(16) +
+# maxEntryIndex(2) + maxGlyphMapEntryIndex(2) + glyphCount(3) +
+# glyphMap(4) + featureMap(4)
+_HEADER = struct.Struct(">B3xB16sHH3sII")
+_UINT16 = struct.Struct(">H")
+_UINT32 = struct.Struct(">I")
+
+# Header flags.
+FLAG_CFF_CHARSTRINGS_OFFSET = 0x01
+FLAG_CFF2_CHARSTRINGS_OFFSET = 0x02
+
+# A feature map record: the entries for featureTag start at
+# firstNewEntryIndex, one for each (firstEntryIndex, lastEntryIndex) in
+# entryMapRecords.
+FeatureMapping = namedtuple("FeatureMapping", "featureTag firstNewEntryIndex entryMapRecords")
+
+
+def _indexTypecode(maxEntryIndex):
+    # entry indices are uint8 if maxEntryIndex is less than 256, else uint16
+    return "B" if maxEntryIndex < 256 else "H"
+
+
+def _packIndices(values, typecode):
+    values = array.array(typecode, values)
+    if values.itemsize > 1 and sys.byteorder == "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpackIndices(data, typecode):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if values.itemsize > 1 and sys.byteorder == "little":
+        values.byteswap()
+    return values
+
+
+class PatchMapFormat1:
+    """
+    A Format 1 patch map.
+
+    entryIndices: The entry index of each glyph from firstMappedGlyph to
+    glyphCount - 1. Any sequence of ints, an array.array is used as is.
+
+    featureMap: None (no feature map) or a list of FeatureMapping.
+
+    appliedEntries: The entry indices to mark in appliedEntriesBitMap.
+
+    maxEntryIndex and maxGlyphMapEntryIndex default to the largest entry
+    index used by the feature map and glyph map.
+    """
+
+    def __init__(self, compatibilityId, glyphCount, urlTemplate, patchFormat=1,
+                 firstMappedGlyph=0, entryIndices=(), featureMap=None, appliedEntries=(),
+                 maxEntryIndex=None, maxGlyphMapEntryIndex=None, flags=0,
+                 cffCharStringsOffset=None, cff2CharStringsOffset=None):
+        self.compatibilityId = bytes(compatibilityId)
+        self.glyphCount = glyphCount
+        self.urlTemplate = bytes(urlTemplate)
+        self.patchFormat = patchFormat
+        self.firstMappedGlyph = firstMappedGlyph
+        self.entryIndices = entryIndices
+        self.featureMap = featureMap
+        self.appliedEntries = set(appliedEntries)
+        self.maxEntryIndex = maxEntryIndex
+        self.maxGlyphMapEntryIndex = maxGlyphMapEntryIndex
+        self.flags = flags
+        self.cffCharStringsOffset = cffCharStringsOffset
+        self.cff2CharStringsOffset = cff2CharStringsOffset
+
+    def _maxIndices(self):
+        maxGlyphMapEntryIndex = self.maxGlyphMapEntryIndex
+        if maxGlyphMapEntryIndex is None:
+            maxGlyphMapEntryIndex = max(self.entryIndices, default=0)
+        maxEntryIndex = self.maxEntryIndex
+        if maxEntryIndex is None:
+            maxEntryIndex = maxGlyphMapEntryIndex
+            for mapping in self.featureMap or ():
+                lastNewEntryIndex = mapping.firstNewEntryIndex + len(mapping.entryMapRecords) - 1
+                maxEntryIndex = max(maxEntryIndex, lastNewEntryIndex)
+        return maxEntryIndex, maxGlyphMapEntryIndex
+
+    def _compileGlyphMap(self, typecode):
+        if len(self.entryIndices) != self.glyphCount - self.firstMappedGlyph:
+            raise ValueError("Glyph map needs %d entry indices (glyphCount - firstMappedGlyph), got %d"
+                             % (self.glyphCount - self.firstMappedGlyph, len(self.entryIndices)))
+        return _UINT16.pack(self.firstMappedGlyph) + _packIndices(self.entryIndices, typecode)
+
+    def _compileFeatureMap(self, typecode):
+        records = [_UINT16.pack(len(self.featureMap))]
+        ranges = []
+        for mapping in self.featureMap:
+            records.append(mapping.featureTag.encode("latin-1"))
+            records.append(_packIndices((mapping.firstNewEntryIndex, len(mapping.entryMapRecords)), typecode))
+            for first, last in mapping.entryMapRecords:
+                ranges.extend((first, last))
+        records.append(_packIndices(ranges, typecode))
+        return b"".join(records)
+
+    def compile(self):
+        """
+        Returns the table data.
+        """
+        maxEntryIndex, maxGlyphMapEntryIndex = self._maxIndices()
+        typecode = _indexTypecode(maxEntryIndex)
+
+        bitMap = bytearray((maxEntryIndex + 8) // 8)
+        for index in self.appliedEntries:
+            bitMap[index // 8] |= 1 << (index % 8)
+
+        flags = self.flags
+        tail = bytearray()
+        if self.cffCharStringsOffset is not None:
+            flags |= FLAG_CFF_CHARSTRINGS_OFFSET
+            tail += _UINT32.pack(self.cffCharStringsOffset)
+        if self.cff2CharStringsOffset is not None:
+            flags |= FLAG_CFF2_CHARSTRINGS_OFFSET
+            tail += _UINT32.pack(self.cff2CharStringsOffset)
+
+        variable = (bytes(bitMap) + _UINT16.pack(len(self.urlTemplate)) + self.urlTemplate
+                    + bytes([self.patchFormat]) + tail)
+        glyphMap = self._compileGlyphMap(typecode)
+        glyphMapOffset = _HEADER.size + len(variable)
+        featureMapOffset = 0
+        featureMap = b""
+        if self.featureMap is not None:
+            featureMapOffset = glyphMapOffset + len(glyphMap)
+            featureMap = self._compileFeatureMap(typecode)
+
+        header = _HEADER.pack(
+            1, flags, self.compatibilityId, maxEntryIndex, maxGlyphMapEntryIndex,
+            self.glyphCount.to_bytes(3, "big"), glyphMapOffset, featureMapOffset,
+        )
+        return header + variable + glyphMap + featureMap
+
+    @classmethod
+    def decompile(cls, data):
+        """
+        Parse Format 1 table data. The glyph map entry indices are returned
+        as an array.array.
+        """
+        view = memoryview(data)
+        (tableFormat, flags, compatibilityId, maxEntryIndex, maxGlyphMapEntryIndex,
+         glyphCount, glyphMapOffset, featureMapOffset) = _HEADER.unpack_from(view, 0)
+        if tableFormat != 1:
+            raise ValueError("Expected IFT patch map format 1, found %d" % tableFormat)
+        glyphCount = int.from_bytes(glyphCount, "big")
+        typecode = _indexTypecode(maxEntryIndex)
+        width = array.array(typecode).itemsize
+
+        offset = _HEADER.size
+        bitMapLength = (maxEntryIndex + 8) // 8
+        bitMap = view[offset:offset + bitMapLength]
+        appliedEntries = [i for i in range(maxEntryIndex + 1) if bitMap[i // 8] & (1 << (i % 8))]
+        offset += bitMapLength
+        urlTemplateLength = _UINT16.unpack_from(view, offset)[0]
+        offset += 2
+        urlTemplate = bytes(view[offset:offset + urlTemplateLength])
+        offset += urlTemplateLength
+        patchFormat = view[offset]
+        offset += 1
+        cffCharStringsOffset = cff2CharStringsOffset = None
+        if flags & FLAG_CFF_CHARSTRINGS_OFFSET:
+            cffCharStringsOffset = _UINT32.unpack_from(view, offset)[0]
+            offset += 4
+        if flags & FLAG_CFF2_CHARSTRINGS_OFFSET:
+            cff2CharStringsOffset = _UINT32.unpack_from(view, offset)[0]
+            offset += 4
+
+        firstMappedGlyph = _UINT16.unpack_from(view, glyphMapOffset)[0]
+        start = glyphMapOffset + 2
+        end = start + (glyphCount - firstMappedGlyph) * width
+        entryIndices = _unpackIndices(view[start:end], typecode)
+
+        featureMap = None
+        if featureMapOffset:
+            featureMap = []
+            featureCount = _UINT16.unpack_from(view, featureMapOffset)[0]
+            position = featureMapOffset + 2
+            records = []
+            for _ in range(featureCount):
+                tag = bytes(view[position:position + 4]).decode("latin-1")
+                position += 4
+                firstNewEntryIndex, entryMapCount = _unpackIndices(view[position:position + 2 * width], typecode)
+                position += 2 * width
+                records.append((tag, firstNewEntryIndex, entryMapCount))
+            for tag, firstNewEntryIndex, entryMapCount in records:
+                ranges = _unpackIndices(view[position:position + 2 * width * entryMapCount], typecode)
+                position += 2 * width * entryMapCount
+                entryMapRecords = list(zip(ranges[0::2], ranges[1::2]))
+                featureMap.append(FeatureMapping(tag, firstNewEntryIndex, entryMapRecords))
+
+        return cls(
+            compatibilityId=compatibilityId, glyphCount=glyphCount, urlTemplate=urlTemplate,
+            patchFormat=patchFormat, firstMappedGlyph=firstMappedGlyph, entryIndices=entryIndices,
+            featureMap=featureMap, appliedEntries=appliedEntries, maxEntryIndex=maxEntryIndex,
+            maxGlyphMapEntryIndex=maxGlyphMapEntryIndex, flags=flags,
+            cffCharStringsOffset=cffCharStringsOffset, cff2CharStringsOffset=cff2CharStringsOffset,
+        )
@@ -0,0 +1,498 @@
+"""
+Decoder/encoder for Format 2 patch maps (the 'IFT ' and 'IFTX' tables), see
+https://www.w3.org/TR/IFT/#patch-map-format-2
+
+A PatchMapFormat2 wraps a private bytearray copy of the table. Header fields
+are read and written in place with precompiled struct layouts. The mapping
+entries are located by an offset index (see MappingEntry) that is built on
+first use and cached by the hash of the table data, so every test that
+loads the same source patch map shares one scan, and each field edit after
+that is a direct lookup:
+
+    patchMap = PatchMapFormat2(nft.getIFTTableData())
+    entry = patchMap.entries[0]
+    patchMap.setDesignSpaceSegment(entry, 0, end=-1.0)
+    nft.setIFTTableData(patchMap.getData())
+
+The index describes the table as it was when the entries were first read,
+and is cached by the hash of the table at that point, so header edits made
+before then are indexed and never leak into the index of another instance.
+Field setters never change the length of a field, so the index remains
+valid across edits; operations that resize the table (withUrlTemplate)
+return new table data instead.
+"""
+
+import struct
+import hashlib
+
+# format(1) + reserved(3) + flags(1) + compatibilityId(16) +
+# defaultPatchFormat(1) + entryCount(3) + entries(4) +
+# entryIdStringData(4) + urlTemplateLength(2)
+_HEADER = struct.Struct(">B3xB16sB3sIIH")
+
+_UINT8 = struct.Struct(">B")
+_UINT16 = struct.Struct(">H")
+_UINT32 = struct.Struct(">I")
+_TAG = struct.Struct(">4s")
+_COMPATIBILITY_ID = struct.Struct(">16s")
+_DESIGN_SPACE_SEGMENT = struct.Struct(">4sii")
+
+# Header fields, as (layout, offset).
+_FORMAT = (_UINT8, 0)
+_FLAGS = (_UINT8, 4)
+_COMPATIBILITY_ID_FIELD = (_COMPATIBILITY_ID, 5)
+_DEFAULT_PATCH_FORMAT = (_UINT8, 21)
+_ENTRIES_OFFSET = (_UINT32, 25)
+_ENTRY_ID_STRING_DATA_OFFSET = (_UINT32, 29)
+_URL_TEMPLATE_LENGTH = (_UINT16, 33)
+
+HEADER_SIZE = _HEADER.size
+URL_TEMPLATE_OFFSET = HEADER_SIZE
+
+# Header flags.
+FLAG_CFF_CHARSTRINGS_OFFSET = 0x01
+FLAG_CFF2_CHARSTRINGS_OFFSET = 0x02
+
+# Mapping entry formatFlags.
+ENTRY_FEATURES_AND_DESIGN_SPACE = 0x01
+ENTRY_CHILD_INDICES = 0x02
+ENTRY_ID = 0x04
+ENTRY_PATCH_FORMAT = 0x08
+ENTRY_CODEPOINTS = 0x30
+ENTRY_IGNORED = 0x40
+
+# Sparse bit set branch factor (header bits 0-1) -> (B, maximum height).
+SPARSE_BIT_SET_BRANCH_FACTORS = {
+    0: (2, 31),
+    1: (4, 16),
+    2: (8, 11),
+    3: (32, 7),
+}
+
+# Entry offset indices, keyed by the sha256 of the table data.
+_entryIndexCache = {}
+
+
+def _uint24(view, offset):
+    return int.from_bytes(view[offset:offset + 3], "big")
+
+
+def _toFixed(value):
+    return int(round(value * 0x10000))
+
+
+def _fromFixed(value):
+    return value / 0x10000
+
+
+def sparseBitSetLength(view, offset):
+    """
+    Returns the encoded length in bytes of the sparse bit set starting at
+    offset, see https://www.w3.org/TR/IFT/#sparse-bit-set-decoding
+    """
+    header = view[offset]
+    branchFactor, maxHeight = SPARSE_BIT_SET_BRANCH_FACTORS[header & 0x03]
+    height = (header >> 2) & 0x1F
+    if height == 0:
+        return 1
+    if height > maxHeight:
+        raise ValueError("Sparse bit set height %d exceeds maximum %d" % (height, maxHeight))
+    nodeBytes = max(branchFactor // 8, 1)
+    nodesPerByte = max(8 // branchFactor, 1)
+    mask = (1 << branchFactor) - 1
+    start = offset + 1
+    nodeIndex = 0
+    levelNodes = 1
+    for depth in range(height):
+        nextLevelNodes = 0
+        for _ in range(levelNodes):
+            if branchFactor == 32:
+                position = start + nodeIndex * 4
+                value = int.from_bytes(view[position:position + 4], "little")
+            else:
+                byte = view[start + nodeIndex // nodesPerByte]
+                value = (byte >> ((nodeIndex % nodesPerByte) * branchFactor)) & mask
+            nodeIndex += 1
+            # A zero node is a completely filled subtree and has no children.
+            if depth < height - 1 and value:
+                nextLevelNodes += bin(value).count("1")
+        levelNodes = nextLevelNodes
+    if branchFactor == 32:
+        return 1 + nodeIndex * nodeBytes
+    return 1 + (nodeIndex + nodesPerByte - 1) // nodesPerByte
+
+
+def decodeSparseBitSet(view, offset):
+    """
+    Returns the set of values in the sparse bit set starting at offset, see
+    https://www.w3.org/TR/IFT/#sparse-bit-set-decoding
+    """
+    header = view[offset]
+    branchFactor, maxHeight = SPARSE_BIT_SET_BRANCH_FACTORS[header & 0x03]
+    height = (header >> 2) & 0x1F
+    values = set()
+    if height == 0:
+        return values
+    if height > maxHeight:
+        raise ValueError("Sparse bit set height %d exceeds maximum %d" % (height, maxHeight))
+    nodesPerByte = max(8 // branchFactor, 1)
+    mask = (1 << branchFactor) - 1
+    start = offset + 1
+    nodeIndex = 0
+    # (first value covered by the node, values covered by each child)
+    level = [(0, branchFactor ** (height - 1))]
+    for depth in range(height):
+        nextLevel = []
+        for base, childSpan in level:
+            if branchFactor == 32:
+                position = start + nodeIndex * 4
+                value = int.from_bytes(view[position:position + 4], "little")
+            else:
+                byte = view[start + nodeIndex // nodesPerByte]
+                value = (byte >> ((nodeIndex % nodesPerByte) * branchFactor)) & mask
+            nodeIndex += 1
+            if not value:
+                # A completely filled subtree.
+                values.update(range(base, base + childSpan * branchFactor))
+                continue
+            for bit in range(branchFactor):
+                if value & (1 << bit):
+                    if depth == height - 1:
+                        values.add(base + bit)
+                    else:
+                        nextLevel.append((base + bit * childSpan, childSpan // branchFactor))
+        level = nextLevel
+    return values
+
+
+class MappingEntry:
+    """
+    The location of one mapping entry and of each of its fields within the
+    table. Offsets are absolute (from the start of the table); a field that
+    the entry does not have is None (or an empty tuple).
+
+    offset, end: The span of the whole entry.
+    formatFlags: The entry's formatFlags byte.
+    featureTagsOffset, featureCount: The featureTags array.
+    designSpaceOffset, designSpaceCount: The designSpaceSegments array.
+    childEntryMatchMode, childIndicesOffset, childEntryCount: The
+        childEntryIndices array (uint24 each).
+    entryIdOffsets: Offsets of each uint24 entryIdDelta, or of each
+        entryIdStringLength when the table has entryIdStringData.
+    entryIdStringSpans: (offset, length) of each of the entry's id strings
+        within the entryIdStringData.
+    patchFormatOffset: The patchFormat byte.
+    biasOffset, biasSize: The bias (2 or 3 bytes).
+    codePointsOffset, codePointsLength: The codePoints sparse bit set.
+    """
+
+    __slots__ = (
+        "index", "offset", "end", "formatFlags",
+        "featureTagsOffset", "featureCount",
+        "designSpaceOffset", "designSpaceCount",
+        "childEntryMatchMode", "childIndicesOffset", "childEntryCount",
+        "entryIdOffsets", "entryIdStringSpans",
+        "patchFormatOffset",
+        "biasOffset", "biasSize",
+        "codePointsOffset", "codePointsLength",
+    )
+
+    def __init__(self, index, offset):
+        self.index = index
+        self.offset = offset
+        self.end = None
+        self.formatFlags = 0
+        self.featureTagsOffset = None
+        self.featureCount = 0
+        self.designSpaceOffset = None
+        self.designSpaceCount = 0
+        self.childEntryMatchMode = None
+        self.childIndicesOffset = None
+        self.childEntryCount = 0
+        self.entryIdOffsets = ()
+        self.entryIdStringSpans = ()
+        self.patchFormatOffset = None
+        self.biasOffset = None
+        self.biasSize = 0
+        self.codePointsOffset = None
+        self.codePointsLength = 0
+
+    @property
+    def hasCodePoints(self):
+        return self.codePointsOffset is not None
+
+
+def _indexEntries(view):
+    """
+    Scan the mapping entries once, recording where every field lives.
+    """
+    _, _, _, _, entryCount, entriesOffset, stringDataOffset, _ = _HEADER.unpack_from(view, 0)
+    entryCount = int.from_bytes(entryCount, "big")
+    stringPosition = stringDataOffset
+    entries = []
+    offset = entriesOffset
+    for index in range(entryCount):
+        entry = MappingEntry(index, offset)
+        flags = entry.formatFlags = view[offset]
+        offset += 1
+
+        if flags & ENTRY_FEATURES_AND_DESIGN_SPACE:
+            entry.featureCount = view[offset]
+            entry.featureTagsOffset = offset + 1
+            offset += 1 + entry.featureCount * _TAG.size
+            entry.designSpaceCount = _UINT16.unpack_from(view, offset)[0]
+            entry.designSpaceOffset = offset + 2
+            offset += 2 + entry.designSpaceCount * _DESIGN_SPACE_SEGMENT.size
+
+        if flags & ENTRY_CHILD_INDICES:
+            matchModeAndCount = view[offset]
+            entry.childEntryMatchMode = matchModeAndCount >> 7
+            entry.childEntryCount = matchModeAndCount & 0x7F
+            entry.childIndicesOffset = offset + 1
+            offset += 1 + entry.childEntryCount * 3
+
+        if flags & ENTRY_ID:
+            # entryIdDelta values continue while the LSB is set,
+            # entryIdStringLength values while the MSB is set.
+            continueBit = 0x800000 if stringDataOffset else 0x000001
+            idOffsets = []
+            spans = []
+            while True:
+                value = _uint24(view, offset)
+                idOffsets.append(offset)
+                offset += 3
+                if stringDataOffset:
+                    length = value & 0x7FFFFF
+                    spans.append((stringPosition, length))
+                    stringPosition += length
+                if not value & continueBit:
+                    break
+            entry.entryIdOffsets = tuple(idOffsets)
+            entry.entryIdStringSpans = tuple(spans)
+
+        if flags & ENTRY_PATCH_FORMAT:
+            entry.patchFormatOffset = offset
+            offset += 1
+
+        if flags & ENTRY_CODEPOINTS:
+            if flags & 0x20:
+                entry.biasSize = 3 if flags & 0x10 else 2
+                entry.biasOffset = offset
+                offset += entry.biasSize
+            entry.codePointsOffset = offset
+            entry.codePointsLength = sparseBitSetLength(view, offset)
+            offset += entry.codePointsLength
+
+        entry.end = offset
+        entries.append(entry)
+    return tuple(entries)
+
+
+class PatchMapFormat2:
+    """
+    A Format 2 patch map. data is the raw table; it is copied, use
+    getData to retrieve the edited table.
+    """
+
+    def __init__(self, data):
+        self.data = bytearray(data)
+        self.view = memoryview(self.data)
+        if self.format != 2:
+            raise ValueError("Expected IFT patch map format 2, found %d" % self.format)
+        self._entries = None
+
+    def getData(self):
+        return bytes(self.data)
+
+    # Header
+
+    def _get(self, field):
+        layout, offset = field
+        return layout.unpack_from(self.view, offset)[0]
+
+    def _set(self, field, value):
+        layout, offset = field
+        layout.pack_into(self.view, offset, value)
+
+    format = property(lambda self: self._get(_FORMAT), lambda self, v: self._set(_FORMAT, v))
+    flags = property(lambda self: self._get(_FLAGS), lambda self, v: self._set(_FLAGS, v))
+    compatibilityId = property(lambda self: self._get(_COMPATIBILITY_ID_FIELD),
+                               lambda self, v: self._set(_COMPATIBILITY_ID_FIELD, v))
+    defaultPatchFormat = property(lambda self: self._get(_DEFAULT_PATCH_FORMAT),
+                                  lambda self, v: self._set(_DEFAULT_PATCH_FORMAT, v))
+    entriesOffset = property(lambda self: self._get(_ENTRIES_OFFSET),
+                             lambda self, v: self._set(_ENTRIES_OFFSET, v))
+    entryIdStringDataOffset = property(lambda self: self._get(_ENTRY_ID_STRING_DATA_OFFSET),
+                                       lambda self, v: self._set(_ENTRY_ID_STRING_DATA_OFFSET, v))
+
+    @property
+    def entryCount(self):
+        return _uint24(self.view, 22)
+
+    @entryCount.setter
+    def entryCount(self, value):
+        self.view[22:25] = value.to_bytes(3, "big")
+
+    @property
+    def urlTemplate(self):
+        length = self._get(_URL_TEMPLATE_LENGTH)
+        return bytes(self.view[URL_TEMPLATE_OFFSET:URL_TEMPLATE_OFFSET + length])
+
+    def withUrlTemplate(self, urlTemplate):
+        """
+        Returns new table data with the URL template replaced. The entries and
+        entryIdStringData offsets are moved by the change in length. The
+        optional CFF charstring offsets that follow the template are copied
+        unchanged, they are relative to the CFF/CFF2 table.
+        """
+        oldLength = self._get(_URL_TEMPLATE_LENGTH)
+        suffixStart = URL_TEMPLATE_OFFSET + oldLength
+        delta = len(urlTemplate) - oldLength
+
+        data = bytearray(self.view[:URL_TEMPLATE_OFFSET])
+        data += urlTemplate
+        data += self.view[suffixStart:]
+        _UINT16.pack_into(data, _URL_TEMPLATE_LENGTH[1], len(urlTemplate))
+        for layout, position in (_ENTRIES_OFFSET, _ENTRY_ID_STRING_DATA_OFFSET):
+            offset = layout.unpack_from(data, position)[0]
+            if offset != 0 and offset >= suffixStart:
+                layout.pack_into(data, position, offset + delta)
+        return data
+
+    # Mapping entries
+
+    @property
+    def entries(self):
+        """
+        The MappingEntry index of every mapping entry, in table order. It is
+        built from the table as it is when first read, edits included:
+
+        >>> table = (bytes([2, 0, 0, 0, 0]) + bytes(16) + bytes([1]) + (3).to_bytes(3, "big")
+        ...          + (35).to_bytes(4, "big") + bytes(6) + bytes(3))
+        >>> edited = PatchMapFormat2(table)
+        >>> edited.entryCount = 1
+        >>> len(edited.entries)
+        1
+        >>> len(PatchMapFormat2(table).entries)
+        3
+        """
+        if self._entries is None:
+            # Hashed here rather than on load, the header may have been
+            # edited since.
+            digest = hashlib.sha256(self.view).digest()
+            entries = _entryIndexCache.get(digest)
+            if entries is None:
+                entries = _entryIndexCache[digest] = _indexEntries(self.view)
+            self._entries = entries
+        return self._entries
+
+    def featureTags(self, entry):
+        start = entry.featureTagsOffset
+        if start is None:
+            return []
+        return [bytes(self.view[o:o + 4]).decode("latin-1")
+                for o in range(start, start + entry.featureCount * 4, 4)]
+
+    def designSpaceSegments(self, entry):
+        """
+        Returns (tag, start, end) for each design space segment, with start
+        and end converted from Fixed.
+        """
+        if entry.designSpaceOffset is None:
+            return []
+        segments = []
+        for i in range(entry.designSpaceCount):
+            tag, start, end = _DESIGN_SPACE_SEGMENT.unpack_from(
+                self.view, entry.designSpaceOffset + i * _DESIGN_SPACE_SEGMENT.size)
+            segments.append((tag.decode("latin-1"), _fromFixed(start), _fromFixed(end)))
+        return segments
+
+    def setDesignSpaceSegment(self, entry, segmentIndex, tag=None, start=None, end=None):
+        """
+        Overwrite fields of one design space segment. start and end are
+        given as floats and stored as Fixed.
+        """
+        if not 0 <= segmentIndex < entry.designSpaceCount:
+            raise IndexError("Entry %d has no design space segment %d" % (entry.index, segmentIndex))
+        offset = entry.designSpaceOffset + segmentIndex * _DESIGN_SPACE_SEGMENT.size
+        oldTag, oldStart, oldEnd = _DESIGN_SPACE_SEGMENT.unpack_from(self.view, offset)
+        _DESIGN_SPACE_SEGMENT.pack_into(
+            self.view, offset,
+            oldTag if tag is None else tag.encode("latin-1"),
+            oldStart if start is None else _toFixed(start),
+            oldEnd if end is None else _toFixed(end),
+        )
+
+    def childEntryIndices(self, entry):
+        start = entry.childIndicesOffset
+        if start is None:
+            return []
+        return [_uint24(self.view, o) for o in range(start, start + entry.childEntryCount * 3, 3)]
+
+    def entryIdValues(self, entry):
+        """
+        The raw uint24 entryIdDelta (or entryIdStringLength) values, including
+        their continuation bits.
+        """
+        return [_uint24(self.view, o) for o in entry.entryIdOffsets]
+
+    def entryIdStrings(self, entry):
+        return [bytes(self.view[o:o + length]) for o, length in entry.entryIdStringSpans]
+
+    def patchFormat(self, entry):
+        if entry.patchFormatOffset is None:
+            return self.defaultPatchFormat
+        return self.view[entry.patchFormatOffset]
+
+    def setPatchFormat(self, entry, value):
+        if entry.patchFormatOffset is None:
+            raise ValueError("Entry %d has no patchFormat field" % entry.index)
+        self.view[entry.patchFormatOffset] = value
+
+    def bias(self, entry):
+        if entry.biasOffset is None:
+            return 0
+        return int.from_bytes(self.view[entry.biasOffset:entry.biasOffset + entry.biasSize], "big")
+
+    def codePoints(self, entry):
+        """
+        The raw bytes of the entry's codePoints sparse bit set.
+        """
+        if entry.codePointsOffset is None:
+            return None
+        return bytes(self.view[entry.codePointsOffset:entry.codePointsOffset + entry.codePointsLength])
+
+    def codePointSet(self, entry):
+        """
+        The set of code points the entry maps, with its bias applied.
+        """
+        if entry.codePointsOffset is None:
+            return set()
+        bias = self.bias(entry)
+        return {value + bias for value in decodeSparseBitSet(self.view, entry.codePointsOffset)}
+
+    def sparseBitSetHeader(self, entry):
+        """
+        Returns (branch factor bits, height) of the entry's codePoints set.
+        """
+        header = self.view[entry.codePointsOffset]
+        return header & 0x03, (header >> 2) & 0x1F
+
+    def setSparseBitSetHeader(self, entry, branchFactorBits=None, height=None):
+        """
+        Overwrite the header byte of the entry's codePoints set. Only the
+        header changes, the tree nodes that follow are left as they are.
+        """
+        if entry.codePointsOffset is None:
+            raise ValueError("Entry %d has no codePoints field" % entry.index)
+        oldBranchFactorBits, oldHeight = self.sparseBitSetHeader(entry)
+        if branchFactorBits is None:
+            branchFactorBits = oldBranchFactorBits
+        if height is None:
+            height = oldHeight
+        self.view[entry.codePointsOffset] = (branchFactorBits & 0x03) | ((height & 0x1F) << 2)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
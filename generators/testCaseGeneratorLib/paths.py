@@ -46,6 +46,8 @@ fallbackDirectory = os.path.join(fontsDirectory, "fallback")
 clientDirectory = os.path.join(mainDirectory, "IFTClient")
 clientTestDirectory = os.path.join(clientDirectory, "Tests", "xhtml1")
 clientTestResourcesDirectory = os.path.join(clientTestDirectory, "resources")
+# content addressed store that the test files link to, see blobStore.py
+clientBlobDirectory = os.path.join(clientDirectory, "blobs")
 
 if __name__ == "__main__":
     import doctest
@@ -0,0 +1,142 @@
+"""
+The registry of client test cases.
+
+Test cases are declared by the modules in the clientTestCases package, each
+of which calls writeTest once per test case when it is imported. Registering
+a test case has no side effects beyond recording it here: nothing is written
+to disk until the cells collected in testCells are run (see
+scheduler.runTestCells).
+"""
+
+import fnmatch
+
+from testCaseGeneratorLib.html import expandSpecLinks
+from testCaseGeneratorLib.scheduler import TestCell
+
+# ---------------
+# Test Case Index
+# ---------------
+
+# As the tests are registered a log will be kept.
+# This log will be translated into an index after
+# all of the tests have been written.
+
+indexNote = """
+index note
+""".strip()
+
+
+clientNote = """
+client note
+""".strip()
+
+groupDefinitions = [
+    # identifier, title, spec section, category note
+    ("client", "Client Conformance Tests", expandSpecLinks("#DataTables"), clientNote),
+]
+
+testRegistry = {}
+for group in groupDefinitions:
+    tag = group[0]
+    testRegistry[tag] = []
+
+# -----------------
+# Test Case Writing
+# -----------------
+
+registeredIdentifiers = set()
+registeredTitles = set()
+registeredDescriptions = set()
+testCells = []
+
+def writeTest(identifier, title, description, fontFormats, func, funcArgs=None, specLink=None, credits=[], shouldShowIFT=False, extraHTML=None):
+    """
+    This function registers a test case with the suite and records the
+    work needed to generate its files. The arguments:
+
+    identifier: The identifier for the test case. The identifier must be
+    a - separated sequence of group name (from the groupDefinitions
+    listed above), and test case description (arbitrary length).
+
+    title: A thorough, but not too long, title for the test case.
+
+    description: A detailed statement about what the test case is proving.
+
+    func: The function that generates the IFT files specific for the test.
+
+    specLink: The anchor in the WOFF spec that the test case is testing.
+
+    credits: A list of dictionaries defining the credits for the test case. The
+    dictionaries must have this form:
+
+        title="Name of the autor or reviewer",
+        role="author or reviewer",
+        link="mailto:email or http://contactpage"
+
+    shouldShowIFT: A boolean indicating if the SFNT is valid enough for
+    conversion to WOFF.
+
+    extraHTML: Optional raw HTML (and inline <script>/<iframe> markup) that is
+    inserted verbatim into the test case's details block on the generated
+    index page. Used for tests that need custom client-side script assertions
+    beyond the standard "does the IFT font render" check (e.g. tests that
+    require a second Document/iframe to verify cross-document behavior).
+
+    The files themselves are not written here, one cell per font format is
+    added to testCells and run later (see scheduler.runTestCells).
+    """
+    assert identifier not in registeredIdentifiers, "Duplicate identifier! %s" % identifier
+    assert title not in registeredTitles, "Duplicate title! %s" % title
+    assert description not in registeredDescriptions, "Duplicate description! %s" % description
+    registeredIdentifiers.add(identifier)
+    registeredTitles.add(title)
+    registeredDescriptions.add(description)
+
+    for fontFormat in fontFormats:
+        testCells.append(TestCell(identifier, fontFormat, func, funcArgs))
+
+    specLink = expandSpecLinks(specLink)
+
+    # register the test
+    tag = identifier.split("-")[0]
+    testRegistry[tag].append(
+        dict(
+            identifier=identifier,
+            title=title,
+            description=description,
+            shouldShowIFT=shouldShowIFT,
+            specLink=specLink,
+            fontFormats=fontFormats,
+            extraHTML=extraHTML,
+        )
+    )
+
+
+# ---------------
+# Cell Selection
+# ---------------
+
+def _matches(cell, pattern):
+    """
+    A pattern is either a glob matched against the test identifier, or
+    "IDENTIFIER_GLOB/FORMAT_GLOB" to also select the font format (matched
+    case insensitively).
+    """
+    identifierPattern, _, formatPattern = pattern.partition("/")
+    if not fnmatch.fnmatchcase(cell.identifier, identifierPattern):
+        return False
+    return not formatPattern or fnmatch.fnmatchcase(cell.fontFormat.lower(), formatPattern.lower())
+
+
+def selectCells(cells, only=None, exclude=None):
+    """
+    Returns the cells matched by at least one of the only patterns (all
+    cells if only is empty) and by none of the exclude patterns.
+    """
+    only = only or []
+    exclude = exclude or []
+    return [
+        cell for cell in cells
+        if (not only or any(_matches(cell, p) for p in only))
+        and not any(_matches(cell, p) for p in exclude)
+    ]
@@ -0,0 +1,130 @@
+"""
+Runs the (test, font format) cells recorded by writeTest, either serially
+or spread over a pool of worker processes.
+
+Test modules only register their cells when imported (see registry.py), so
+workers may be started with any multiprocessing start method: a worker
+that unpickles a cell imports the cell's test module, which has no side
+effects beyond registering that module's tests in the worker.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from testCaseGeneratorLib.staging import stagedTestOutput
+from testCaseGeneratorLib.tracing import (
+    TEST_CATEGORY,
+    span,
+    enableTracing,
+    tracingEnabled,
+    takeEvents,
+    addEvents,
+    profileCall,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TestCell:
+    """
+    One unit of generation work: a single test case built for a single font
+    format. The func and funcArgs are exactly what was handed to writeTest.
+    """
+
+    def __init__(self, identifier, fontFormat, func, funcArgs=None):
+        self.identifier = identifier
+        self.fontFormat = fontFormat
+        self.func = func
+        self.funcArgs = funcArgs
+
+    @property
+    def name(self):
+        return "%s/%s" % (self.identifier, self.fontFormat)
+
+    def run(self):
+        """
+        Generate the cell's files in a temporary directory and move them into
+        place once complete (see staging.stagedTestOutput).
+        """
+        with span(self.name, category=TEST_CATEGORY), stagedTestOutput(self.identifier, self.fontFormat):
+            if self.funcArgs is not None:
+                self.func(self.fontFormat, *self.funcArgs)
+            else:
+                self.func(self.fontFormat)
+
+
+def _initWorker(logLevel, tracing):
+    # Spawned workers start with logging unconfigured and tracing off.
+    logging.basicConfig(level=logLevel, format="%(message)s")
+    enableTracing(tracing)
+
+
+def _runCell(cell, profile=False):
+    """
+    Run cell, returning the spans it recorded and, if profile is set, its
+    profile stats.
+    """
+    stats = None
+    if profile:
+        stats = profileCall(cell.run)
+    else:
+        cell.run()
+    return takeEvents(), stats
+
+
+def runTestCells(cells, jobs=1, manifest=None, profile=None):
+    """
+    Run every cell. Cells are started in the order given, and progress and
+    errors are reported in that same order regardless of which worker
+    finishes first, so the output of a parallel run reads exactly like a
+    serial one.
+
+    jobs: The number of worker processes. 1 (the default) runs every cell
+    in this process.
+
+    manifest: An optional buildManifest.BuildManifest. Cells it reports as
+    up to date are skipped, and every cell that is run is recorded in it.
+
+    profile: An optional tracing.ProfileStats. Every cell is run under
+    cProfile and its stats are added to it.
+    """
+    if manifest is not None:
+        with span("checkBuildManifest"):
+            upToDate = [cell for cell in cells if manifest.isUpToDate(cell)]
+        if upToDate:
+            logger.info("Skipping %d up to date test cells...", len(upToDate))
+        cells = [cell for cell in cells if cell not in upToDate]
+
+    try:
+        if jobs <= 1:
+            previous = None
+            for cell in cells:
+                if cell.identifier != previous:
+                    logger.info("Compiling %s...", cell.identifier)
+                    previous = cell.identifier
+                if profile is not None:
+                    profile.add(profileCall(cell.run))
+                else:
+                    cell.run()
+                if manifest is not None:
+                    manifest.record(cell)
+            return
+
+        initargs = (logging.getLogger().getEffectiveLevel(), tracingEnabled())
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_initWorker, initargs=initargs) as executor:
+            futures = [executor.submit(_runCell, cell, profile is not None) for cell in cells]
+            previous = None
+            for cell, future in zip(cells, futures):
+                if cell.identifier != previous:
+                    logger.info("Compiling %s...", cell.identifier)
+                    previous = cell.identifier
+                events, stats = future.result()
+                addEvents(events)
+                if profile is not None:
+                    profile.add(stats)
+                if manifest is not None:
+                    manifest.record(cell)
+    finally:
+        # Saved even if a cell fails, so finished cells are not redone.
+        if manifest is not None:
+            manifest.save()
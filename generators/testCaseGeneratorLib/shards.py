@@ -0,0 +1,162 @@
+"""
+Shards of the client test index, for running the suite in parallel.
+
+testcaseindex.xht holds every test, so one browser tab has to run the whole
+suite. Given a shard count the generator also writes testcaseindex-<n>.xht
+for each n from 1 to the count, each holding a share of the tests, and
+shards.xht, which links them (see html.generateClientShardIndexHTML). Each
+shard page runs on its own, in a tab or in a separate browser, and produces
+the usual report (see resources/ift.js) along with the shard it covered.
+
+Tests are split by count, keeping the order of the index, or by the time
+each one took in the report of an earlier run: tests are handed out from
+the slowest down, each to the shard with the least time so far, so that
+the shards take about as long as each other. A test the report does not
+know is assumed to take the median time. Within a shard the tests keep the
+order of the index.
+
+The shard reports are merged into one by mergeReports, from the files
+downloaded from each shard page (see MergeReports.py). shards.xht does the
+same in the browser for the shard pages it opens.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+
+_SUMMARY_KEYS = ("loaded", "errors", "timeouts", "requests", "bytes")
+_STATUS_KEYS = dict(loaded="loaded", error="errors", timeout="timeouts")
+
+
+def shardFileName(number):
+    """
+    The name of the index page of shard number, counted from 1. number may
+    also be a glob, such as "*", to match the names of every shard page.
+    """
+    return "testcaseindex-%s.xht" % number
+
+
+def loadReport(path):
+    """
+    Returns the harness report stored at path. Raises ValueError if it is
+    unreadable or not a report.
+    """
+    try:
+        with open(path, "r") as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError("Could not read the report %s: %s" % (path, e))
+    if not isinstance(report, dict) or report.get("version") != REPORT_VERSION or "tests" not in report:
+        raise ValueError("%s is not a harness report" % path)
+    return report
+
+
+def testTimes(report):
+    """
+    Returns {test identifier: time} from the records of report, in ms,
+    summing the time of each font format.
+    """
+    times = {}
+    for record in report["tests"]:
+        times[record["test"]] = times.get(record["test"], 0) + record["time"]
+    return times
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return 1
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def splitTests(testGroups, shardCount, times=None):
+    """
+    Split testGroups, the groups passed to html.generateClientIndexHTML,
+    into at most shardCount lists of groups of the same form, one per shard.
+    Groups left without tests are dropped from a shard. times optionally
+    maps test identifiers to their time in an earlier run.
+    """
+    tests = [test for group in testGroups for test in group["testCases"]]
+    shardCount = max(1, min(shardCount, len(tests)))
+    shardOf = {}
+    if times:
+        default = _median([times[test["identifier"]] for test in tests if test["identifier"] in times])
+        costs = [times.get(test["identifier"], default) for test in tests]
+        loads = [0] * shardCount
+        # slowest first, ties in index order
+        for index in sorted(range(len(tests)), key=lambda i: -costs[i]):
+            shard = loads.index(min(loads))
+            loads[shard] += costs[index]
+            shardOf[tests[index]["identifier"]] = shard
+        logger.info("Estimated shard times: %s ms", ", ".join("%d" % load for load in loads))
+    else:
+        for index, test in enumerate(tests):
+            shardOf[test["identifier"]] = index * shardCount // len(tests)
+
+    shards = []
+    for shard in range(shardCount):
+        groups = []
+        for group in testGroups:
+            testCases = [test for test in group["testCases"] if shardOf[test["identifier"]] == shard]
+            if testCases:
+                groups.append(dict(group, testCases=testCases))
+        shards.append(groups)
+    return shards
+
+
+def summarizeRecords(records):
+    """
+    Returns the summary of a report with the given test records, less the
+    time, as computed by resources/ift.js.
+    """
+    summary = dict(tests=len(records))
+    summary.update((key, 0) for key in _SUMMARY_KEYS)
+    for record in records:
+        summary[_STATUS_KEYS[record["status"]]] += 1
+        summary["requests"] += record["requests"]
+        summary["bytes"] += record["bytes"]
+    return summary
+
+
+def mergeReports(reports):
+    """
+    Merge the reports of the shard pages into one report of the whole
+    suite. The merged report lists the tests of every shard in shard order,
+    and under "shards" the details of each shard report. Its time is that
+    of the slowest shard, as the shards run side by side. Raises ValueError
+    if a report is not that of a shard, or if the reports are of different
+    shardings of the suite or cover a shard more than once. Missing shards
+    are only logged, so that a partial run can still be looked at.
+    """
+    byShard = {}
+    shardCount = None
+    for report in reports:
+        shard = report.get("shard")
+        if not shard:
+            raise ValueError("Report of %s is not the report of a shard" % report.get("url"))
+        if shardCount is None:
+            shardCount = shard["count"]
+        elif shard["count"] != shardCount:
+            raise ValueError("Reports of %d and %d shards can't be merged" % (shardCount, shard["count"]))
+        if shard["index"] in byShard:
+            raise ValueError("Shard %d is reported more than once" % shard["index"])
+        byShard[shard["index"]] = report
+    missing = [index for index in range(1, (shardCount or 0) + 1) if index not in byShard]
+    if missing:
+        logger.warning("No report for shards %s of %d", ", ".join(str(index) for index in missing), shardCount)
+
+    shardReports = [byShard[index] for index in sorted(byShard)]
+    records = [record for report in shardReports for record in report["tests"]]
+    summary = summarizeRecords(records)
+    summary["time"] = max([report["summary"]["time"] for report in shardReports] or [0])
+    shards = []
+    for report in shardReports:
+        details = dict((key, value) for key, value in report.items() if key not in ("version", "tests"))
+        shards.append(details)
+    return dict(version=REPORT_VERSION, shards=shards, summary=summary, tests=records)
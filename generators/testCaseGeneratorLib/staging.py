@@ -0,0 +1,198 @@
+"""
+Staging of unchanged input files (build artifacts and harness resources)
+into the test output directory.
+
+Files are hardlinked into place where possible, reflinked where the file
+system supports it, and only copied as a last resort. Because a staged file
+may share its data with the file it came from, staged files must never be
+written to in place; use writeFile instead, which always gives the
+destination a private copy first.
+
+Test case files are not written straight into the output tree either: each
+(test, font format) cell is generated under a temporary directory which is
+renamed into place once the cell has finished (see stagedTestOutput). Its
+files are first moved into the blob store and replaced by links to it (see
+blobStore.py).
+"""
+
+import os
+import glob
+import shutil
+import fnmatch
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+from testCaseGeneratorLib.paths import clientTestDirectory
+from testCaseGeneratorLib.blobStore import currentStore
+from testCaseGeneratorLib.tracing import span
+
+# Linux FICLONE ioctl, used to reflink (copy-on-write clone) a file.
+_FICLONE = 0x40049409
+
+# Prefix of the temporary directories used by stagedTestOutput.
+_STAGING_PREFIX = ".staging-"
+
+# When set, the directory test case directories are created in instead of
+# clientTestDirectory. See testCaseDirectory.
+_testOutputRoot = None
+
+# sha256 digests of files, keyed by (path, mtime, size).
+_hashCache = {}
+
+
+def fileHash(path):
+    """
+    Returns the hex sha256 digest of the file at path.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _hashCache.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _hashCache[key] = h.hexdigest()
+    return digest
+
+
+def _sameContent(sourcePath, destPath):
+    if not os.path.isfile(destPath) or os.path.islink(destPath):
+        return False
+    sourceStat = os.stat(sourcePath)
+    destStat = os.stat(destPath)
+    if (sourceStat.st_dev, sourceStat.st_ino) == (destStat.st_dev, destStat.st_ino):
+        return True
+    if sourceStat.st_size != destStat.st_size:
+        return False
+    return fileHash(sourcePath) == fileHash(destPath)
+
+
+def _reflink(sourcePath, destPath):
+    import fcntl
+    with open(sourcePath, "rb") as src, open(destPath, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def _tempPath(destPath):
+    directory, name = os.path.split(destPath)
+    fd, path = tempfile.mkstemp(prefix=".%s." % name, dir=directory)
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def stageFile(sourcePath, destPath):
+    """
+    Place the contents of sourcePath at destPath. Nothing is done if
+    destPath already holds the same content. Returns True if the file was
+    (re)staged.
+    """
+    if _sameContent(sourcePath, destPath):
+        return False
+    os.makedirs(os.path.dirname(destPath), exist_ok=True)
+    tmpPath = _tempPath(destPath)
+    try:
+        os.link(sourcePath, tmpPath)
+    except OSError:
+        try:
+            _reflink(sourcePath, tmpPath)
+        except (OSError, ImportError):
+            shutil.copyfile(sourcePath, tmpPath)
+    os.replace(tmpPath, destPath)
+    return True
+
+
+def stageTree(sourceDir, destDir, patterns=None, prune=False):
+    """
+    Stage every file under sourceDir into the same relative location under
+    destDir.
+
+    patterns: Optional list of fnmatch patterns. When given, only top level
+    files matching one of them are staged.
+
+    prune: If true, files and directories under destDir that do not exist
+    in sourceDir are removed, so destDir ends up mirroring sourceDir.
+    """
+    staged = set()
+    for root, dirs, files in os.walk(sourceDir):
+        relRoot = os.path.relpath(root, sourceDir)
+        if patterns is not None:
+            dirs[:] = []
+        for name in files:
+            if patterns is not None and not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            relPath = os.path.normpath(os.path.join(relRoot, name))
+            staged.add(relPath)
+            stageFile(os.path.join(root, name), os.path.join(destDir, relPath))
+    if prune and os.path.isdir(destDir):
+        for root, dirs, files in os.walk(destDir, topdown=False):
+            relRoot = os.path.relpath(root, destDir)
+            for name in files:
+                relPath = os.path.normpath(os.path.join(relRoot, name))
+                if relPath not in staged:
+                    os.remove(os.path.join(root, name))
+            if root != destDir and not os.listdir(root):
+                os.rmdir(root)
+
+
+def writeFile(path, data):
+    """
+    Replace the file at path with data. The data is written to a new file
+    which is then renamed over path, so a staged file's source is never
+    written through and readers never see a partially written file.
+    """
+    tmpPath = _tempPath(path)
+    with open(tmpPath, "wb") as f:
+        f.write(data)
+    os.replace(tmpPath, path)
+
+
+def testCaseDirectory(testName):
+    """
+    Returns the directory that the files for testName are written to. This
+    is clientTestDirectory/testName, except while a cell is being generated
+    under stagedTestOutput.
+    """
+    return os.path.join(_testOutputRoot or clientTestDirectory, testName)
+
+
+@contextmanager
+def stagedTestOutput(testName, fontFormat):
+    """
+    Redirect testCaseDirectory to a fresh temporary directory while the
+    files for one (test, font format) cell are generated, then rename the
+    finished testName/fontFormat directory into place. If generation fails
+    or is interrupted the previously generated files are left untouched.
+    """
+    global _testOutputRoot
+    os.makedirs(clientTestDirectory, exist_ok=True)
+    root = tempfile.mkdtemp(prefix=_STAGING_PREFIX, dir=clientTestDirectory)
+    _testOutputRoot = root
+    try:
+        yield
+        _testOutputRoot = None
+        newPath = os.path.join(root, testName, fontFormat)
+        finalPath = os.path.join(clientTestDirectory, testName, fontFormat)
+        if os.path.isdir(newPath):
+            store = currentStore()
+            if store is not None:
+                with span("blobStore"):
+                    store.addTree(newPath)
+            os.makedirs(os.path.dirname(finalPath), exist_ok=True)
+            if os.path.exists(finalPath):
+                oldPath = os.path.join(root, "previous")
+                os.rename(finalPath, oldPath)
+            os.rename(newPath, finalPath)
+    finally:
+        _testOutputRoot = None
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def removeStagingDirectories():
+    """
+    Remove temporary directories left behind by an interrupted run.
+    """
+    for path in glob.glob(os.path.join(clientTestDirectory, _STAGING_PREFIX + "*")):
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,270 @@
+"""
+Machine readable manifest of the generated test suite (IFTClient/manifest.json).
+
+manifest.txt only lists the tests. manifest.json also describes what each
+test consists of, so that tooling can check, mirror or diff a suite without
+opening the index:
+
+    {
+     "version": 1,
+     "digest": "<sha256 over every test digest>",
+     "tests": {
+      "client-conform-format2-valid-format-number": {
+       "digest": "<sha256 over everything below>",
+       "group": "client",
+       "title": "...",
+       "description": "...",
+       "shouldShowIFT": false,
+       "specLinks": ["https://www.w3.org/TR/IFT/#client-conform-..."],
+       "specAnchors": ["client-conform-..."],
+       "codepoints": [[32, 32], [39, 41], ...],
+       "formats": {
+        "GLYF": {
+         "digest": "<sha256 over the files below>",
+         "files": {
+          "client-conform-.../GLYF/font.woff2": {"sha256": "...", "size": 1234},
+          ...
+
+File paths are relative to IFTClient/Tests/xhtml1. codepoints are the
+inclusive ranges of the code points the harness requests for the test (see
+html.requestedCodePoints).
+
+Hashing the files is cheap on a rebuild: the digests recorded in the build
+manifest are reused for every file whose size and modification time are
+unchanged, so only the files that were rewritten are read. Likewise
+diffSuiteManifests only descends into the tests, and then the formats,
+whose digests differ, so comparing two manifests costs time in proportion
+to what changed rather than to the size of the suite.
+"""
+
+import os
+import json
+import hashlib
+
+from testCaseGeneratorLib.paths import clientTestDirectory
+from testCaseGeneratorLib.staging import fileHash, writeFile
+from testCaseGeneratorLib.html import requestedCodePoints, codePointRanges
+
+SUITE_MANIFEST_VERSION = 1
+
+# Length of the font versions, in hex digits, see fontVersions.
+FONT_VERSION_LENGTH = 16
+
+
+def _digest(value):
+    data = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _formatFiles(testName, fontFormat, buildManifest):
+    recorded = {}
+    if buildManifest is not None:
+        recorded = buildManifest.recordedOutputs(testName, fontFormat)
+    directory = os.path.join(clientTestDirectory, testName, fontFormat)
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relPath = os.path.relpath(path, clientTestDirectory).replace(os.sep, "/")
+            stat = os.stat(path)
+            entry = recorded.get(os.path.relpath(path, clientTestDirectory))
+            if entry is not None and (entry[1], entry[2]) == (stat.st_size, stat.st_mtime_ns):
+                digest = entry[0]
+            else:
+                digest = fileHash(path)
+            files[relPath] = dict(sha256=digest, size=stat.st_size)
+    return files
+
+
+def buildSuiteManifest(groupDefinitions, testRegistry, buildManifest=None):
+    """
+    Returns the manifest of every registered test, as a JSON serialisable
+    dict. buildManifest, if given, supplies the digests of unchanged files.
+    """
+    tests = {}
+    for tag, title, url, note in groupDefinitions:
+        for testCase in testRegistry[tag]:
+            identifier = testCase["identifier"]
+            specLinks = testCase["specLink"].split()
+            entry = dict(
+                group=tag,
+                title=testCase["title"],
+                description=testCase["description"],
+                shouldShowIFT=testCase["shouldShowIFT"],
+                specLinks=specLinks,
+                specAnchors=[link.split("#", 1)[1] for link in specLinks if "#" in link],
+                codepoints=codePointRanges(requestedCodePoints(testCase)),
+                formats={},
+            )
+            for fontFormat in testCase["fontFormats"]:
+                files = _formatFiles(identifier, fontFormat, buildManifest)
+                entry["formats"][fontFormat] = dict(digest=_digest(files), files=files)
+            tests[identifier] = dict(digest=_digest(entry), **entry)
+    suiteDigest = _digest([(identifier, test["digest"]) for identifier, test in tests.items()])
+    return dict(version=SUITE_MANIFEST_VERSION, digest=suiteDigest, tests=tests)
+
+
+def scanSuiteTree(directory):
+    """
+    Returns a manifest of the test files found under directory, laid out
+    like IFTClient/Tests/xhtml1 (or an extracted ClientTestFonts.zip): one
+    directory per test holding one directory per font format. Only the
+    files are described, the test metadata is left empty.
+    """
+    tests = {}
+    for identifier in sorted(os.listdir(directory)):
+        testDirectory = os.path.join(directory, identifier)
+        if identifier == "resources" or not os.path.isdir(testDirectory):
+            continue
+        formats = {}
+        for fontFormat in sorted(os.listdir(testDirectory)):
+            formatDirectory = os.path.join(testDirectory, fontFormat)
+            if not os.path.isdir(formatDirectory):
+                continue
+            files = {}
+            for root, dirs, names in os.walk(formatDirectory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    relPath = os.path.relpath(path, directory).replace(os.sep, "/")
+                    files[relPath] = dict(sha256=fileHash(path), size=os.path.getsize(path))
+            formats[fontFormat] = dict(digest=_digest(files), files=files)
+        entry = dict(formats=formats)
+        tests[identifier] = dict(digest=_digest(entry), **entry)
+    suiteDigest = _digest([(identifier, test["digest"]) for identifier, test in tests.items()])
+    return dict(version=SUITE_MANIFEST_VERSION, digest=suiteDigest, tests=tests)
+
+
+def fontVersions(manifest):
+    """
+    Returns {identifier: {font format: version}} for every test in manifest.
+    A version is a prefix of the digest of the test's files for that format,
+    so it changes whenever the font or any of its patches change. The
+    harness (resources/ift.js) appends it to the font URL in place of a
+    random cache buster, and its workers put it on the test's patch
+    requests too (the client itself resolves patch URLs without the query),
+    so unchanged files can be served from caches while a changed font or
+    patch is always refetched.
+    """
+    versions = {}
+    for identifier, test in manifest["tests"].items():
+        versions[identifier] = {fontFormat: entry["digest"][:FONT_VERSION_LENGTH]
+                                for fontFormat, entry in test["formats"].items()}
+    return versions
+
+
+def writeSuiteManifest(path, manifest):
+    writeFile(path, json.dumps(manifest, indent=1).encode("utf-8"))
+
+
+def loadSuiteManifest(path):
+    """
+    Returns the manifest stored at path, or None if it is missing, unreadable
+    or of another version.
+    """
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != SUITE_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def loadSuite(path):
+    """
+    Returns the (manifest, test directory) of the suite at path, an IFTClient
+    directory, its manifest.json or a test directory. Raises ValueError if
+    path is none of these.
+    """
+    if os.path.isfile(path):
+        manifest = loadSuiteManifest(path)
+        if manifest is None:
+            raise ValueError("%s is not a suite manifest" % path)
+        return manifest, os.path.join(os.path.dirname(path), "Tests", "xhtml1")
+    if not os.path.isdir(path):
+        raise ValueError("%s does not exist" % path)
+    testDirectory = os.path.join(path, "Tests", "xhtml1")
+    if os.path.isdir(testDirectory):
+        manifest = loadSuiteManifest(os.path.join(path, "manifest.json"))
+        if manifest is not None:
+            return manifest, testDirectory
+    else:
+        testDirectory = path
+    return scanSuiteTree(testDirectory), testDirectory
+
+
+def _allFiles(test):
+    files = {}
+    for fontFormat in test["formats"].values():
+        files.update(fontFormat["files"])
+    return files
+
+
+class SuiteDifference:
+    """
+    The differences between two suite manifests. Each attribute is a sorted
+    list: test identifiers for the *Tests lists and file paths (relative to
+    IFTClient/Tests/xhtml1) for the *Files lists. changedTests includes tests
+    whose metadata changed but whose files did not.
+    """
+
+    def __init__(self):
+        self.addedTests = []
+        self.removedTests = []
+        self.changedTests = []
+        self.addedFiles = []
+        self.removedFiles = []
+        self.changedFiles = []
+
+    def isEmpty(self):
+        return not (self.addedTests or self.removedTests or self.changedTests)
+
+    def _sort(self):
+        for values in vars(self).values():
+            values.sort()
+
+
+def diffSuiteManifests(old, new):
+    """
+    Compare two suite manifests and return a SuiteDifference. Tests and
+    formats with equal digests are not looked into.
+    """
+    difference = SuiteDifference()
+    if old["digest"] == new["digest"]:
+        return difference
+    oldTests = old["tests"]
+    newTests = new["tests"]
+    for identifier, newTest in newTests.items():
+        oldTest = oldTests.get(identifier)
+        if oldTest is None:
+            difference.addedTests.append(identifier)
+            difference.addedFiles.extend(_allFiles(newTest))
+            continue
+        if oldTest["digest"] == newTest["digest"]:
+            continue
+        difference.changedTests.append(identifier)
+        oldFiles = {}
+        newFiles = {}
+        for fontFormat in set(oldTest["formats"]) | set(newTest["formats"]):
+            oldFormat = oldTest["formats"].get(fontFormat)
+            newFormat = newTest["formats"].get(fontFormat)
+            if oldFormat is not None and newFormat is not None and oldFormat["digest"] == newFormat["digest"]:
+                continue
+            if oldFormat is not None:
+                oldFiles.update(oldFormat["files"])
+            if newFormat is not None:
+                newFiles.update(newFormat["files"])
+        for path, entry in newFiles.items():
+            if path not in oldFiles:
+                difference.addedFiles.append(path)
+            elif oldFiles[path]["sha256"] != entry["sha256"]:
+                difference.changedFiles.append(path)
+        difference.removedFiles.extend(path for path in oldFiles if path not in newFiles)
+    for identifier, oldTest in oldTests.items():
+        if identifier not in newTests:
+            difference.removedTests.append(identifier)
+            difference.removedFiles.extend(_allFiles(oldTest))
+    difference._sort()
+    return difference
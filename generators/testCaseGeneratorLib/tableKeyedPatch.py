@@ -0,0 +1,200 @@
+"""
+Reader/writer for table keyed patches, see
+https://www.w3.org/TR/IFT/#table-keyed
+
+Patch layout:
+  0-3:   format (Tag) = 'iftk'
+  4-7:   reserved (uint32)
+  8-23:  compatibilityId (uint32[4], 16 bytes)
+  24-25: patchesCount (uint16)
+  26+:   patches (Offset32[patchesCount + 1], from the start of the patch)
+  then:  TablePatch records
+
+TablePatch layout:
+  0-3:   tag (Tag)
+  4:     flags (uint8)  -- bit 0: replace table, bit 1: drop table
+  5-8:   maxUncompressedLength (uint32)
+  9+:    brotliStream (up to the next offset)
+
+Parsing only reads the header and the offsets. Each record is a view into
+the original data whose fields are decoded when first accessed, and its
+brotli stream is only decompressed if its data is requested. When a patch
+is compiled, records that were not modified are copied through from the
+original data as they are, so editing one table in a large patch only
+re-encodes that table.
+"""
+
+import sys
+import array
+import struct
+
+from testCaseGeneratorLib.staging import writeFile
+
+TABLE_KEYED_FORMAT = b"iftk"
+
+# format(4) + reserved(4) + compatibilityId(16) + patchesCount(2)
+_HEADER = struct.Struct(">4s4s16sH")
+# tag(4) + flags(1) + maxUncompressedLength(4)
+_TABLE_PATCH_HEADER = struct.Struct(">4sBI")
+
+FLAG_REPLACE_TABLE = 0x01
+FLAG_DROP_TABLE = 0x02
+
+
+def _unpackOffsets(data):
+    offsets = array.array("I")
+    assert offsets.itemsize == 4
+    offsets.frombytes(bytes(data))
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    return offsets
+
+
+def _packOffsets(offsets):
+    offsets = array.array("I", offsets)
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    return offsets.tobytes()
+
+
+class TablePatch:
+    """
+    One TablePatch record. Fields are read from the original record data
+    until they are assigned. Assigning data compresses it (without a
+    dictionary) into a new brotliStream and updates maxUncompressedLength.
+    """
+
+    def __init__(self, tag=b"\0\0\0\0", flags=0, maxUncompressedLength=0, brotliStream=b"", view=None):
+        self._view = view
+        self._header = None
+        self._data = None
+        self._brotliStream = None
+        self.modified = view is None
+        if view is None:
+            self._header = [tag, flags, maxUncompressedLength]
+            self._brotliStream = bytes(brotliStream)
+
+    def _getHeader(self):
+        if self._header is None:
+            self._header = list(_TABLE_PATCH_HEADER.unpack_from(self._view, 0))
+        return self._header
+
+    def _setHeaderField(self, index, value):
+        self._getHeader()[index] = value
+        self.modified = True
+
+    tag = property(lambda self: self._getHeader()[0], lambda self, v: self._setHeaderField(0, v))
+    flags = property(lambda self: self._getHeader()[1], lambda self, v: self._setHeaderField(1, v))
+    maxUncompressedLength = property(lambda self: self._getHeader()[2],
+                                     lambda self, v: self._setHeaderField(2, v))
+
+    @property
+    def brotliStream(self):
+        if not self.modified:
+            return self._view[_TABLE_PATCH_HEADER.size:]
+        if self._brotliStream is None:
+            self._brotliStream = bytes(self._view[_TABLE_PATCH_HEADER.size:])
+        return self._brotliStream
+
+    @brotliStream.setter
+    def brotliStream(self, value):
+        self._getHeader()
+        self._brotliStream = bytes(value)
+        self._data = None
+        self.modified = True
+
+    @property
+    def data(self):
+        """
+        The decompressed table data. Only available for streams compressed
+        without a shared dictionary (typically replace table records), as
+        patches against an existing table use that table as the dictionary.
+        """
+        if self._data is None:
+            import brotli
+            self._data = brotli.decompress(bytes(self.brotliStream))
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        import brotli
+        self._getHeader()
+        self._data = bytes(value)
+        self._brotliStream = brotli.compress(self._data)
+        self._header[2] = len(self._data)
+        self.modified = True
+
+    def compile(self):
+        if not self.modified:
+            return self._view
+        header = _TABLE_PATCH_HEADER.pack(*self._getHeader())
+        return header + self.brotliStream
+
+
+class TableKeyedPatch:
+    """
+    A table keyed patch.
+
+    offsets: array.array of the patches offsets. It is written as is when
+    the records are unchanged, which lets tests produce malformed offsets;
+    otherwise it is recalculated by compile.
+
+    records: list of TablePatch, which may be edited, reordered, added to
+    or removed from.
+    """
+
+    def __init__(self, format=TABLE_KEYED_FORMAT, reserved=b"\0\0\0\0",
+                 compatibilityId=b"\0" * 16, records=()):
+        self.format = format
+        self.reserved = reserved
+        self.compatibilityId = compatibilityId
+        self.records = list(records)
+        self.offsets = array.array("I")
+        self._view = None
+        self._originalRecords = None
+
+    @classmethod
+    def decompile(cls, data):
+        view = memoryview(data)
+        format, reserved, compatibilityId, patchesCount = _HEADER.unpack_from(view, 0)
+        offsetsStart = _HEADER.size
+        offsets = _unpackOffsets(view[offsetsStart:offsetsStart + (patchesCount + 1) * 4])
+        records = [TablePatch(view=view[offsets[i]:offsets[i + 1]]) for i in range(patchesCount)]
+        patch = cls(format=format, reserved=reserved, compatibilityId=compatibilityId, records=records)
+        patch.offsets = offsets
+        patch._view = view
+        patch._originalRecords = list(records)
+        return patch
+
+    @classmethod
+    def fromFile(cls, path):
+        with open(path, "rb") as f:
+            return cls.decompile(f.read())
+
+    def findRecord(self, tag):
+        for record in self.records:
+            if record.tag == tag:
+                return record
+        return None
+
+    def _recordsUnchanged(self):
+        if self._originalRecords is None or len(self.records) != len(self._originalRecords):
+            return False
+        return all(a is b and not a.modified for a, b in zip(self.records, self._originalRecords))
+
+    def compile(self):
+        headerSize = _HEADER.size + (len(self.records) + 1) * 4
+        if self._recordsUnchanged():
+            originalHeaderSize = _HEADER.size + (len(self._originalRecords) + 1) * 4
+            parts = [self._view[originalHeaderSize:]]
+        else:
+            parts = [record.compile() for record in self.records]
+            offsets = [headerSize]
+            for part in parts:
+                offsets.append(offsets[-1] + len(part))
+            self.offsets = array.array("I", offsets)
+        header = _HEADER.pack(self.format, self.reserved, self.compatibilityId, len(self.records))
+        return b"".join([header, _packOffsets(self.offsets)] + parts)
+
+    def save(self, path):
+        writeFile(path, self.compile())
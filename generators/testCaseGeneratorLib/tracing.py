@@ -0,0 +1,183 @@
+"""
+Timing spans and profiling for the generator.
+
+Phases of the build are wrapped in spans:
+
+    with span("saveWOFF2"):
+        ...
+
+Spans cost nothing unless tracing is enabled (ClientTestCaseGenerator.py
+--trace PATH), in which case each one is recorded as a Chrome trace
+"complete" event. The trace can be opened in chrome://tracing or
+https://ui.perfetto.dev, and a summary of the slowest tests and phases is
+logged at the end of the build.
+
+Worker processes record their own spans, which are handed back to the
+main process along with the cell's result (see scheduler.py). Timestamps
+come from time.perf_counter_ns, which is system wide on Linux and macOS,
+so spans from every process line up on one timeline.
+
+With --profile PATH each test cell is run under cProfile and the stats of
+every cell are merged into a single pstats file.
+"""
+
+import io
+import os
+import json
+import time
+import logging
+import threading
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Span category used for whole test cells, the rest are "phase".
+TEST_CATEGORY = "test"
+PHASE_CATEGORY = "phase"
+
+_enabled = False
+_events = []
+
+
+def enableTracing(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def tracingEnabled():
+    return _enabled
+
+
+@contextmanager
+def span(name, category=PHASE_CATEGORY, **args):
+    """
+    Record the time spent in the with block as a span called name. args
+    are shown alongside the span in the trace viewer.
+    """
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        _events.append(dict(
+            name=name, cat=category, ph="X",
+            ts=start / 1000, dur=(end - start) / 1000,
+            pid=os.getpid(), tid=threading.get_ident(), args=args,
+        ))
+
+
+def takeEvents():
+    """
+    Returns and forgets the spans recorded so far in this process.
+    """
+    events = list(_events)
+    del _events[:]
+    return events
+
+
+def addEvents(events):
+    """
+    Add spans recorded by another (worker) process.
+    """
+    _events.extend(events)
+
+
+def writeTrace(path):
+    """
+    Write every span recorded so far to path as Chrome trace JSON.
+    """
+    # Imported here as staging itself records spans.
+    from testCaseGeneratorLib.staging import writeFile
+    mainPid = os.getpid()
+    pids = sorted({event["pid"] for event in _events})
+    metadata = []
+    for index, pid in enumerate(pids):
+        name = "generator" if pid == mainPid else "worker %d" % index
+        metadata.append(dict(name="process_name", ph="M", pid=pid, tid=0, args=dict(name=name)))
+    events = sorted(_events, key=lambda event: (event["ts"], -event["dur"]))
+    data = dict(traceEvents=metadata + events, displayTimeUnit="ms")
+    writeFile(path, json.dumps(data).encode("utf-8"))
+
+
+def summarize(limit=10):
+    """
+    Returns the lines of a table of the slowest tests and of the total time
+    spent in each phase.
+    """
+    tests = sorted((event for event in _events if event["cat"] == TEST_CATEGORY),
+                   key=lambda event: event["dur"], reverse=True)
+    phases = {}
+    for event in _events:
+        if event["cat"] == TEST_CATEGORY:
+            continue
+        total, count = phases.get(event["name"], (0, 0))
+        phases[event["name"]] = (total + event["dur"], count + 1)
+
+    lines = ["Slowest tests:", "  %10s  %s" % ("ms", "test")]
+    for event in tests[:limit]:
+        lines.append("  %10.1f  %s" % (event["dur"] / 1000, event["name"]))
+    lines.append("Slowest phases:")
+    lines.append("  %10s  %6s  %10s  %s" % ("total ms", "count", "mean ms", "phase"))
+    for name, (total, count) in sorted(phases.items(), key=lambda item: item[1][0], reverse=True)[:limit]:
+        lines.append("  %10.1f  %6d  %10.2f  %s" % (total / 1000, count, total / count / 1000, name))
+    return lines
+
+
+# -------------
+# Profiling
+# -------------
+
+def profileCall(func, *args):
+    """
+    Call func under cProfile. Returns the profile stats as a (picklable)
+    dict, see ProfileStats.add.
+    """
+    profile = cProfile.Profile()
+    profile.runcall(func, *args)
+    profile.create_stats()
+    return profile.stats
+
+
+class _RawStats:
+    # pstats.Stats accepts any object with create_stats and stats.
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfileStats:
+    """
+    The merged profiles of every test cell.
+    """
+
+    def __init__(self):
+        self.stats = None
+
+    def add(self, rawStats):
+        if self.stats is None:
+            self.stats = pstats.Stats(_RawStats(rawStats))
+        else:
+            self.stats.add(_RawStats(rawStats))
+
+    def save(self, path, limit=25):
+        """
+        Dump the merged stats to path (load them with pstats or snakeviz)
+        and log the functions with the most cumulative time.
+        """
+        if self.stats is None:
+            logger.warning("No test cells were profiled.")
+            return
+        self.stats.dump_stats(path)
+        logger.info("Wrote profile to %s", path)
+        if logger.isEnabledFor(logging.INFO):
+            stream = io.StringIO()
+            self.stats.stream = stream
+            self.stats.sort_stats("cumulative").print_stats(limit)
+            logger.info(stream.getvalue())
@@ -0,0 +1,207 @@
+"""
+WOFF2 encoding of the test fonts.
+
+Nearly every test font is the source font with a few bytes of the IFT
+table changed, yet saving it with TTFont.save redoes the whole WOFF2
+encode: the glyf/loca normalisation and transform, then a quality 11
+brotli compression of the entire table stream. saveWOFF2 encodes the
+same way fontTools does, but:
+
+    - The normalised glyf/loca tables and the transformed glyf table are
+      cached in the process, keyed by the glyf, loca and maxp data they
+      were derived from, so they are only computed once per source font.
+      Everything else (the table directory, checksums, the head flags and
+      checkSumAdjustment) is recalculated for every font, so edits to any
+      table, including glyf and loca, are always honoured.
+    - The brotli quality is configurable. The default, 11, produces output
+      byte identical to TTFont.save. Lower qualities are much faster and
+      are meant for development loops, never for published test fonts:
+
+          python3 ./ClientTestCaseGenerator.py --woff2-quality 1
+
+The quality is passed to worker processes in the IFT_WOFF2_BROTLI_QUALITY
+environment variable, see setBrotliQuality.
+"""
+
+import os
+import hashlib
+from io import BytesIO
+from collections import OrderedDict
+
+from testCaseGeneratorLib.tracing import span
+
+BROTLI_QUALITY_ENVIRONMENT_VARIABLE = "IFT_WOFF2_BROTLI_QUALITY"
+DEFAULT_BROTLI_QUALITY = 11
+
+# (normalised glyf, normalised loca, indexToLocFormat, transformed glyf),
+# keyed by the digest of the tables they were derived from.
+_glyfCache = {}
+
+# Compressed table streams, keyed by (digest of the stream, quality). Tests
+# that leave the font untouched produce identical streams.
+_compressedCache = OrderedDict()
+_COMPRESSED_CACHE_SIZE = 16
+
+
+def brotliQuality():
+    """
+    Returns the brotli quality used by saveWOFF2 when none is given.
+    """
+    value = os.environ.get(BROTLI_QUALITY_ENVIRONMENT_VARIABLE)
+    if not value:
+        return DEFAULT_BROTLI_QUALITY
+    quality = int(value)
+    if not 0 <= quality <= 11:
+        raise ValueError("%s must be between 0 and 11, got %d" % (BROTLI_QUALITY_ENVIRONMENT_VARIABLE, quality))
+    return quality
+
+
+def setBrotliQuality(quality):
+    """
+    Set the default brotli quality for this process and any worker
+    processes it starts afterwards.
+    """
+    if not 0 <= quality <= 11:
+        raise ValueError("Brotli quality must be between 0 and 11, got %d" % quality)
+    os.environ[BROTLI_QUALITY_ENVIRONMENT_VARIABLE] = str(quality)
+
+
+def _compress(data, quality):
+    import brotli
+    key = (hashlib.sha256(data).digest(), quality)
+    compressed = _compressedCache.get(key)
+    if compressed is None:
+        with span("brotliCompress", quality=quality):
+            compressed = brotli.compress(data, mode=brotli.MODE_FONT, quality=quality)
+        _compressedCache[key] = compressed
+        if len(_compressedCache) > _COMPRESSED_CACHE_SIZE:
+            _compressedCache.popitem(last=False)
+    else:
+        _compressedCache.move_to_end(key)
+    return compressed
+
+
+def _makeWriterClass():
+    # fontTools is imported on first use rather than at module level so that
+    # merely importing (registering) the test cases stays cheap.
+    from fontTools.ttLib import TTLibError
+    from fontTools.misc.textTools import pad
+    from fontTools.ttLib.woff2 import WOFF2Writer
+
+    class CachingWOFF2Writer(WOFF2Writer):
+        """
+        A WOFF2Writer that reuses cached glyf/loca work and compresses with
+        a given brotli quality. close mirrors WOFF2Writer.close apart from
+        the compression call.
+        """
+
+        def __init__(self, file, numTables, sfntVersion="\000\001\000\000",
+                     flavor=None, flavorData=None, quality=DEFAULT_BROTLI_QUALITY):
+            super().__init__(file, numTables, sfntVersion, flavor, flavorData)
+            self.quality = quality
+            self._glyfEntry = None
+
+        def _glyfKey(self, padding):
+            h = hashlib.sha256()
+            h.update(str(padding).encode("ascii"))
+            for tag in ("maxp", "loca", "glyf"):
+                data = self.tables[tag].data
+                h.update(len(data).to_bytes(4, "big"))
+                h.update(data)
+            # head.indexToLocFormat, needed to read loca
+            h.update(self.tables["head"].data[50:52])
+            return h.digest()
+
+        def _normaliseGlyfAndLoca(self, padding=4):
+            if self.sfntVersion == "OTTO":
+                return
+            key = self._glyfKey(padding)
+            entry = _glyfCache.get(key)
+            if entry is None:
+                with span("normaliseGlyfAndLoca"):
+                    super()._normaliseGlyfAndLoca(padding)
+                entry = [self.tables["glyf"].data, self.tables["loca"].data,
+                         self.ttFont["head"].indexToLocFormat, None]
+                _glyfCache[key] = entry
+            else:
+                self._decompileTable("head")
+                self.ttFont["head"].indexToLocFormat = entry[2]
+                self.tables["glyf"].data = entry[0]
+                self.tables["loca"].data = entry[1]
+            self._glyfEntry = entry
+
+        def transformTable(self, tag):
+            if tag == "glyf" and self._glyfEntry is not None:
+                if self._glyfEntry[3] is None:
+                    with span("transformGlyf"):
+                        self._glyfEntry[3] = super().transformTable(tag)
+                return self._glyfEntry[3]
+            return super().transformTable(tag)
+
+        def close(self):
+            if len(self.tables) != self.numTables:
+                raise TTLibError("wrong number of tables; expected %d, found %d" % (self.numTables, len(self.tables)))
+
+            if self.sfntVersion in ("\x00\x01\x00\x00", "true"):
+                isTrueType = True
+            elif self.sfntVersion == "OTTO":
+                isTrueType = False
+            else:
+                raise TTLibError("Not a TrueType or OpenType font (bad sfntVersion)")
+
+            if (
+                isTrueType
+                and "glyf" in self.flavorData.transformedTables
+                and "glyf" in self.tables
+            ):
+                self._normaliseGlyfAndLoca(padding=4)
+            self._setHeadTransformFlag()
+
+            self.tables = OrderedDict(sorted(self.tables.items()))
+
+            self.totalSfntSize = self._calcSFNTChecksumsLengthsAndOffsets()
+
+            fontData = self._transformTables()
+            compressedFont = _compress(fontData, self.quality)
+
+            self.totalCompressedSize = len(compressedFont)
+            self.length = self._calcTotalSize()
+            self.majorVersion, self.minorVersion = self._getVersion()
+            self.reserved = 0
+
+            directory = self._packTableDirectory()
+            self.file.seek(0)
+            self.file.write(pad(directory + compressedFont, size=4))
+            self._writeFlavorData()
+
+    return CachingWOFF2Writer
+
+
+_writerClass = None
+
+
+def saveWOFF2(font, quality=None):
+    """
+    Returns the compiled bytes of font, a WOFF2 flavored TTFont, as
+    TTFont.save would write them. quality defaults to brotliQuality().
+    """
+    global _writerClass
+    if font.flavor != "woff2":
+        raise ValueError("Expected a woff2 font, found flavor %r" % font.flavor)
+    if quality is None:
+        quality = brotliQuality()
+    if _writerClass is None:
+        _writerClass = _makeWriterClass()
+
+    # As TTFont._save.
+    if font.recalcTimestamp and "head" in font:
+        font["head"]
+    tags = [tag for tag in font.keys() if tag != "GlyphOrder"]
+    stream = BytesIO()
+    writer = _writerClass(stream, len(tags), font.sfntVersion, font.flavor, font.flavorData,
+                          quality=quality)
+    done = []
+    for tag in tags:
+        font._writeTable(tag, writer, done)
+    writer.close()
+    return stream.getvalue()